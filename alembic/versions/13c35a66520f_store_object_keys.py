@@ -0,0 +1,50 @@
+"""Store object keys instead of presigned URLs
+
+Revision ID: 13c35a66520f
+Revises: 9513acd42747
+Create Date: 2026-10-19 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "13c35a66520f"
+down_revision: Union[str, None] = "9513acd42747"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+pastes = sa.table(
+    "pastes",
+    sa.column("pasteID", sa.String),
+    sa.column("object_key", sa.String),
+)
+
+
+def _object_key_from_link(link: str) -> str:
+    # Presigned URLs look like http://minio:9000/bucket/object-name?X-Amz-Algorithm=...
+    return link.split("?")[0].rstrip("/").split("/")[-1]
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("pastes") as batch_op:
+        batch_op.alter_column("s3_link", new_column_name="object_key", existing_type=sa.String(length=500))
+        batch_op.add_column(sa.Column("size", sa.BigInteger(), nullable=True))
+
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(pastes.c.pasteID, pastes.c.object_key).where(pastes.c.object_key.like("%/%"))).all()
+    for paste_id, link in rows:
+        connection.execute(
+            pastes.update().where(pastes.c.pasteID == paste_id).values(object_key=_object_key_from_link(link)),
+        )
+
+
+def downgrade() -> None:
+    # Bare keys are left in place: the previous code extracted the last path
+    # component of the stored link, which for a bare key is the key itself.
+    with op.batch_alter_table("pastes") as batch_op:
+        batch_op.drop_column("size")
+        batch_op.alter_column("object_key", new_column_name="s3_link", existing_type=sa.String(length=500))
@@ -0,0 +1,86 @@
+"""Partition pastes by expiry bucket on PostgreSQL
+
+Only applied when PARTITIONED_STORAGE is enabled and the database is
+PostgreSQL; everywhere else the indexed table from b0c1ebb7019c is kept.
+Daily partitions are created (and expired ones dropped) by
+`paste.partitions.maintain_partitions`, until then rows land in the
+default partition.
+
+Revision ID: 2d4e81d08579
+Revises: b0c1ebb7019c
+Create Date: 2026-10-19 11:41:07.935118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from paste.config import get_settings
+
+
+revision: str = "2d4e81d08579"
+down_revision: Union[str, None] = "b0c1ebb7019c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = '"pasteID", content, extension, object_key, created_at, expiresat, size, expires_bucket'
+
+COLUMN_DEFINITIONS = """
+    "pasteID" VARCHAR(4) NOT NULL,
+    content TEXT,
+    extension VARCHAR(50),
+    object_key VARCHAR(500),
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    expiresat TIMESTAMP WITHOUT TIME ZONE,
+    size BIGINT,
+    expires_bucket DATE NOT NULL
+"""
+
+
+def _enabled() -> bool:
+    return op.get_bind().dialect.name == "postgresql" and get_settings().PARTITIONED_STORAGE
+
+
+def _is_partitioned() -> bool:
+    return bool(op.get_bind().exec_driver_sql("SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'pastes'::regclass").scalar())
+
+
+def upgrade() -> None:
+    if not _enabled():
+        return
+
+    op.execute("ALTER TABLE pastes RENAME TO pastes_unpartitioned")
+    op.execute("ALTER TABLE pastes_unpartitioned RENAME CONSTRAINT pastes_pkey TO pastes_unpartitioned_pkey")
+    # Unique keys of a partitioned table must include the partition key, so ids are
+    # kept unique by the claims in paste.crud.lock_paste_ids rather than the database
+    op.execute(
+        f"""
+        CREATE TABLE pastes ({COLUMN_DEFINITIONS},
+            PRIMARY KEY ("pasteID", expires_bucket)
+        ) PARTITION BY RANGE (expires_bucket)
+        """
+    )
+    # Pastes without an expiry carry the bucket 9999-12-31 (date.max)
+    op.execute("CREATE TABLE pastes_never PARTITION OF pastes FOR VALUES FROM ('9999-12-31') TO (MAXVALUE)")
+    # Catches buckets beyond the pre-created horizon, rows are moved out when their day's partition is created
+    op.execute("CREATE TABLE pastes_default PARTITION OF pastes DEFAULT")
+    op.execute(f"INSERT INTO pastes ({COLUMNS}) SELECT {COLUMNS} FROM pastes_unpartitioned")
+    op.execute("DROP TABLE pastes_unpartitioned")
+    op.create_index("ix_pastes_expiresat", "pastes", ["expiresat"])
+    op.create_index("ix_pastes_created_at", "pastes", ["created_at"])
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql" or not _is_partitioned():
+        return
+
+    op.execute("ALTER TABLE pastes RENAME TO pastes_partitioned")
+    op.execute("ALTER TABLE pastes_partitioned RENAME CONSTRAINT pastes_pkey TO pastes_partitioned_pkey")
+    op.execute("ALTER INDEX ix_pastes_expiresat RENAME TO ix_pastes_partitioned_expiresat")
+    op.execute("ALTER INDEX ix_pastes_created_at RENAME TO ix_pastes_partitioned_created_at")
+    op.execute(f'CREATE TABLE pastes ({COLUMN_DEFINITIONS}, PRIMARY KEY ("pasteID"))')
+    op.execute(f"INSERT INTO pastes ({COLUMNS}) SELECT {COLUMNS} FROM pastes_partitioned")
+    op.execute("DROP TABLE pastes_partitioned")
+    op.create_index("ix_pastes_expiresat", "pastes", ["expiresat"])
+    op.create_index("ix_pastes_created_at", "pastes", ["created_at"])
@@ -0,0 +1,37 @@
+"""Add content type and encoding to pastes
+
+Revision ID: 70ff0cd23fcc
+Revises: 2d4e81d08579
+Create Date: 2026-10-19 13:37:52.660214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "70ff0cd23fcc"
+down_revision: Union[str, None] = "2d4e81d08579"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+pastes = sa.table(
+    "pastes",
+    sa.column("content_type", sa.String),
+    sa.column("encoding", sa.String),
+)
+
+
+def upgrade() -> None:
+    op.add_column("pastes", sa.Column("content_type", sa.String(length=100), nullable=True))
+    op.add_column("pastes", sa.Column("encoding", sa.String(length=50), nullable=True))
+    # Every paste stored so far went through a UTF-8 decode before being saved
+    op.execute(pastes.update().values(content_type="text/plain", encoding="utf-8"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("pastes") as batch_op:
+        batch_op.drop_column("encoding")
+        batch_op.drop_column("content_type")
@@ -0,0 +1,36 @@
+"""Add paste revisions
+
+Revision ID: 903cac6b778c
+Revises: f2dbfdbffb0d
+Create Date: 2026-10-19 17:02:11.463091
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "903cac6b778c"
+down_revision: Union[str, None] = "f2dbfdbffb0d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "paste_revisions",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("paste_id", sa.String(length=4), nullable=False),
+        sa.Column("number", sa.Integer(), nullable=False),
+        sa.Column("is_snapshot", sa.Boolean(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("paste_id", "number", name="uq_paste_revisions_paste_id_number"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("paste_revisions")
@@ -0,0 +1,51 @@
+"""Backfill paste sizes and record objects retired by tiering
+
+Pastes stored before 13c35a66520f have no size, which the tiering rules
+filter on. Inline bodies are measured here in SQL, object-backed ones are
+left to the tiering job, which stats their objects a batch at a time.
+
+Revision ID: 97a7d61605c4
+Revises: edad02c37e3f
+Create Date: 2026-10-19 22:17:45.360918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "97a7d61605c4"
+down_revision: Union[str, None] = "edad02c37e3f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+pastes = sa.table(
+    "pastes",
+    sa.column("content", sa.Text),
+    sa.column("size", sa.BigInteger),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "retired_objects",
+        sa.Column("object_key", sa.String(length=500), nullable=False),
+        sa.Column("retired_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("object_key"),
+    )
+    op.create_index("ix_retired_objects_retired_at", "retired_objects", ["retired_at"])
+
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        byte_length = sa.func.length(sa.cast(pastes.c.content, sa.LargeBinary))
+    else:
+        byte_length = sa.func.octet_length(pastes.c.content)
+    op.execute(pastes.update().where(pastes.c.size.is_(None), pastes.c.content.is_not(None)).values(size=byte_length))
+
+
+def downgrade() -> None:
+    # Backfilled sizes are correct for the previous revision as well and stay
+    op.drop_index("ix_retired_objects_retired_at", table_name="retired_objects")
+    op.drop_table("retired_objects")
@@ -0,0 +1,31 @@
+"""Add paste view counters
+
+Revision ID: a5282664a08f
+Revises: 903cac6b778c
+Create Date: 2026-10-19 17:48:35.902217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "a5282664a08f"
+down_revision: Union[str, None] = "903cac6b778c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "paste_views",
+        sa.Column("paste_id", sa.String(length=4), nullable=False),
+        sa.Column("views", sa.BigInteger(), nullable=False),
+        sa.Column("last_viewed_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("paste_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("paste_views")
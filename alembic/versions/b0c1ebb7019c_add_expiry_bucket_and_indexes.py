@@ -0,0 +1,55 @@
+"""Add expiry bucket and expiry/creation indexes
+
+Revision ID: b0c1ebb7019c
+Revises: 13c35a66520f
+Create Date: 2026-10-19 11:03:54.218420
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "b0c1ebb7019c"
+down_revision: Union[str, None] = "13c35a66520f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+pastes = sa.table(
+    "pastes",
+    sa.column("expiresat", sa.DateTime),
+    sa.column("expires_bucket", sa.Date),
+)
+
+
+def upgrade() -> None:
+    op.add_column("pastes", sa.Column("expires_bucket", sa.Date(), nullable=True))
+
+    if op.get_bind().dialect.name == "sqlite":
+        expiry_day = sa.func.date(pastes.c.expiresat)
+    else:
+        expiry_day = sa.cast(pastes.c.expiresat, sa.Date)
+    op.execute(
+        pastes.update().values(
+            expires_bucket=sa.case(
+                (pastes.c.expiresat.is_(None), sa.literal(date.max, sa.Date)),
+                else_=expiry_day,
+            )
+        )
+    )
+
+    with op.batch_alter_table("pastes") as batch_op:
+        batch_op.alter_column("expires_bucket", existing_type=sa.Date(), nullable=False)
+
+    op.create_index("ix_pastes_expiresat", "pastes", ["expiresat"])
+    op.create_index("ix_pastes_created_at", "pastes", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_pastes_created_at", table_name="pastes")
+    op.drop_index("ix_pastes_expiresat", table_name="pastes")
+    with op.batch_alter_table("pastes") as batch_op:
+        batch_op.drop_column("expires_bucket")
@@ -0,0 +1,39 @@
+"""Add insertion time to pastes
+
+Imports keep the original created_at of their pastes, the paste id filter
+catches up on the time rows were actually inserted instead.
+
+Revision ID: edad02c37e3f
+Revises: a5282664a08f
+Create Date: 2026-10-19 21:04:12.518733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "edad02c37e3f"
+down_revision: Union[str, None] = "a5282664a08f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+pastes = sa.table(
+    "pastes",
+    sa.column("created_at", sa.DateTime),
+    sa.column("inserted_at", sa.DateTime),
+)
+
+
+def upgrade() -> None:
+    op.add_column("pastes", sa.Column("inserted_at", sa.DateTime(), nullable=True))
+    op.execute(pastes.update().values(inserted_at=pastes.c.created_at))
+    op.create_index("ix_pastes_inserted_at", "pastes", ["inserted_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_pastes_inserted_at", table_name="pastes")
+    with op.batch_alter_table("pastes") as batch_op:
+        batch_op.drop_column("inserted_at")
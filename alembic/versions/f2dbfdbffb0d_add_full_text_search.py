@@ -0,0 +1,76 @@
+"""Add full-text search index over paste bodies
+
+Revision ID: f2dbfdbffb0d
+Revises: f6777b7f41af
+Create Date: 2026-10-19 16:12:40.118274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "f2dbfdbffb0d"
+down_revision: Union[str, None] = "f6777b7f41af"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+pastes = sa.table(
+    "pastes",
+    sa.column("pasteID", sa.String),
+    sa.column("content", sa.Text),
+    sa.column("search_indexed", sa.Boolean),
+)
+
+_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.add_column("pastes", sa.Column("search_indexed", sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_index(
+        "ix_pastes_search_pending",
+        "pastes",
+        ["pasteID"],
+        sqlite_where=sa.text("NOT search_indexed"),
+        postgresql_where=sa.text("NOT search_indexed"),
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        op.execute("CREATE VIRTUAL TABLE paste_search USING fts5(paste_id UNINDEXED, body)")
+        # Rowids are derived from the paste ids (see search.search_rowid), which SQL cannot compute
+        rows = bind.execute(sa.select(pastes.c.pasteID, pastes.c.content).where(pastes.c.content.is_not(None)))
+        insert = sa.text("INSERT INTO paste_search (rowid, paste_id, body) VALUES (:rowid, :paste_id, :body)")
+        while batch := rows.fetchmany(_BATCH_SIZE):
+            bind.execute(
+                insert,
+                [
+                    {"rowid": int.from_bytes(paste_id.encode("ascii"), "big"), "paste_id": paste_id, "body": content}
+                    for paste_id, content in batch
+                ],
+            )
+    else:
+        op.execute(
+            """
+            CREATE TABLE paste_search (
+                paste_id VARCHAR(4) PRIMARY KEY,
+                body TEXT NOT NULL,
+                document TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', body)) STORED
+            )
+            """
+        )
+        op.execute("""INSERT INTO paste_search (paste_id, body) SELECT "pasteID", content FROM pastes WHERE content IS NOT NULL""")
+        op.execute("CREATE INDEX ix_paste_search_document ON paste_search USING GIN (document)")
+
+    op.execute(pastes.update().where(pastes.c.content.is_not(None)).values(search_indexed=True))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        op.execute("DROP INDEX ix_paste_search_document")
+    op.execute("DROP TABLE paste_search")
+    op.drop_index("ix_pastes_search_pending", table_name="pastes")
+    with op.batch_alter_table("pastes") as batch_op:
+        batch_op.drop_column("search_indexed")
@@ -0,0 +1,38 @@
+"""Add upload sessions for resumable uploads
+
+Revision ID: f6777b7f41af
+Revises: 70ff0cd23fcc
+Create Date: 2026-10-19 15:06:18.531907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "f6777b7f41af"
+down_revision: Union[str, None] = "70ff0cd23fcc"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "upload_sessions",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("length", sa.BigInteger(), nullable=True),
+        sa.Column("offset", sa.BigInteger(), nullable=False),
+        sa.Column("filename", sa.String(length=255), nullable=True),
+        sa.Column("extension", sa.String(length=50), nullable=True),
+        sa.Column("expiresat", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_upload_sessions_updated_at", "upload_sessions", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_upload_sessions_updated_at", table_name="upload_sessions")
+    op.drop_table("upload_sessions")
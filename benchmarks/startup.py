@@ -0,0 +1,62 @@
+"""
+Measure how long a worker takes to import the app and to run its lifespan startup,
+each sample in a fresh interpreter like a newly spawned uvicorn worker.
+
+    pdm run bench_startup --runs 10 --max-import-ms 800
+
+Exits non-zero when the median import time exceeds `--max-import-ms`. The settings
+(database URL, storage, ...) come from the environment or `.env` as for the app.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+SAMPLE = """
+import asyncio, json, sys, time
+
+start = time.perf_counter()
+from src.paste.main import app
+imported = time.perf_counter()
+
+
+async def startup() -> None:
+    async with app.router.lifespan_context(app):
+        pass
+
+
+asyncio.run(startup())
+started = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "startup_ms": (started - imported) * 1000}))
+"""
+
+
+def sample() -> dict:
+    result = subprocess.run([sys.executable, "-c", SAMPLE], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.runs)]
+    for key in ("import_ms", "startup_ms"):
+        values = [s[key] for s in samples]
+        print(f"{key:>10}: median {statistics.median(values):8.1f}  min {min(values):8.1f}  max {max(values):8.1f}")
+
+    median_import = statistics.median(s["import_ms"] for s in samples)
+    if args.max_import_ms is not None and median_import > args.max_import_ms:
+        print(f"Import time {median_import:.1f} ms exceeds the {args.max_import_ms:.1f} ms budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,214 @@
-import requests
-from typing import Union
+import asyncio
+import time
+import uuid as uuid_lib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Statuses the server uses for "try again later": rate limiting and overload
+RETRY_STATUS_CODES = (429, 503)
+UPLOAD_CHUNK_SIZE = 64 * 1024
+RESUMABLE_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _retry_delay(attempt: int, backoff_factor: float, retry_after: Optional[str]) -> float:
+    """Seconds to wait before retry number `attempt`, honouring a numeric Retry-After header."""
+    if retry_after:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+    return backoff_factor * (2**attempt)
+
+
+def _read_chunk(path: Path, offset: int, chunk_size: int) -> bytes:
+    with open(path, "rb") as file:
+        file.seek(offset)
+        return file.read(chunk_size)
+
+
+def _uuid_from_url(url: str) -> str:
+    return url.strip().rstrip("/").rsplit("/", 1)[-1]
+
+
+def _upload_filename(path: Path, file_extension: Optional[str]) -> str:
+    if not file_extension:
+        return path.name
+    return f"{path.stem}{file_extension if file_extension.startswith('.') else '.' + file_extension}"
+
+
+class _MultipartFileBody:
+    """
+    A multipart/form-data body that streams a file from disk instead of loading
+    it into memory. The length is known up front so it is sent with a
+    Content-Length header, and iterating again re-reads the file, which makes
+    retries possible.
+    """
+
+    def __init__(self, path: Path, filename: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> None:
+        self.path = path
+        self.chunk_size = chunk_size
+        boundary = uuid_lib.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self._head = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'
+        ).encode("utf-8")
+        self._tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        self._length = len(self._head) + path.stat().st_size + len(self._tail)
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Content-Type": self.content_type, "Content-Length": str(self._length)}
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._head
+        with open(self.path, "rb") as f:
+            while chunk := f.read(self.chunk_size):
+                yield chunk
+        yield self._tail
+
+    async def aiter_chunks(self) -> AsyncIterator[bytes]:
+        yield self._head
+        with open(self.path, "rb") as f:
+            while chunk := await asyncio.to_thread(f.read, self.chunk_size):
+                yield chunk
+        yield self._tail
+
+
+class _AsyncMultipartFileBody:
+    """Async-only view of a `_MultipartFileBody`: httpx treats anything with `__iter__` as a sync stream."""
+
+    def __init__(self, body: _MultipartFileBody) -> None:
+        self.body = body
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self.body.aiter_chunks()
 
 
 class PasteBinSDK:
-    def __init__(self, base_url: str = "https://paste.fosscu.org"):
+    def __init__(
+        self,
+        base_url: str = "https://paste.fosscu.org",
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        pool_maxsize: int = 10,
+    ):
+        """
+        :param base_url: Base URL of the paste.py server
+        :param timeout: Timeout in seconds for connecting and for each read
+        :param max_retries: How many times a request answered with 429 or 503 is retried
+        :param backoff_factor: Base of the exponential backoff between retries, in seconds
+        :param pool_maxsize: Number of keep-alive connections kept open to the server
+        """
         self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.pool_maxsize = pool_maxsize
+        # A session reuses TCP+TLS connections across calls instead of opening one per request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "PasteBinSDK":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
 
-    def create_paste(self, content: Union[str, Path], file_extension: str) -> str:
+    def _request(self, method: str, path: str, **kwargs: Any) -> requests.Response:
+        for attempt in range(self.max_retries + 1):
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                break
+            time.sleep(_retry_delay(attempt, self.backoff_factor, response.headers.get("Retry-After")))
+        response.raise_for_status()
+        return response
+
+    def create_paste(self, content: Union[str, Path], file_extension: str, expiration: Optional[str] = None) -> str:
         """
         Create a new paste.
         :param content: The content to paste, either as a string or a Path to a file
         :param file_extension: File extension for syntax highlighting (required)
+        :param expiration: Optional expiration: '1h', '1d', '1w', '1m' or an ISO datetime
         :return: The unique identifier of the created paste
         """
+        if isinstance(content, Path):
+            return self.upload_file(content, file_extension=file_extension, expiration=expiration)
         try:
-            if isinstance(content, Path):
-                with open(content, "r", encoding="utf-8") as f:
-                    content = f.read()
-
-            data = {"content": content, "extension": file_extension}
-            response = requests.post(f"{self.base_url}/api/paste", json=data)
-            response.raise_for_status()
+            data = {"content": content, "extension": file_extension, "expiration": expiration}
+            response = self._request("POST", "/api/paste", json=data)
             result = response.json()
             return result["uuid"]
         except requests.RequestException as e:
             raise RuntimeError(f"Error creating paste: {str(e)}")
 
+    def upload_file(self, path: Path, file_extension: Optional[str] = None, expiration: Optional[str] = None) -> str:
+        """
+        Upload a file through the /file endpoint, streaming it from disk.
+        :param path: Path to the file to upload
+        :param file_extension: Extension used for syntax highlighting, defaults to the file's own
+        :param expiration: Optional expiration: '1h', '1d', '1w', '1m' or an ISO datetime
+        :return: The unique identifier of the created paste
+        """
+        try:
+            body = _MultipartFileBody(path, _upload_filename(path, file_extension))
+            params = {"expiration": expiration} if expiration else None
+            response = self._request("POST", "/file", data=body, headers=body.headers, params=params)
+            return _uuid_from_url(response.text)
+        except (OSError, requests.RequestException) as e:
+            raise RuntimeError(f"Error uploading file: {str(e)}")
+
+    def upload_resumable(
+        self,
+        path: Path,
+        file_extension: Optional[str] = None,
+        expiration: Optional[str] = None,
+        chunk_size: int = RESUMABLE_CHUNK_SIZE,
+    ) -> str:
+        """
+        Upload a large file in chunks through the resumable upload API. A failed chunk
+        is resent from the offset the server reports, so a dropped connection only
+        costs the chunk in flight.
+        :param path: Path to the file to upload
+        :param file_extension: Extension used for syntax highlighting, defaults to the file's own
+        :param expiration: Optional expiration: '1h', '1d', '1w', '1m' or an ISO datetime
+        :param chunk_size: Bytes sent per request
+        :return: The unique identifier of the created paste
+        """
+        try:
+            length = path.stat().st_size
+            data = {"length": length, "filename": _upload_filename(path, file_extension), "expiration": expiration}
+            upload = self._request("POST", "/api/uploads", json=data).json()
+            upload_path = f"/api/uploads/{upload['id']}"
+            offset, failures = upload["offset"], 0
+            while offset < length:
+                chunk = _read_chunk(path, offset, chunk_size)
+                try:
+                    response = self._request("PATCH", upload_path, data=chunk, headers={"Upload-Offset": str(offset)})
+                    offset, failures = int(response.headers["Upload-Offset"]), 0
+                except requests.RequestException:
+                    failures += 1
+                    if failures > self.max_retries:
+                        raise
+                    time.sleep(_retry_delay(failures - 1, self.backoff_factor, None))
+                    offset = self._request("GET", upload_path).json()["offset"]
+            response = self._request("POST", f"{upload_path}/complete", data=b"")
+            return response.json()["uuid"]
+        except (OSError, requests.RequestException) as e:
+            raise RuntimeError(f"Error uploading file: {str(e)}")
+
     def get_paste(self, uuid: str) -> dict:
         """
         Retrieve a paste by its unique identifier.
@@ -34,12 +216,38 @@ class PasteBinSDK:
         :return: A dictionary containing the paste details (uuid, content, extension)
         """
         try:
-            response = requests.get(f"{self.base_url}/api/paste/{uuid}")
-            response.raise_for_status()
+            response = self._request("GET", f"/api/paste/{uuid}")
             return response.json()
         except requests.RequestException as e:
             raise RuntimeError(f"Error retrieving paste: {str(e)}")
 
+    def create_many(self, pastes: Iterable[Tuple[Union[str, Path], str]], concurrency: int = 8) -> List[str]:
+        """
+        Create several pastes concurrently over the pooled connections.
+
+        The worker threads share `session`. requests does not document Session as
+        thread-safe, what is shared here is the urllib3 connection pool, which is, and
+        the cookie jar, which locks and stays empty as the server sets no cookies. Do
+        not change the session's settings while a batch runs. There are at most
+        `pool_maxsize` workers, so each one finds a pooled connection.
+        :param pastes: (content, file_extension) pairs, content being a string or a Path
+        :param concurrency: Maximum number of requests in flight
+        :return: The identifiers of the created pastes, in input order
+        """
+        with ThreadPoolExecutor(max_workers=min(concurrency, self.pool_maxsize)) as executor:
+            return list(executor.map(lambda paste: self.create_paste(*paste), pastes))
+
+    def get_many(self, uuids: Iterable[str], concurrency: int = 8) -> List[dict]:
+        """
+        Retrieve several pastes concurrently over the pooled connections, sharing
+        `session` between threads as `create_many` does.
+        :param uuids: Identifiers of the pastes to fetch
+        :param concurrency: Maximum number of requests in flight
+        :return: The paste details, in input order
+        """
+        with ThreadPoolExecutor(max_workers=min(concurrency, self.pool_maxsize)) as executor:
+            return list(executor.map(self.get_paste, uuids))
+
     def delete_paste(self, uuid: str) -> str:
         """
         Delete a paste by its unique identifier.
@@ -47,8 +255,7 @@ class PasteBinSDK:
         :return: A confirmation message
         """
         try:
-            response = requests.delete(f"{self.base_url}/paste/{uuid}")
-            response.raise_for_status()
+            response = self._request("DELETE", f"/paste/{uuid}")
             return response.text
         except requests.RequestException as e:
             raise RuntimeError(f"Error deleting paste: {str(e)}")
@@ -59,8 +266,199 @@ class PasteBinSDK:
         :return: A dictionary of supported languages
         """
         try:
-            response = requests.get(f"{self.base_url}/languages.json")
-            response.raise_for_status()
+            response = self._request("GET", "/languages.json")
             return response.json()
         except requests.RequestException as e:
             raise RuntimeError(f"Error fetching languages: {str(e)}")
+
+
+class AsyncPasteBinSDK:
+    def __init__(
+        self,
+        base_url: str = "https://paste.fosscu.org",
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        max_connections: int = 20,
+        http2: bool = True,
+    ):
+        """
+        asyncio client sharing one pool of keep-alive connections, built on httpx.
+        :param base_url: Base URL of the paste.py server
+        :param timeout: Timeout in seconds for connecting and for each read
+        :param max_retries: How many times a request answered with 429 or 503 is retried
+        :param backoff_factor: Base of the exponential backoff between retries, in seconds
+        :param max_connections: Maximum number of connections opened to the server
+        :param http2: Negotiate HTTP/2 when the `h2` package is installed (`pip install httpx[http2]`)
+        """
+        import httpx
+
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                http2 = False
+
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_connections = max_connections
+        self._httpx = httpx
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            http2=http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncPasteBinSDK":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        for attempt in range(self.max_retries + 1):
+            response = await self.client.request(method, path, **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                break
+            await asyncio.sleep(_retry_delay(attempt, self.backoff_factor, response.headers.get("Retry-After")))
+        response.raise_for_status()
+        return response
+
+    async def create_paste(self, content: Union[str, Path], file_extension: str, expiration: Optional[str] = None) -> str:
+        """
+        Create a new paste.
+        :param content: The content to paste, either as a string or a Path to a file
+        :param file_extension: File extension for syntax highlighting (required)
+        :param expiration: Optional expiration: '1h', '1d', '1w', '1m' or an ISO datetime
+        :return: The unique identifier of the created paste
+        """
+        if isinstance(content, Path):
+            return await self.upload_file(content, file_extension=file_extension, expiration=expiration)
+        try:
+            data = {"content": content, "extension": file_extension, "expiration": expiration}
+            response = await self._request("POST", "/api/paste", json=data)
+            return response.json()["uuid"]
+        except self._httpx.HTTPError as e:
+            raise RuntimeError(f"Error creating paste: {str(e)}")
+
+    async def upload_file(self, path: Path, file_extension: Optional[str] = None, expiration: Optional[str] = None) -> str:
+        """
+        Upload a file through the /file endpoint, streaming it from disk.
+        :param path: Path to the file to upload
+        :param file_extension: Extension used for syntax highlighting, defaults to the file's own
+        :param expiration: Optional expiration: '1h', '1d', '1w', '1m' or an ISO datetime
+        :return: The unique identifier of the created paste
+        """
+        try:
+            body = _MultipartFileBody(path, _upload_filename(path, file_extension))
+            params = {"expiration": expiration} if expiration else None
+            response = await self._request("POST", "/file", content=_AsyncMultipartFileBody(body), headers=body.headers, params=params)
+            return _uuid_from_url(response.text)
+        except (OSError, self._httpx.HTTPError) as e:
+            raise RuntimeError(f"Error uploading file: {str(e)}")
+
+    async def upload_resumable(
+        self,
+        path: Path,
+        file_extension: Optional[str] = None,
+        expiration: Optional[str] = None,
+        chunk_size: int = RESUMABLE_CHUNK_SIZE,
+    ) -> str:
+        """
+        Upload a large file in chunks through the resumable upload API. A failed chunk
+        is resent from the offset the server reports, so a dropped connection only
+        costs the chunk in flight.
+        :param path: Path to the file to upload
+        :param file_extension: Extension used for syntax highlighting, defaults to the file's own
+        :param expiration: Optional expiration: '1h', '1d', '1w', '1m' or an ISO datetime
+        :param chunk_size: Bytes sent per request
+        :return: The unique identifier of the created paste
+        """
+        try:
+            length = path.stat().st_size
+            data = {"length": length, "filename": _upload_filename(path, file_extension), "expiration": expiration}
+            upload = (await self._request("POST", "/api/uploads", json=data)).json()
+            upload_path = f"/api/uploads/{upload['id']}"
+            offset, failures = upload["offset"], 0
+            while offset < length:
+                chunk = await asyncio.to_thread(_read_chunk, path, offset, chunk_size)
+                try:
+                    response = await self._request("PATCH", upload_path, content=chunk, headers={"Upload-Offset": str(offset)})
+                    offset, failures = int(response.headers["Upload-Offset"]), 0
+                except self._httpx.HTTPError:
+                    failures += 1
+                    if failures > self.max_retries:
+                        raise
+                    await asyncio.sleep(_retry_delay(failures - 1, self.backoff_factor, None))
+                    offset = (await self._request("GET", upload_path)).json()["offset"]
+            response = await self._request("POST", f"{upload_path}/complete", content=b"")
+            return response.json()["uuid"]
+        except (OSError, self._httpx.HTTPError) as e:
+            raise RuntimeError(f"Error uploading file: {str(e)}")
+
+    async def get_paste(self, uuid: str) -> dict:
+        """
+        Retrieve a paste by its unique identifier.
+        :param uuid: The unique identifier of the paste
+        :return: A dictionary containing the paste details (uuid, content, extension)
+        """
+        try:
+            response = await self._request("GET", f"/api/paste/{uuid}")
+            return response.json()
+        except self._httpx.HTTPError as e:
+            raise RuntimeError(f"Error retrieving paste: {str(e)}")
+
+    async def _gather_limited(self, coroutines: Sequence[Any], concurrency: int) -> List[Any]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(coroutine: Any) -> Any:
+            async with semaphore:
+                return await coroutine
+
+        return list(await asyncio.gather(*(run(coroutine) for coroutine in coroutines)))
+
+    async def create_many(self, pastes: Iterable[Tuple[Union[str, Path], str]], concurrency: int = 16) -> List[str]:
+        """
+        Create several pastes concurrently over the pooled connections.
+        :param pastes: (content, file_extension) pairs, content being a string or a Path
+        :param concurrency: Maximum number of requests in flight
+        :return: The identifiers of the created pastes, in input order
+        """
+        return await self._gather_limited([self.create_paste(*paste) for paste in pastes], concurrency)
+
+    async def get_many(self, uuids: Iterable[str], concurrency: int = 16) -> List[dict]:
+        """
+        Retrieve several pastes concurrently over the pooled connections.
+        :param uuids: Identifiers of the pastes to fetch
+        :param concurrency: Maximum number of requests in flight
+        :return: The paste details, in input order
+        """
+        return await self._gather_limited([self.get_paste(uuid) for uuid in uuids], concurrency)
+
+    async def delete_paste(self, uuid: str) -> str:
+        """
+        Delete a paste by its unique identifier.
+        :param uuid: The unique identifier of the paste
+        :return: A confirmation message
+        """
+        try:
+            response = await self._request("DELETE", f"/paste/{uuid}")
+            return response.text
+        except self._httpx.HTTPError as e:
+            raise RuntimeError(f"Error deleting paste: {str(e)}")
+
+    async def get_languages(self) -> dict:
+        """
+        Get the list of supported languages for syntax highlighting.
+        :return: A dictionary of supported languages
+        """
+        try:
+            response = await self._request("GET", "/languages.json")
+            return response.json()
+        except self._httpx.HTTPError as e:
+            raise RuntimeError(f"Error fetching languages: {str(e)}")
@@ -0,0 +1,17 @@
+from setuptools import find_packages, setup
+
+setup(
+    name="paste-py-sdk",
+    version="0.1.0",
+    description="Client for the paste.py pastebin",
+    license="MIT",
+    packages=find_packages(),
+    python_requires=">=3.10",
+    install_requires=["requests"],
+    extras_require={
+        # AsyncPasteBinSDK
+        "async": ["httpx"],
+        # AsyncPasteBinSDK negotiating HTTP/2
+        "http2": ["httpx[http2]"],
+    },
+)
@@ -0,0 +1,29 @@
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+from .config import get_settings
+
+
+def is_admin(authorization: Optional[str]) -> bool:
+    """Whether an `Authorization` header carries the admin token, always False while it is unset."""
+    token = get_settings().ADMIN_TOKEN
+    scheme, _, credentials = (authorization or "").partition(" ")
+    return bool(token) and scheme.lower() == "bearer" and secrets.compare_digest(credentials.encode(), token.encode())
+
+
+async def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Dependency guarding operator endpoints that see every paste, such as search.
+    They are disabled unless `ADMIN_TOKEN` is set, and expect `Authorization: Bearer <token>`.
+    """
+    if not get_settings().ADMIN_TOKEN:
+        raise HTTPException(detail="Admin endpoints are disabled", status_code=status.HTTP_403_FORBIDDEN)
+
+    if not is_admin(authorization):
+        raise HTTPException(
+            detail="Invalid admin token",
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,251 @@
+import asyncio
+import base64
+import binascii
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .crud import index_paste_body, lock_paste_ids, set_paste_body, stream_paste_bytes
+from .database import ReadSession_Local, Session_Local
+from .idfilter import paste_filter
+from .models import Paste
+from .storage import get_storage
+
+logger = logging.getLogger("paste")
+
+# Imports commit a batch once it holds this many line bytes, however few pastes that is
+_BATCH_MAX_BYTES = 64 * 1024 * 1024
+
+# Object-backed bodies are base64-encoded this many bytes at a time, a multiple of 3
+# so the pieces join into a single encoding without padding in between
+_ENCODE_CHUNK_BYTES = 3 * 256 * 1024
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def export_record(paste: Paste) -> Dict[str, Any]:
+    """The fields of `paste` and, unless it is object-backed, its body."""
+    record: Dict[str, Any] = {
+        "id": paste.pasteID,
+        "extension": paste.extension,
+        "content_type": paste.content_type,
+        "encoding": paste.encoding,
+        "created_at": _timestamp(paste.created_at),
+        "expiresat": _timestamp(paste.expiresat),
+    }
+    if not paste.object_key:
+        record["content"] = paste.content or ""
+    return record
+
+
+def _encode_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        cut = len(pending) - len(pending) % 3
+        if cut >= _ENCODE_CHUNK_BYTES:
+            yield base64.b64encode(pending[:cut])
+            pending = pending[cut:]
+    yield base64.b64encode(pending)
+
+
+def export_lines(paste: Paste) -> Iterator[bytes]:
+    """
+    The export line of `paste` in pieces. Object-backed bodies may be any bytes, they
+    are inlined base64-encoded while they are streamed from the storage backend.
+    """
+    record = orjson.dumps(export_record(paste))
+    if not paste.object_key:
+        yield record + b"\n"
+        return
+    chunks = _encode_stream(stream_paste_bytes(paste))
+    # The first piece includes the first chunk, a missing object fails before any of the line is out
+    yield record[:-1] + b',"body":"' + next(chunks)
+    yield from chunks
+    yield b'"}\n'
+
+
+def export_pastes() -> Iterator[bytes]:
+    """
+    Every paste that has not expired as one JSON object per line, bodies included.
+    Rows come from a server-side cursor `EXPORT_BATCH_SIZE` at a time, so memory use
+    does not grow with the table. Reads from a replica when replicas are configured.
+    """
+    db: Session = ReadSession_Local()
+    try:
+        query = (
+            select(Paste)
+            .where(or_(Paste.expiresat.is_(None), Paste.expiresat > datetime.utcnow()))
+            .order_by(Paste.created_at, Paste.pasteID)
+            .execution_options(yield_per=get_settings().EXPORT_BATCH_SIZE)
+        )
+        max_bytes = get_settings().BACKUP_MAX_BODY_BYTES
+        for paste in db.execute(query).scalars():
+            if (paste.size or 0) > max_bytes:
+                logger.warning(f"Paste {paste.pasteID} is larger than {max_bytes} bytes, not exporting it")
+                continue
+            lines = export_lines(paste)
+            try:
+                first = next(lines)
+            except FileNotFoundError:
+                logger.warning(f"Object of paste {paste.pasteID} is missing, not exporting it")
+                continue
+            yield first
+            yield from lines
+    finally:
+        db.close()
+
+
+def _parse_timestamp(record: Dict[str, Any], key: str) -> Optional[datetime]:
+    value = record.get(key)
+    return datetime.fromisoformat(value) if value else None
+
+
+def parse_record(line: bytes) -> Tuple[Paste, bytes]:
+    """The paste described by an exported line, without its body, and the body."""
+    try:
+        record = orjson.loads(line)
+        if "body" in record:
+            body = base64.b64decode(record["body"], validate=True)
+        else:
+            body = record["content"].encode("utf-8")
+        paste = Paste(
+            pasteID=record["id"],
+            extension=record.get("extension"),
+            created_at=_parse_timestamp(record, "created_at"),
+            expiresat=_parse_timestamp(record, "expiresat"),
+            content_type=record.get("content_type"),
+            encoding=record.get("encoding"),
+        )
+    except (orjson.JSONDecodeError, binascii.Error, KeyError, TypeError, AttributeError, ValueError) as e:
+        raise ImportFormatError(f"Invalid paste record: {e}") from e
+    if not isinstance(paste.pasteID, str) or not 1 <= len(paste.pasteID) <= 4:
+        raise ImportFormatError(f"Invalid paste id {paste.pasteID!r}")
+    return paste, body
+
+
+def import_batch(records: List[Tuple[Paste, bytes]], executor: ThreadPoolExecutor) -> Tuple[int, int]:
+    """
+    Insert a batch of parsed records, uploading object-backed bodies in parallel.
+    Pastes that already exist or have expired are skipped, so an interrupted import
+    can simply be run again. Returns the number of pastes imported and skipped.
+    """
+    db: Session = Session_Local()
+    uploaded: List[str] = []
+    try:
+        ids = [paste.pasteID for paste, _ in records]
+        # Held until the commit, pastes created meanwhile cannot take the ids checked here
+        lock_paste_ids(db, ids)
+        existing = set(db.execute(select(Paste.pasteID).where(Paste.pasteID.in_(ids))).scalars())
+        now = datetime.utcnow()
+        seen = set()
+        new: List[Tuple[Paste, bytes]] = []
+        for paste, body in records:
+            if paste.pasteID in existing or paste.pasteID in seen or (paste.expiresat is not None and paste.expiresat <= now):
+                continue
+            seen.add(paste.pasteID)
+            new.append((paste, body))
+
+        def store_body(record: Tuple[Paste, bytes]) -> None:
+            paste, body = record
+            set_paste_body(paste, body, content_type=paste.content_type, encoding=paste.encoding)
+
+        # Bodies too large to keep inline go to the storage backend, several at a time
+        try:
+            list(executor.map(store_body, new))
+        finally:
+            uploaded = [paste.object_key for paste, _ in new if paste.object_key]
+
+        pastes = [paste for paste, _ in new]
+        # Inserted in batches of many rows per statement by the unit of work, ids are known
+        db.add_all(pastes)
+        db.flush()
+        for paste in pastes:
+            index_paste_body(db, paste)
+        db.commit()
+        for paste in pastes:
+            paste_filter.add(paste.pasteID)
+        return len(pastes), len(records) - len(pastes)
+    except Exception:
+        db.rollback()
+        storage = get_storage()
+        for object_key in uploaded:
+            storage.delete(object_key)
+        raise
+    finally:
+        db.close()
+
+
+def import_lines(lines: List[Tuple[int, bytes]], executor: ThreadPoolExecutor) -> Tuple[int, int]:
+    """Parse and insert a batch of numbered export lines, see `import_batch()`."""
+    records: List[Tuple[Paste, bytes]] = []
+    for line_number, line in lines:
+        try:
+            records.append(parse_record(line))
+        except ImportFormatError as e:
+            raise ImportFormatError(f"Line {line_number}: {e}") from e
+    return import_batch(records, executor)
+
+
+async def import_pastes(chunks: AsyncIterator[bytes]) -> Tuple[int, int]:
+    """
+    Import pastes from the lines of an export as they arrive. At most one batch is
+    held in memory at a time, and a line may not be longer than an encoded body of
+    `BACKUP_MAX_BODY_BYTES`. Lines are only split on the event loop, batches are parsed
+    and committed in a worker thread as they complete. A failing line stops the import
+    after the batches before it.
+    """
+    settings = get_settings()
+    max_line = settings.BACKUP_MAX_BODY_BYTES * 4 // 3 + 64 * 1024
+    imported = skipped = 0
+    batch: List[Tuple[int, bytes]] = []
+    batch_bytes = 0
+    line_number = 0
+    buffer = bytearray()
+
+    with ThreadPoolExecutor(max_workers=settings.IMPORT_UPLOAD_CONCURRENCY, thread_name_prefix="paste-import") as executor:
+
+        async def flush() -> None:
+            nonlocal imported, skipped, batch, batch_bytes
+            if batch:
+                added, ignored = await asyncio.to_thread(import_lines, batch, executor)
+                imported += added
+                skipped += ignored
+            batch, batch_bytes = [], 0
+
+        async def add_line(line: bytes) -> None:
+            nonlocal batch_bytes, line_number
+            line_number += 1
+            if not line or line.isspace():
+                return
+            batch.append((line_number, line))
+            batch_bytes += len(line)
+            if len(batch) >= settings.IMPORT_BATCH_SIZE or batch_bytes >= _BATCH_MAX_BYTES:
+                await flush()
+
+        async for chunk in chunks:
+            buffer += chunk
+            start = 0
+            while (end := buffer.find(b"\n", start)) != -1:
+                await add_line(bytes(buffer[start:end]))
+                start = end + 1
+            del buffer[:start]
+            if len(buffer) > max_line:
+                raise ImportFormatError(f"Line {line_number + 1}: longer than {max_line} bytes")
+        if buffer:
+            await add_line(bytes(buffer))
+        await flush()
+
+    return imported, skipped
@@ -0,0 +1,160 @@
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from types import ModuleType
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .config import get_settings
+
+# Types worth compressing, everything else (images, archives, msgpack) is sent as is
+_COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/json",
+        "application/x-ndjson",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml",
+    }
+)
+
+# Responses compressed while they are sent favour speed, cached ones are compressed once
+STREAM_QUALITY: Dict[str, int] = {"br": 4, "gzip": 6}
+CACHED_QUALITY: Dict[str, int] = {"br": 9, "gzip": 9}
+
+
+@lru_cache
+def _brotli() -> Optional[ModuleType]:
+    """The brotli bindings if either package is installed, gzip is used otherwise."""
+    try:
+        import brotli
+
+        return brotli
+    except ImportError:
+        pass
+    try:
+        import brotlicffi
+
+        return brotlicffi
+    except ImportError:
+        return None
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type in _COMPRESSIBLE_TYPES
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """The best encoding the client accepts, brotli before gzip, None for identity."""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    fallback = accepted.get("*", 0.0)
+    if _brotli() is not None and accepted.get("br", fallback) > 0:
+        return "br"
+    if accepted.get("gzip", fallback) > 0:
+        return "gzip"
+    return None
+
+
+class Compressor:
+    """Incremental gzip or brotli compression of a body sent in chunks."""
+
+    def __init__(self, encoding: str, quality: int) -> None:
+        if encoding == "br":
+            brotli = _brotli()
+            # negotiate_encoding() only picks br when the module is installed
+            assert brotli is not None
+            compressor = brotli.Compressor(quality=quality)
+            self.compress: Callable[[bytes], bytes] = compressor.process
+            self.finish: Callable[[], bytes] = compressor.finish
+        else:
+            # wbits 31 writes the gzip header and trailer around the deflate stream
+            compressor = zlib.compressobj(quality, zlib.DEFLATED, 31)
+            self.compress = compressor.compress
+            self.finish = compressor.flush
+
+
+def compress(data: bytes, encoding: str, quality: int) -> bytes:
+    compressor = Compressor(encoding, quality)
+    return compressor.compress(data) + compressor.finish()
+
+
+class CompressedCache:
+    """
+    Bounded LRU of response bodies that are the same for every request, such as
+    rendered pastes and languages.json. Each body is kept in every encoding clients
+    asked for, so it is built and compressed once rather than on every response.
+    """
+
+    def __init__(self) -> None:
+        self._entries: "OrderedDict[Hashable, Dict[str, bytes]]" = OrderedDict()
+        self._size: int = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, produce: Callable[[], bytes], encoding: Optional[str], min_size: int) -> Tuple[bytes, Optional[str]]:
+        """
+        The body under `key`, built with `produce` on a miss, in `encoding` unless it is
+        smaller than `min_size`. Returns the body and the encoding it is in.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        changed = entry is None
+        if entry is None:
+            entry = {"identity": produce()}
+
+        if encoding is None or len(entry["identity"]) < min_size:
+            encoding = None
+        elif encoding not in entry:
+            entry = {**entry, encoding: compress(entry["identity"], encoding, CACHED_QUALITY[encoding])}
+            changed = True
+        if changed:
+            self._store(key, entry)
+        return entry[encoding or "identity"], encoding
+
+    def _store(self, key: Hashable, entry: Dict[str, bytes]) -> None:
+        max_bytes = get_settings().COMPRESSION_CACHE_MAX_BYTES
+        size = sum(len(body) for body in entry.values())
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= sum(len(body) for body in previous.values())
+            # A handful of huge pastes should not push out everything else
+            if size > max_bytes // 8:
+                return
+            self._entries[key] = entry
+            self._size += size
+            while self._size > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= sum(len(body) for body in evicted.values())
+
+
+response_cache = CompressedCache()
+
+
+def precompressed_response(request: Request, key: Hashable, produce: Callable[[], bytes], media_type: str) -> Response:
+    """
+    Response with the body under `key` in `response_cache`, in the encoding the client
+    prefers, or uncompressed when `COMPRESSION_ENABLED` is off.
+    """
+    encoding = choose_encoding(request.headers.get("accept-encoding", "")) if get_settings().COMPRESSION_ENABLED else None
+    body, encoding = response_cache.get(key, produce, encoding, get_settings().COMPRESSION_MIN_BYTES)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type=media_type, headers=headers)
@@ -1,16 +1,143 @@
 from functools import lru_cache
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Config(BaseSettings):
-    MINIO_CLIENT_LINK: str
-    MINIO_ACCESS_KEY: str
-    MINIO_SECRET_KEY: str
-    MINIO_BUCKET_NAME: str
+    MINIO_CLIENT_LINK: str = ""
+    MINIO_ACCESS_KEY: str = ""
+    MINIO_SECRET_KEY: str = ""
+    MINIO_BUCKET_NAME: str = ""
+    MINIO_SECURE: bool = True
     BASE_URL: str
     SQLALCHEMY_DATABASE_URL: str
 
+    # Connection pool of the primary database, which takes all writes
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    # Comma-separated read replica URLs, paste reads are spread over them round-robin
+    SQLALCHEMY_REPLICA_URLS: str = ""
+    REPLICA_POOL_SIZE: int = 5
+    REPLICA_MAX_OVERFLOW: int = 10
+    # A replica that failed is skipped for this long
+    REPLICA_RETRY_SECONDS: float = 30
+    # Pastes a worker wrote within this window are read from the primary
+    READ_YOUR_WRITES_SECONDS: float = 5
+
+    # Storage backend for large paste bodies
+    STORAGE_BACKEND: Literal["minio", "local"] = "minio"
+    LOCAL_STORAGE_PATH: str = "data/objects"
+    # Bodies larger than this many bytes go to the storage backend instead of the database
+    INLINE_CONTENT_MAX_BYTES: int = 102400
+    # Raw reads of object-backed pastes at least this large are redirected to a
+    # presigned URL so the object store serves the bytes (0 disables redirects)
+    RAW_REDIRECT_MIN_BYTES: int = 0
+    PRESIGNED_URL_EXPIRY_SECONDS: int = 300
+    # Bitmap of existing paste ids per worker, so probes for ids that do not exist are
+    # answered without a query each. Rebuilt every PASTE_ID_FILTER_REBUILD_SECONDS, misses
+    # catch up with pastes created on other workers at most every *_CATCH_UP_SECONDS.
+    PASTE_ID_FILTER_ENABLED: bool = True
+    PASTE_ID_FILTER_REBUILD_SECONDS: int = 3600
+    PASTE_ID_FILTER_CATCH_UP_SECONDS: float = 0.05
+
+    # Tiering: a background migrator moves inline bodies larger than INLINE_CONTENT_MAX_BYTES,
+    # or of at least TIERING_COLD_MIN_BYTES and not viewed for TIERING_COLD_DAYS, to the
+    # storage backend, and object-backed UTF-8 bodies of up to INLINE_CONTENT_MAX_BYTES with
+    # TIERING_HOT_MIN_VIEWS views, the last within TIERING_HOT_DAYS, into the database. Objects
+    # replaced by promotions or updates are deleted every TIERING_INTERVAL_SECONDS either way
+    TIERING_ENABLED: bool = False
+    TIERING_INTERVAL_SECONDS: int = 300
+    TIERING_BATCH_SIZE: int = 100
+    TIERING_COLD_DAYS: int = 30
+    TIERING_COLD_MIN_BYTES: int = 4096
+    TIERING_HOT_DAYS: int = 1
+    TIERING_HOT_MIN_VIEWS: int = 10
+
+    # Resumable uploads: chunks are spooled here until the upload is completed
+    UPLOAD_SPOOL_PATH: str = "data/uploads"
+    RESUMABLE_UPLOAD_MAX_BYTES: int = 1_000_000_000  # ~1GB
+    # Upload sessions without a new chunk for this long are garbage-collected
+    UPLOAD_SESSION_TTL_SECONDS: int = 86400
+
+    # Updated pastes keep their history, every Nth revision is stored whole to bound the
+    # number of deltas applied when reading an old revision
+    REVISION_SNAPSHOT_INTERVAL: int = 10
+    # Pastes larger than this cannot be updated, both versions are held in memory to compute the delta
+    REVISION_MAX_BYTES: int = 20_000_000  # ~20MB
+
+    # Paste views are counted in memory and written to the database in batches, at least
+    # this often and as soon as this many pastes have pending views
+    VIEW_FLUSH_INTERVAL_SECONDS: float = 10
+    VIEW_FLUSH_MAX_PENDING: int = 10_000
+
+    # Admission control, per worker: how many requests of each class run at once and how
+    # many more may wait for a slot (a limit of 0 disables the limit for that class).
+    # Browser views degrade to plain text while the render class is saturated.
+    ADMISSION_RENDER_LIMIT: int = 8
+    ADMISSION_RENDER_QUEUE: int = 16
+    ADMISSION_RAW_LIMIT: int = 64
+    ADMISSION_RAW_QUEUE: int = 256
+    ADMISSION_UPLOAD_LIMIT: int = 4
+    ADMISSION_UPLOAD_QUEUE: int = 8
+    ADMISSION_API_LIMIT: int = 32
+    ADMISSION_API_QUEUE: int = 128
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 5
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+
+    # Log records are written by a background thread, as JSON lines or uvicorn-style text
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["json", "text"] = "json"
+    # Share of requests traced (0 disables tracing), spans are written as OTLP/JSON lines
+    # to TRACE_EXPORT_PATH, or to stderr while unset
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_EXPORT_PATH: str = ""
+
+    # Profiling: admins can profile single requests with `X-Profile: sample|trace`, and
+    # 1 in PROFILING_SAMPLE_EVERY requests is sampled (0 disables it) keeping the slowest
+    # PROFILING_KEEP profiles in PROFILING_PATH. Nothing is installed while disabled.
+    PROFILING_ENABLED: bool = False
+    PROFILING_INTERVAL_SECONDS: float = 0.001
+    PROFILING_SAMPLE_EVERY: int = 0
+    PROFILING_KEEP: int = 20
+    PROFILING_PATH: str = "data/profiles"
+
+    # Bulk export and import: rows fetched per round trip while exporting, pastes per
+    # insert batch and parallel object uploads while importing. Bodies larger than
+    # BACKUP_MAX_BODY_BYTES are left out of exports and rejected by imports
+    EXPORT_BATCH_SIZE: int = 500
+    IMPORT_BATCH_SIZE: int = 500
+    IMPORT_UPLOAD_CONCURRENCY: int = 8
+    BACKUP_MAX_BODY_BYTES: int = 100_000_000  # ~100MB
+
+    # Text responses at least this large are compressed with brotli or gzip. Pages and
+    # languages.json are kept precompressed, in up to COMPRESSION_CACHE_MAX_BYTES per worker.
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Bearer token for operator endpoints such as search, which are disabled while unset
+    ADMIN_TOKEN: Optional[str] = None
+
+    # Full-text search: inline bodies are indexed when pastes are created, object-backed
+    # bodies only by the background indexer when SEARCH_INDEX_OBJECTS is enabled
+    SEARCH_INDEX_OBJECTS: bool = False
+    SEARCH_INDEX_INTERVAL_SECONDS: int = 60
+    # Only the start of longer bodies is indexed. Kept well below what fills PostgreSQL's
+    # 1MB tsvector limit, bodies with many distinct words need more than a byte per char.
+    SEARCH_INDEX_MAX_CHARS: int = 200_000
+
+    # How often the background prober refreshes the snapshot served by the health endpoints
+    HEALTH_PROBE_INTERVAL_SECONDS: float = 10
+
+    # PostgreSQL only: range-partition pastes by expiry day so expired pastes are removed by
+    # dropping whole partitions. Must be enabled before running the partitioning migration.
+    PARTITIONED_STORAGE: bool = False
+    PARTITION_PRECREATE_DAYS: int = 35
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 3600
+
     model_config = SettingsConfigDict(env_file=".env")
 
 
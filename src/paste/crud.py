@@ -0,0 +1,265 @@
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import or_, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .database import reads_from_replica, recent_writes, use_primary
+from .idfilter import paste_filter
+from .models import Paste, PasteRevision, PasteView
+from .search import index_paste, unindex_pastes
+from .storage import Buffer, get_storage
+from .tracing import SPAN_KIND_CLIENT, span
+from .utils import decode_text, generate_uuid, safe_content_type
+
+
+# Arbitrary constant namespacing the per-id advisory locks taken while claiming paste ids
+_PASTE_ID_LOCK_NAMESPACE = 7_271_002
+
+# Fresh ids tried before giving up, each one is taken with the odds of the id space filling up
+_CLAIM_ATTEMPTS = 10
+
+
+class PasteIdUnavailableError(Exception):
+    pass
+
+
+def lock_paste_ids(db: Session, paste_ids: Iterable[str]) -> None:
+    """
+    Serialize the claims of `paste_ids` until the transaction ends. The primary key of
+    a partitioned pastes table includes the expiry bucket, so on PostgreSQL two pastes
+    with the same id in different buckets would otherwise both be accepted.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        # SQLite runs one write transaction at a time, and pasteID alone is the primary key
+        return
+    # Sorted, so claims of overlapping batches cannot deadlock
+    for paste_id in sorted(set(paste_ids)):
+        db.execute(text("SELECT pg_advisory_xact_lock(:namespace, hashtext(:paste_id))"), {"namespace": _PASTE_ID_LOCK_NAMESPACE, "paste_id": paste_id})
+
+
+def _claim_paste_id(db: Session, paste: Paste) -> None:
+    """Give `paste` an id no other paste has, expired ones that are not deleted yet included."""
+    for _ in range(_CLAIM_ATTEMPTS):
+        paste_id = generate_uuid()
+        lock_paste_ids(db, [paste_id])
+        if db.query(Paste.pasteID).filter(Paste.pasteID == paste_id).first() is None:
+            paste.pasteID = paste_id
+            return
+    raise PasteIdUnavailableError(f"No free paste id found in {_CLAIM_ATTEMPTS} attempts")
+
+
+def store_paste(
+    db: Session,
+    content: Buffer,
+    extension: Optional[str] = None,
+    expiresat: Optional[datetime] = None,
+    content_type: Optional[str] = None,
+    encoding: Optional[str] = None,
+) -> Paste:
+    """
+    Persist a new paste, keeping small UTF-8 bodies inline in the database and
+    handing larger or non-UTF-8 bodies to the storage backend byte for byte.
+    """
+    paste = Paste(extension=extension, expiresat=expiresat)
+    set_paste_body(paste, content, content_type=content_type, encoding=encoding)
+    return _save_paste(db, paste)
+
+
+def set_paste_body(
+    paste: Paste,
+    content: Buffer,
+    content_type: Optional[str] = None,
+    encoding: Optional[str] = None,
+) -> None:
+    """Set the body of `paste`, uploading it to the storage backend unless it is kept inline."""
+    body = memoryview(content)
+    text: Optional[str] = None
+    if body.nbytes <= get_settings().INLINE_CONTENT_MAX_BYTES:
+        try:
+            text = str(body, "utf-8")
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            pass
+
+    content_type = safe_content_type(content_type or ("text/plain" if encoding else None))
+
+    object_name: Optional[str] = None
+    if text is None:
+        object_name = str(uuid.uuid4())
+        with span("storage.put", kind=SPAN_KIND_CLIENT, key=object_name, size=body.nbytes):
+            get_storage().put(object_name, body, content_type=content_type)
+    paste.content = text
+    paste.object_key = object_name
+    paste.size = body.nbytes
+    paste.content_type = content_type
+    paste.encoding = encoding
+
+
+def store_paste_file(
+    db: Session,
+    path: Path,
+    extension: Optional[str] = None,
+    expiresat: Optional[datetime] = None,
+    content_type: Optional[str] = None,
+) -> Paste:
+    """
+    Persist a new paste from a file on disk, which is consumed. Large files are
+    handed to the storage backend without being read into memory.
+    """
+    size = path.stat().st_size
+    if size <= get_settings().INLINE_CONTENT_MAX_BYTES:
+        body = path.read_bytes()
+        path.unlink()
+        return store_paste(db, body, extension=extension, expiresat=expiresat, content_type=content_type)
+
+    object_name = str(uuid.uuid4())
+    content_type = safe_content_type(content_type)
+    get_storage().put_file(object_name, path, content_type=content_type)
+    paste = Paste(
+        object_key=object_name,
+        extension=extension,
+        size=size,
+        content_type=content_type,
+        expiresat=expiresat,
+    )
+    return _save_paste(db, paste)
+
+
+def _save_paste(db: Session, paste: Paste) -> Paste:
+    object_name = paste.object_key
+    try:
+        _claim_paste_id(db, paste)
+        db.add(paste)
+        db.flush()
+        index_paste_body(db, paste)
+        db.commit()
+        recent_writes.add(paste.pasteID)
+        paste_filter.add(paste.pasteID)
+        db.refresh(paste)
+    except Exception:
+        if object_name:
+            get_storage().delete(object_name)
+        raise
+    return paste
+
+
+def index_paste_body(db: Session, paste: Paste) -> None:
+    # Inline bodies are indexed right away, object-backed ones by the background indexer
+    if paste.content is not None:
+        index_paste(db, paste.pasteID, paste.content)
+    paste.search_indexed = paste.content is not None
+
+
+def get_paste(db: Session, uuid: str) -> Optional[Paste]:
+    """
+    Return the paste with id `uuid`, treating pastes past their expiry as already gone.
+    Replica sessions read pastes written recently, or not replicated yet, from the primary.
+    """
+    if uuid in recent_writes:
+        use_primary(db)
+    query = db.query(Paste).filter(Paste.pasteID == uuid).filter(or_(Paste.expiresat.is_(None), Paste.expiresat > datetime.utcnow()))
+    paste: Optional[Paste] = None
+    try:
+        paste = query.first()
+    except OperationalError:
+        if not reads_from_replica(db):
+            raise
+        # The replica is unreachable, it has been taken out of the rotation by now
+        db.rollback()
+    if paste is None and reads_from_replica(db):
+        # A paste created on another worker may not have reached the replica yet
+        use_primary(db)
+        paste = query.first()
+    return paste
+
+
+def read_paste_bytes(paste: Paste) -> bytes:
+    if not paste.object_key:
+        return (paste.content or "").encode("utf-8")
+    with span("storage.get", kind=SPAN_KIND_CLIENT, key=paste.object_key):
+        return get_storage().get(paste.object_key)
+
+
+def stream_paste_bytes(paste: Paste) -> Iterator[bytes]:
+    if not paste.object_key:
+        return iter((read_paste_bytes(paste),))
+    return get_storage().stream(paste.object_key)
+
+
+def read_paste_content(paste: Paste) -> Optional[str]:
+    """Return the body decoded for display, or None when it is binary."""
+    if not paste.object_key:
+        return paste.content or ""
+    return decode_text(read_paste_bytes(paste), paste.encoding)
+
+
+def _content_headers(paste: Paste) -> Dict[str, str]:
+    # Also for pastes stored before types were restricted, see utils.safe_content_type()
+    media_type = safe_content_type(paste.content_type or "text/plain")
+    headers = {"Content-Type": media_type}
+    if media_type == "text/plain":
+        if paste.encoding:
+            headers["Content-Type"] = f"{media_type}; charset={paste.encoding}"
+    else:
+        headers["Content-Disposition"] = "attachment"
+    return headers
+
+
+def raw_response_headers(paste: Paste) -> Dict[str, str]:
+    """
+    Headers describing the stored bytes of `paste`. Content-Type is set here rather
+    than through `media_type` so Starlette does not claim UTF-8 for text of unknown charset.
+    Browsers must not sniff a runnable type out of the body, non-text bodies are downloaded.
+    """
+    headers = {**_content_headers(paste), "X-Content-Type-Options": "nosniff"}
+    if paste.size is not None:
+        headers["Content-Length"] = str(paste.size)
+    return headers
+
+
+def raw_redirect_url(paste: Paste) -> Optional[str]:
+    """
+    Return a freshly minted presigned URL for object-backed pastes of at least
+    `RAW_REDIRECT_MIN_BYTES`, or None when the body should be served by the app.
+    """
+    settings = get_settings()
+    if not paste.object_key or settings.RAW_REDIRECT_MIN_BYTES <= 0:
+        return None
+
+    storage = get_storage()
+    size = paste.size if paste.size is not None else storage.stat(paste.object_key).size
+    if size < settings.RAW_REDIRECT_MIN_BYTES:
+        return None
+    headers = _content_headers(paste)
+    return storage.presigned_url(
+        paste.object_key,
+        timedelta(seconds=settings.PRESIGNED_URL_EXPIRY_SECONDS),
+        content_type=headers["Content-Type"],
+        content_disposition=headers.get("Content-Disposition"),
+    )
+
+
+def delete_pastes(db: Session, pastes: Iterable[Paste]) -> None:
+    """Delete `pastes` and, once the rows are gone, their bodies in the storage backend."""
+    object_names: List[str] = []
+    paste_ids: List[str] = []
+    for paste in pastes:
+        if paste.object_key:
+            object_names.append(paste.object_key)
+        paste_ids.append(paste.pasteID)
+        db.delete(paste)
+    unindex_pastes(db, paste_ids)
+    db.query(PasteRevision).filter(PasteRevision.paste_id.in_(paste_ids)).delete(synchronize_session=False)
+    db.query(PasteView).filter(PasteView.paste_id.in_(paste_ids)).delete(synchronize_session=False)
+    db.commit()
+    for paste_id in paste_ids:
+        recent_writes.add(paste_id)
+        paste_filter.discard(paste_id)
+
+    if object_names:
+        get_storage().delete_many(object_names)
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from typing import Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from .config import get_settings
+from .database import get_engine, get_replica_engines, replicas
+from .schema import HealthErrorResponse, HealthResponse, PoolStatus, ReplicaStatus
+from .storage import get_storage
+
+logger = logging.getLogger("paste")
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def pool_status(db_engine: Engine) -> Optional[PoolStatus]:
+    pool = db_engine.pool
+    if not isinstance(pool, QueuePool):
+        return None
+
+    size = pool.size()
+    max_overflow = pool._max_overflow
+    checked_out = pool.checkedout()
+    # `overflow()` counts from -pool_size upwards, only positive values are connections beyond the pool
+    overflow = max(pool.overflow(), 0)
+    capacity = size + max_overflow if max_overflow >= 0 else None
+    return PoolStatus(
+        size=size,
+        max_overflow=max_overflow,
+        checked_out=checked_out,
+        overflow=overflow,
+        saturation=round(checked_out / capacity, 3) if capacity else None,
+    )
+
+
+class HealthProber:
+    """
+    Periodically probes the dependencies of the service in a worker thread and
+    keeps the latest result, so health endpoints answer from memory instead of
+    querying the database on the event loop for every probe.
+    """
+
+    def __init__(self, interval: Optional[float] = None) -> None:
+        self._interval: Optional[float] = interval
+        self.snapshot: Optional[Union[HealthResponse, HealthErrorResponse]] = None
+        self.last_sweep: Optional[float] = None
+
+    @property
+    def interval(self) -> float:
+        # Read from the settings when first needed, not when the module is imported
+        if self._interval is None:
+            self._interval = get_settings().HEALTH_PROBE_INTERVAL_SECONDS
+        return self._interval
+
+    def record_sweep(self) -> None:
+        self.last_sweep = time.time()
+
+    def probe(self) -> Union[HealthResponse, HealthErrorResponse]:
+        engine = get_engine()
+        try:
+            start = time.perf_counter()
+            with engine.connect() as connection:
+                checkout_ms = _elapsed_ms(start)
+                query_start = time.perf_counter()
+                connection.execute(text("SELECT 1"))
+                db_response_time_ms = _elapsed_ms(query_start)
+        except Exception as e:
+            return HealthErrorResponse(error_message=str(e))
+
+        storage_response_time_ms: Optional[float] = None
+        try:
+            storage_start = time.perf_counter()
+            get_storage().ping()
+            storage_response_time_ms = _elapsed_ms(storage_start)
+        except Exception as e:
+            logger.warning(f"Storage backend unreachable: {e}")
+
+        replica_statuses = [self.probe_replica(replica) for replica in get_replica_engines()]
+        healthy = storage_response_time_ms is not None and all(replica.healthy for replica in replica_statuses)
+
+        return HealthResponse(
+            status="ok" if healthy else "degraded",
+            db_response_time_ms=db_response_time_ms,
+            pool_checkout_ms=checkout_ms,
+            pool=pool_status(engine),
+            storage="reachable" if storage_response_time_ms is not None else "unreachable",
+            storage_response_time_ms=storage_response_time_ms,
+            sweeper_lag_seconds=round(time.time() - self.last_sweep, 2) if self.last_sweep else None,
+            replicas=replica_statuses,
+        )
+
+    def probe_replica(self, replica: Engine) -> ReplicaStatus:
+        """Probe a read replica, taking it out of or putting it back into the read rotation."""
+        try:
+            start = time.perf_counter()
+            with replica.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            response_time_ms = _elapsed_ms(start)
+        except Exception as e:
+            logger.warning(f"Read replica {replica.url.host} unreachable: {e}")
+            replicas.mark_down(replica)
+            return ReplicaStatus(host=replica.url.host, healthy=False, pool=pool_status(replica))
+        replicas.mark_up(replica)
+        return ReplicaStatus(host=replica.url.host, healthy=True, response_time_ms=response_time_ms, pool=pool_status(replica))
+
+    async def run(self) -> None:
+        while True:
+            try:
+                self.snapshot = await asyncio.to_thread(self.probe)
+            except Exception as e:
+                logger.error(f"Error in health prober: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def current(self) -> Union[HealthResponse, HealthErrorResponse]:
+        """
+        Return the cached snapshot. A missing or stale snapshot (the prober never
+        ran or stopped running) triggers a single probe off the event loop.
+        """
+        snapshot = self.snapshot
+        if snapshot is None or time.time() - snapshot.timestamp > 3 * self.interval:
+            snapshot = self.snapshot = await asyncio.to_thread(self.probe)
+        return snapshot
+
+
+prober = HealthProber()
@@ -0,0 +1,49 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from .tracing import span
+
+if TYPE_CHECKING:
+    from pygments.formatters import HtmlFormatter
+
+CSS_CLASS = "highlight"
+
+
+def _formatter() -> "HtmlFormatter":
+    from pygments.formatters import HtmlFormatter
+
+    return HtmlFormatter(
+        style="monokai",  # Dark theme base
+        linenos="inline",
+        cssclass=CSS_CLASS,
+        nowrap=False,
+    )
+
+
+@lru_cache
+def pygments_css() -> str:
+    """Stylesheet for highlighted pastes, the same for every paste so it is only built once."""
+    return _formatter().get_style_defs(f".{CSS_CLASS}")
+
+
+def highlight_code(content: str, extension: str) -> str:
+    # Pygments and its lexer registry are imported when the first paste is rendered, not with the app
+    from pygments import highlight
+    from pygments.lexers import get_lexer_by_name, guess_lexer
+    from pygments.util import ClassNotFound
+
+    with span("highlight.lexer", extension=extension or None) as current:
+        if extension == "":
+            # Guess lexer based on content
+            lexer = guess_lexer(content)
+        else:
+            # Determine lexer based on file extension
+            try:
+                lexer = get_lexer_by_name(extension, stripall=True)
+            except ClassNotFound:
+                lexer = get_lexer_by_name("text", stripall=True)  # Default lexer
+        if current is not None:
+            current.attributes["lexer"] = lexer.name
+
+    with span("highlight.format", size=len(content)):
+        return highlight(content, lexer, _formatter())
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import string
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .database import Session_Local
+from .models import Paste
+
+logger = logging.getLogger("paste")
+
+# Same alphabet as utils.generate_uuid(), ids are four characters of it
+_ALPHABET = string.ascii_letters + string.digits
+_VALUES: Dict[str, int] = {character: value for value, character in enumerate(_ALPHABET)}
+_ID_LENGTH = 4
+_ID_SPACE = len(_ALPHABET) ** _ID_LENGTH
+
+# Catch-ups re-read pastes inserted this long before the previous one started, covering
+# transactions that committed late and clocks of other hosts running behind
+_CATCH_UP_OVERLAP = timedelta(seconds=60)
+
+
+def _index(paste_id: str) -> Optional[int]:
+    if len(paste_id) != _ID_LENGTH:
+        return None
+    index = 0
+    for character in paste_id:
+        value = _VALUES.get(character)
+        if value is None:
+            return None
+        index = index * len(_ALPHABET) + value
+    return index
+
+
+class PasteIdFilter:
+    """
+    Bitmap over the whole id space, one bit per possible paste id (1.8MB), telling which
+    ids exist. A clear bit is only trusted after catching up with the pastes other
+    workers inserted since the last look, imports included, which concurrent misses
+    share and which run at most every `PASTE_ID_FILTER_CATCH_UP_SECONDS`. Id probing
+    then costs a small range scan on the inserted_at index now and then instead of a
+    query per request. Deleting a paste clears its bit on the worker that deleted it,
+    other workers and expired pastes keep the bit until the next full rebuild, those
+    ids just go to the database as before.
+    """
+
+    def __init__(self) -> None:
+        self._bits: Optional[bytearray] = None
+        # Insertion time catch-ups read pastes from, set by the first rebuild
+        self._watermark: datetime = datetime.utcnow()
+        self._lock = threading.Lock()
+        # Local changes made while a rebuild runs, replayed onto the rebuilt bitmap
+        self._changes: Optional[List[Tuple[int, bool]]] = None
+        # Bumped by every rebuild, catch-ups that overlap one leave its watermark alone
+        self._generation: int = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._next_catch_up: Optional[asyncio.Future] = None
+        self._catch_up_done: Optional[asyncio.Future] = None
+        self._last_catch_up: float = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._bits is not None
+
+    def _set(self, index: int, present: bool) -> None:
+        if self._bits is None:
+            return
+        if present:
+            self._bits[index >> 3] |= 1 << (index & 7)
+        else:
+            self._bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def add(self, paste_id: str) -> None:
+        index = _index(paste_id)
+        if index is None:
+            return
+        with self._lock:
+            self._set(index, True)
+            if self._changes is not None:
+                self._changes.append((index, True))
+
+    def discard(self, paste_id: str) -> None:
+        index = _index(paste_id)
+        if index is None:
+            return
+        with self._lock:
+            self._set(index, False)
+            if self._changes is not None:
+                self._changes.append((index, False))
+
+    def might_contain(self, paste_id: str) -> bool:
+        """False only for ids that did not exist as of the last catch-up."""
+        bits = self._bits
+        index = _index(paste_id)
+        if bits is None or index is None:
+            return True
+        return bool(bits[index >> 3] & (1 << (index & 7)))
+
+    async def might_exist(self, paste_id: str) -> bool:
+        """Whether `paste_id` may exist. False is definite: the id was not created, not even on another worker."""
+        if self.might_contain(paste_id):
+            return True
+        try:
+            await self._catch_up()
+        except Exception as e:
+            logger.error(f"Error catching up the paste id filter: {e}")
+            return True
+        return self.might_contain(paste_id)
+
+    async def _catch_up(self) -> None:
+        # Every caller waits for a catch-up that starts after it arrived, the ones
+        # arriving before that catch-up starts all share it
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._next_catch_up, self._catch_up_done = loop, None, None
+        if self._next_catch_up is None:
+            self._next_catch_up = asyncio.ensure_future(self._run_catch_up())
+        await asyncio.shield(self._next_catch_up)
+
+    async def _run_catch_up(self) -> None:
+        previous = self._catch_up_done
+        if previous is not None:
+            await asyncio.wait((previous,))
+        delay = self._last_catch_up + get_settings().PASTE_ID_FILTER_CATCH_UP_SECONDS - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # From here on, callers need the next catch-up
+        self._catch_up_done, self._next_catch_up = self._next_catch_up, None
+        self._last_catch_up = time.monotonic()
+        since = self._watermark - _CATCH_UP_OVERLAP
+        started = datetime.utcnow()
+        generation = self._generation
+        paste_ids = await asyncio.to_thread(self._inserted_since, since)
+        with self._lock:
+            for paste_id in paste_ids:
+                index = _index(paste_id)
+                if index is not None:
+                    self._set(index, True)
+            if generation == self._generation:
+                self._watermark = max(self._watermark, started)
+
+    @staticmethod
+    def _inserted_since(since: datetime) -> List[str]:
+        # From the primary, replicas may not have the newest pastes yet
+        db: Session = Session_Local()
+        try:
+            return list(db.execute(select(Paste.pasteID).where(Paste.inserted_at >= since)).scalars())
+        finally:
+            db.close()
+
+    def rebuild(self) -> int:
+        """Build the bitmap from every live paste, returns the number of ids in it."""
+        started = datetime.utcnow()
+        with self._lock:
+            self._changes = []
+        bits = bytearray((_ID_SPACE + 7) // 8)
+        count = 0
+        db: Session = Session_Local()
+        try:
+            query = select(Paste.pasteID).where(or_(Paste.expiresat.is_(None), Paste.expiresat > started)).execution_options(yield_per=10_000)
+            for paste_id in db.execute(query).scalars():
+                index = _index(paste_id)
+                if index is not None:
+                    bits[index >> 3] |= 1 << (index & 7)
+                    count += 1
+        except Exception:
+            with self._lock:
+                self._changes = None
+            raise
+        finally:
+            db.close()
+
+        with self._lock:
+            changes, self._changes = self._changes or [], None
+            self._bits = bits
+            for index, present in changes:
+                self._set(index, present)
+            # Catch-ups continue from the snapshot the rebuild read
+            self._watermark = started
+            self._generation += 1
+        return count
+
+    async def run(self) -> None:
+        while True:
+            try:
+                count = await asyncio.to_thread(self.rebuild)
+                logger.info(f"Paste id filter rebuilt with {count} ids")
+            except Exception as e:
+                logger.error(f"Error rebuilding the paste id filter: {e}")
+            await asyncio.sleep(get_settings().PASTE_ID_FILTER_REBUILD_SECONDS)
+
+
+paste_filter = PasteIdFilter()
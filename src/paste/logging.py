@@ -1,32 +1,95 @@
+import copy
+import logging
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
 from typing import Any, Dict
 
-from pydantic import BaseModel
-
-
-class LogConfig(BaseModel):
-    """Logging configuration to be set for the server"""
-
-    LOGGER_NAME: str = "paste"
-    LOG_FORMAT: str = "%(levelprefix)s | %(asctime)s | %(message)s"
-    LOG_LEVEL: str = "DEBUG"
-
-    # Logging config
-    version: int = 1
-    disable_existing_loggers: bool = False
-    formatters: Dict[str, Dict[str, str]] = {
-        "default": {
-            "()": "uvicorn.logging.DefaultFormatter",
-            "fmt": LOG_FORMAT,
-            "datefmt": "%Y-%m-%d %H:%M:%S",
-        },
-    }
-    handlers: Dict[str, Dict[str, Any]] = {
-        "default": {
-            "formatter": "default",
-            "class": "logging.StreamHandler",
-            "stream": "ext://sys.stderr",
-        },
-    }
-    loggers: Dict[str, Dict[str, Any]] = {
-        LOGGER_NAME: {"handlers": ["default"], "level": LOG_LEVEL},
-    }
+import orjson
+
+from .config import get_settings
+from .tracing import TRACE_LOGGER_NAME, current_request_id, current_trace_ids
+
+LOGGER_NAME = "paste"
+TEXT_FORMAT = "%(levelprefix)s | %(asctime)s | %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, tagged with the request the record was logged for."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ("request_id", "trace_id", "span_id"):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry).decode()
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread, which formats them. The request context only
+    exists on the logging thread, so it is attached to the record before it is queued.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # QueueHandler.prepare() would format the record here and drop exc_info, leaving
+        # the listener's formatter without the traceback. Only the message arguments are
+        # merged, they may change once the logging call returns.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.request_id = current_request_id()
+        record.trace_id, record.span_id = current_trace_ids()
+        return record
+
+
+def configure_logging() -> QueueListener:
+    """
+    Route the "paste" loggers through a queue to a listener thread, so requests only
+    pay for building a record and putting it on the queue, never for formatting the
+    record or its traceback or for writing it.
+    Spans of sampled requests go through the same queue to `TRACE_EXPORT_PATH`.
+    The listener is started here, stopping it drains the queue.
+    """
+    settings = get_settings()
+
+    log_handler = logging.StreamHandler(sys.stderr)
+    if settings.LOG_FORMAT == "json":
+        log_handler.setFormatter(JsonFormatter())
+    else:
+        from uvicorn.logging import DefaultFormatter
+
+        log_handler.setFormatter(DefaultFormatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+    log_handler.addFilter(lambda record: record.name != TRACE_LOGGER_NAME)
+
+    trace_handler = logging.FileHandler(settings.TRACE_EXPORT_PATH) if settings.TRACE_EXPORT_PATH else logging.StreamHandler(sys.stderr)
+    trace_handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_handler.addFilter(lambda record: record.name == TRACE_LOGGER_NAME)
+
+    queue: SimpleQueue = SimpleQueue()
+    queue_handler = ContextQueueHandler(queue)
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers = [queue_handler]
+    logger.setLevel(settings.LOG_LEVEL.upper())
+
+    trace_logger = logging.getLogger(TRACE_LOGGER_NAME)
+    trace_logger.handlers = [queue_handler]
+    trace_logger.setLevel(logging.INFO)
+    trace_logger.propagate = False
+
+    listener = QueueListener(queue, log_handler, trace_handler)
+    listener.start()
+    return listener
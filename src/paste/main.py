@@ -1,44 +1,91 @@
 import asyncio
-import json
+import base64
 import logging
-import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
-from logging.config import dictConfig
+from functools import lru_cache
 from pathlib import Path
-from typing import Awaitable, List, Optional, Union
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
+import orjson
 from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, Query, Request, Response, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from pygments import highlight
-from pygments.formatters import HtmlFormatter
-from pygments.lexers import get_lexer_by_name, guess_lexer
-from pygments.util import ClassNotFound
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from slowapi import Limiter
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
-from sqlalchemy import text
 from sqlalchemy.orm import Session
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.datastructures import Headers
 from starlette.requests import Request
 from starlette.responses import Response
+from starlette.types import Scope
 
 from . import __author__, __contact__, __url__, __version__
+from .auth import require_admin
+from .backup import ImportFormatError, export_pastes, import_pastes
+from .compression import precompressed_response
 from .config import get_settings
-from .database import Session_Local, get_db
-from .logging import LogConfig
-from .middleware import LimitUploadSize
-from .minio import get_object_data, post_object_data
-from .models import Paste
-from .schema import HealthErrorResponse, HealthResponse, PasteCreate, PasteDetails, PasteResponse
-from .utils import _filter_object_name_from_link, extract_uuid
+from .crud import (
+    delete_pastes,
+    get_paste,
+    raw_redirect_url,
+    raw_response_headers,
+    read_paste_bytes,
+    read_paste_content,
+    store_paste,
+    stream_paste_bytes,
+)
+from .database import Session_Local, dispose_engines, get_db, get_read_db
+from .health import prober
+from .highlight import highlight_code, pygments_css
+from .idfilter import paste_filter
+from .logging import configure_logging
+from .middleware import AdmissionClass, AdmissionControl, Compression, LimitUploadSize, Profiling, RequestTracing
+from .models import Paste, PasteView, UploadSession
+from .partitions import is_partitioned, maintain_partitions_periodically
+from .profiling import list_profiles, read_profile
+from .responses import NegotiatedRoute, ORJSONResponse, api_response
+from .revisions import (
+    RevisionNotFoundError,
+    RevisionTooLargeError,
+    diff_revisions,
+    head_revision,
+    list_revisions,
+    read_revision,
+    update_paste,
+)
+from .schema import (
+    HealthErrorResponse,
+    HealthResponse,
+    ImportResult,
+    LivenessResponse,
+    PasteCreate,
+    PasteDetails,
+    PasteResponse,
+    PasteUpdate,
+    ProfileList,
+    RevisionInfo,
+    RevisionList,
+    RevisionResponse,
+    SearchResults,
+    UploadCreate,
+    UploadStatus,
+)
+from .search import index_pending_pastes_periodically, search_pastes
+from .tiering import delete_retired_objects_periodically, migrate_tiers_periodically
+from .tracing import span
+from .uploads import UploadError, abort_upload, append_chunk, complete_upload, create_upload, purge_stale_uploads
+from .utils import decode_text, extract_uuid, guess_content_type
+from .views import view_counter
+
+if TYPE_CHECKING:
+    from fastapi.templating import Jinja2Templates
 
 # --------------------------------------------------------------------
 # Logger
 # --------------------------------------------------------------------
 
-dictConfig(LogConfig())
 logger = logging.getLogger("paste")
 
 
@@ -52,15 +99,20 @@ async def delete_expired_urls() -> None:
         try:
             db: Session = Session_Local()
 
-            current_time = datetime.utcnow()
+            # Partitioned tables get rid of expired pastes by dropping whole partitions
+            if not is_partitioned(db):
+                current_time = datetime.utcnow()
 
-            # Find and delete expired URLs
-            expired_urls = db.query(Paste).filter(Paste.expiresat <= current_time).all()
+                # Find and delete expired URLs
+                expired_urls = db.query(Paste).filter(Paste.expiresat <= current_time).all()
 
-            for url in expired_urls:
-                db.delete(url)
+                delete_pastes(db, expired_urls)
 
-            db.commit()
+            # Abandoned resumable uploads
+            purged = purge_stale_uploads(db)
+            if purged:
+                logger.info(f"Purged {purged} stale upload sessions")
+            prober.record_sweep()
 
         except Exception as e:
             logger.error(f"Error in deletion task: {e}")
@@ -72,6 +124,51 @@ async def delete_expired_urls() -> None:
         await asyncio.sleep(60)
 
 
+def _preload() -> None:
+    # Fill the caches the first requests would otherwise fill, each worker does this once
+    get_templates()
+    pygments_css()
+    try:
+        load_languages()
+    except Exception as e:
+        logger.error(f"Error reading languages file: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Started with the app rather than at import, so importing main starts no thread
+    log_listener = configure_logging()
+    await asyncio.to_thread(_preload)
+
+    tasks = [
+        asyncio.create_task(delete_expired_urls()),
+        asyncio.create_task(prober.run()),
+        asyncio.create_task(view_counter.run()),
+    ]
+    if get_settings().PARTITIONED_STORAGE:
+        tasks.append(asyncio.create_task(maintain_partitions_periodically()))
+    if get_settings().SEARCH_INDEX_OBJECTS:
+        tasks.append(asyncio.create_task(index_pending_pastes_periodically()))
+    if get_settings().TIERING_ENABLED:
+        tasks.append(asyncio.create_task(migrate_tiers_periodically()))
+    else:
+        tasks.append(asyncio.create_task(delete_retired_objects_periodically()))
+    if get_settings().PASTE_ID_FILTER_ENABLED:
+        tasks.append(asyncio.create_task(paste_filter.run()))
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    try:
+        await asyncio.to_thread(view_counter.flush)
+    except Exception as e:
+        logger.error(f"Error flushing view counters: {e}")
+    dispose_engines()
+    log_listener.stop()
+
+
 DESCRIPTION: str = "paste.py 🐍 - A pastebin written in python."
 
 limiter = Limiter(key_func=get_remote_address)
@@ -86,7 +183,11 @@ app: FastAPI = FastAPI(
     license_info=dict(name="MIT", url="https://opensource.org/license/mit/"),
     docs_url=None,
     redoc_url="/docs",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
+# Lets every route accept MessagePack request bodies besides JSON
+app.router.route_class = NegotiatedRoute
 app.state.limiter = limiter
 
 
@@ -103,7 +204,7 @@ app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 async def custom_http_exception_handler(request: Request, exc: StarletteHTTPException) -> Response:
     # Check if it's an API route
     if request.url.path.startswith("/api/"):
-        return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+        return api_response(request, {"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
 
     # For non-API routes, keep the existing 404 handling
     if exc.status_code == 404:
@@ -112,7 +213,7 @@ async def custom_http_exception_handler(request: Request, exc: StarletteHTTPExce
 
         if is_browser_request:
             try:
-                return templates.TemplateResponse("404.html", {"request": request}, status_code=404)
+                return render_template("404.html", {"request": request}, status_code=404)
             except Exception as e:
                 logger.error(f"Template error: {e}")
                 return PlainTextResponse("404: Template Error", status_code=404)
@@ -122,12 +223,6 @@ async def custom_http_exception_handler(request: Request, exc: StarletteHTTPExce
     return PlainTextResponse(str(exc.detail), status_code=exc.status_code)
 
 
-# Startup event to begin background task
-@app.on_event("startup")
-async def startup_event():
-    asyncio.create_task(delete_expired_urls())
-
-
 origins: List[str] = ["*"]
 
 BASE_URL: str = get_settings().BASE_URL
@@ -139,11 +234,92 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.add_middleware(LimitUploadSize, max_upload_size=20_000_000)  # ~20MB
+if get_settings().COMPRESSION_ENABLED:
+    app.add_middleware(Compression, minimum_size=get_settings().COMPRESSION_MIN_BYTES)
+
+app.add_middleware(LimitUploadSize, max_upload_size=20_000_000, exempt_paths=("/api/import",))  # ~20MB
+
+
+def classify_request(scope: Scope) -> Optional[str]:
+    """Admission class of a request, None for requests that are never shed (health checks, pages, docs)."""
+    path: str = scope["path"]
+    if scope["method"] == "GET" and path.startswith("/paste/"):
+        # Same test as get_paste_data() uses to decide between HTML and raw bytes
+        return "render" if "Mozilla" in Headers(scope=scope).get("user-agent", "") else "raw"
+    if path == "/file" or path.startswith("/api/uploads"):
+        return "upload"
+    if path.startswith("/api/") or (scope["method"] == "POST" and path == "/web"):
+        return "api"
+    return None
+
+
+def admission_classes() -> Dict[str, AdmissionClass]:
+    settings = get_settings()
+    limits = {
+        "render": (settings.ADMISSION_RENDER_LIMIT, settings.ADMISSION_RENDER_QUEUE),
+        "raw": (settings.ADMISSION_RAW_LIMIT, settings.ADMISSION_RAW_QUEUE),
+        "upload": (settings.ADMISSION_UPLOAD_LIMIT, settings.ADMISSION_UPLOAD_QUEUE),
+        "api": (settings.ADMISSION_API_LIMIT, settings.ADMISSION_API_QUEUE),
+    }
+    return {name: AdmissionClass(limit, queue_size, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS) for name, (limit, queue_size) in limits.items() if limit > 0}
+
+
+if get_settings().PROFILING_ENABLED:
+    # Inside admission control, time spent queueing is not the request's own
+    app.add_middleware(
+        Profiling,
+        interval=get_settings().PROFILING_INTERVAL_SECONDS,
+        sample_every=get_settings().PROFILING_SAMPLE_EVERY,
+        keep=get_settings().PROFILING_KEEP,
+        directory=get_settings().PROFILING_PATH,
+    )
+
+# Added last so it runs first, shed requests should cost as little as possible
+app.add_middleware(
+    AdmissionControl,
+    classify=classify_request,
+    classes=admission_classes,
+    degrade={"render": "raw"},
+    retry_after=get_settings().ADMISSION_RETRY_AFTER_SECONDS,
+)
+# Outside admission control, so time spent queueing shows up in traces and shed requests get a request id too
+app.add_middleware(RequestTracing, sample_rate=get_settings().TRACE_SAMPLE_RATE)
 
 BASE_DIR: Path = Path(__file__).resolve().parent
 
-templates: Jinja2Templates = Jinja2Templates(directory=str(Path(BASE_DIR, "templates")))
+
+@lru_cache
+def get_templates() -> "Jinja2Templates":
+    from fastapi.templating import Jinja2Templates
+
+    return Jinja2Templates(directory=str(Path(BASE_DIR, "templates")))
+
+
+def render_template(name: str, context: Dict, status_code: int = 200) -> Response:
+    with span("template.render", template=name):
+        return get_templates().TemplateResponse(name, context, status_code=status_code)
+
+
+def render_page(request: Request, name: str, key: Tuple = (), context: Optional[Callable[[], Dict]] = None) -> Response:
+    """
+    A page that is the same for every request to it, rendered once and kept precompressed
+    under `key`, the template and the base URL its links point to. `context` is only
+    called when the page has to be rendered.
+    """
+
+    def render() -> bytes:
+        page_context = {"request": request, **(context() if context else {})}
+        with span("template.render", template=name):
+            return get_templates().get_template(name).render(page_context).encode("utf-8")
+
+    return precompressed_response(request, ("page", name, str(request.base_url), *key), render, media_type="text/html; charset=utf-8")
+
+
+@lru_cache
+def load_languages() -> bytes:
+    with open(Path(BASE_DIR, "languages.json"), "rb") as file:
+        # Parsed once to make sure a broken file fails here rather than in clients
+        return orjson.dumps(orjson.loads(file.read()))
 
 
 # --------------------------------------------------------------------
@@ -154,9 +330,18 @@ templates: Jinja2Templates = Jinja2Templates(directory=str(Path(BASE_DIR, "templ
 @app.get("/", response_class=HTMLResponse)
 @limiter.limit("100/minute")
 async def indexpage(request: Request) -> Response:
-    logger.debug(f"Received request from {request.client.host}")
-    logger.info(f"Hit at home page - Method: {request.method}")
-    return templates.TemplateResponse("index.html", {"request": request})
+    # Lazy %-formatting, the home page is hit too often to build messages that are filtered out
+    logger.debug("Hit at home page from %s - Method: %s", request.client.host, request.method)
+    return render_page(request, "index.html")
+
+
+@app.get("/health/live", status_code=status.HTTP_200_OK, response_model=LivenessResponse)
+async def liveness() -> LivenessResponse:
+    """
+    Liveness probe: answers as long as the event loop is serving requests.
+    It never touches dependencies, so a slow database cannot get the pod restarted.
+    """
+    return LivenessResponse()
 
 
 @app.get(
@@ -165,29 +350,26 @@ async def indexpage(request: Request) -> Response:
     response_model=HealthResponse,
     responses={503: {"model": HealthErrorResponse, "description": "Database connection failed"}},
 )
-async def health(db: Session = Depends(get_db)) -> HealthResponse:
+@app.get(
+    "/health/ready",
+    status_code=status.HTTP_200_OK,
+    response_model=HealthResponse,
+    responses={503: {"model": HealthErrorResponse, "description": "Database connection failed"}},
+)
+async def health() -> HealthResponse:
     """
-    Health check endpoint that verifies database connectivity.
+    Readiness check served from the snapshot of the background health prober.
     Returns:
         200 OK: Database is connected and healthy
         503 Service Unavailable: Database connection failed
     """
-    try:
-        # Measure database response time
-        start_time = time.time()
-        db.execute(text("SELECT 1"))
-        end_time = time.time()
-
-        return HealthResponse(db_response_time_ms=round((end_time - start_time) * 1000, 2))
-
-    except Exception as e:
-        db.rollback()
+    snapshot = await prober.current()
+    if isinstance(snapshot, HealthErrorResponse):
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=HealthErrorResponse(error_message=str(e)).model_dump(),
+            detail=snapshot.model_dump(),
         )
-    finally:
-        db.close()
+    return snapshot
 
 
 # --------------------------------------------------------------------
@@ -200,60 +382,57 @@ async def get_paste_data(
     request: Request,
     uuid: str,
     user_agent: Optional[str] = Header(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Response:
     try:
         uuid = extract_uuid(uuid)
+        if not await paste_filter.might_exist(uuid):
+            raise HTTPException(detail="404: The Requested Resource is not found", status_code=status.HTTP_404_NOT_FOUND)
 
-        data = db.query(Paste).filter(Paste.pasteID == uuid).first()
-
-        content: Optional[str] = None
-        extension: Optional[str] = None
-
-        if not data.s3_link:
-            content = data.content
-            extension = data.extension
-        else:
-            content = get_object_data(_filter_object_name_from_link(data.s3_link))
-            extension = data.extension
-
-        extension = extension[1::] if extension.startswith(".") else extension
+        data = get_paste(db, uuid)
+        if data is None:
+            raise HTTPException(detail="404: The Requested Resource is not found", status_code=status.HTTP_404_NOT_FOUND)
+        view_counter.record(data.pasteID)
 
         is_browser_request = "Mozilla" in user_agent if user_agent else False
+        if getattr(request.state, "degraded", False):
+            # Highlighting is shed while the render class is saturated, the paste is served as plain text
+            is_browser_request = False
 
         if not is_browser_request:
-            # Return plain text response
-            return PlainTextResponse(content)
-
-        logger.info(f"extension: {extension}")
-
-        if extension == "":
-            # Guess lexer based on content
-            lexer = guess_lexer(content)
-        else:
-            # Determine lexer based on file extension
-            try:
-                lexer = get_lexer_by_name(extension, stripall=True)
-            except ClassNotFound:
-                lexer = get_lexer_by_name("text", stripall=True)  # Default lexer
-
-        formatter = HtmlFormatter(
-            style="monokai",  # Dark theme base
-            linenos="inline",
-            cssclass="highlight",
-            nowrap=False,
-        )
+            # Let the object store serve very large bodies directly
+            redirect_url = raw_redirect_url(data)
+            if redirect_url:
+                return RedirectResponse(redirect_url, status_code=status.HTTP_302_FOUND)
+            # Return the stored bytes untouched
+            if data.object_key:
+                return StreamingResponse(stream_paste_bytes(data), headers=raw_response_headers(data))
+            return Response(read_paste_bytes(data), headers=raw_response_headers(data))
+
+        extension: str = data.extension or ""
+        extension = extension[1::] if extension.startswith(".") else extension
 
-        highlighted_code: str = highlight(content, lexer, formatter)
+        logger.debug("extension: %s", extension)
 
-        return templates.TemplateResponse(
-            "paste.html",
-            {
-                "request": request,
+        def page_context() -> Dict:
+            content: Optional[str] = read_paste_content(data)
+            language = extension
+            if content is None:
+                content = f"Binary content ({data.size} bytes, {data.content_type}), download it with: curl {BASE_URL}/paste/{uuid}"
+                language = "text"
+            return {
                 "uuid": uuid,
-                "highlighted_code": highlighted_code,
-                "pygments_css": formatter.get_style_defs(".highlight"),
-            },
+                "highlighted_code": highlight_code(content, language),
+                "pygments_css": pygments_css(),
+            }
+
+        # Highlighted once per revision, the body is only read on a miss. created_at tells
+        # apart a paste that reuses the id of a deleted one.
+        return render_page(
+            request,
+            "paste.html",
+            key=(uuid, data.created_at, head_revision(db, data), extension),
+            context=page_context,
         )
     except Exception:
         db.rollback()
@@ -310,23 +489,16 @@ async def post_as_a_file(
                     )
 
         content = await file.read()
-        file_content = content.decode("utf-8")
-
-        if len(content) > 102400:
-            s3_link: str = post_object_data(file_content)
-            file_data = Paste(extension=file_extension, s3_link=s3_link)
-            db.add(file_data)
-            db.commit()
-            db.refresh(file_data)
-            _uuid = file_data.pasteID
-            return PlainTextResponse(f"{BASE_URL}/paste/{_uuid}", status_code=status.HTTP_201_CREATED)
-        else:
-            file_data = Paste(content=file_content, extension=file_extension)
-            db.add(file_data)
-            db.commit()
-            db.refresh(file_data)
-            _uuid = file_data.pasteID
-            return PlainTextResponse(f"{BASE_URL}/paste/{_uuid}", status_code=status.HTTP_201_CREATED)
+
+        file_data = store_paste(
+            db,
+            memoryview(content),
+            extension=file_extension,
+            expiresat=expiration_time,
+            content_type=guess_content_type(file.filename, file.content_type),
+        )
+        _uuid = file_data.pasteID
+        return PlainTextResponse(f"{BASE_URL}/paste/{_uuid}", status_code=status.HTTP_201_CREATED)
 
     except Exception as e:
         db.rollback()
@@ -344,10 +516,9 @@ async def post_as_a_file(
 async def delete_paste(uuid: str, db: Session = Depends(get_db)) -> PlainTextResponse:
     uuid = extract_uuid(uuid)
     try:
-        data = db.query(Paste).filter(Paste.pasteID == uuid).first()
+        data = get_paste(db, uuid)
         if data:
-            db.delete(data)
-            db.commit()
+            delete_pastes(db, [data])
             return PlainTextResponse(f"File successfully deleted {uuid}")
         else:
             raise HTTPException(detail="File Not Found", status_code=status.HTTP_404_NOT_FOUND)
@@ -370,7 +541,7 @@ async def delete_paste(uuid: str, db: Session = Depends(get_db)) -> PlainTextRes
 @app.get("/web", response_class=HTMLResponse)
 @limiter.limit("100/minute")
 async def web(request: Request) -> Response:
-    return templates.TemplateResponse("web.html", {"request": request})
+    return render_page(request, "web.html")
 
 
 @app.post("/web", response_class=RedirectResponse)
@@ -407,26 +578,16 @@ async def web_post(
                         status_code=status.HTTP_400_BAD_REQUEST,
                     )
 
-        # Check if the size of the file_content is more than 100 KB
-        if len(content) > 102400:
-            s3_link: str = post_object_data(content)
-            file = Paste(
-                extension=extension,
-                s3_link=s3_link,
-                expiresat=expiration_time,
-            )
-            db.add(file)
-            db.commit()
-            db.refresh(file)
-            _uuid = file.pasteID
-            return RedirectResponse(f"{BASE_URL}/paste/{_uuid}", status_code=status.HTTP_303_SEE_OTHER)
-        else:
-            file = Paste(content=content, extension=extension, expiresat=expiration_time)
-            db.add(file)
-            db.commit()
-            db.refresh(file)
-            _uuid = file.pasteID
-            return RedirectResponse(f"{BASE_URL}/paste/{_uuid}", status_code=status.HTTP_303_SEE_OTHER)
+        file = store_paste(
+            db,
+            content.encode("utf-8"),
+            extension=extension,
+            expiresat=expiration_time,
+            content_type="text/plain",
+            encoding="utf-8",
+        )
+        _uuid = file.pasteID
+        return RedirectResponse(f"{BASE_URL}/paste/{_uuid}", status_code=status.HTTP_303_SEE_OTHER)
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -444,17 +605,34 @@ async def web_post(
 
 @app.get("/api/paste/{uuid}", response_model=PasteDetails)
 @limiter.limit("100/minute")
-async def get_paste_details(request: Request, uuid: str, db: Session = Depends(get_db)) -> JSONResponse:
+async def get_paste_details(request: Request, uuid: str, db: Session = Depends(get_read_db)) -> Response:
     try:
         uuid = extract_uuid(uuid)
-        data = db.query(Paste).filter(Paste.pasteID == uuid).first()
+        if not await paste_filter.might_exist(uuid):
+            raise HTTPException(detail="Paste not found", status_code=status.HTTP_404_NOT_FOUND)
+        data = get_paste(db, uuid)
         if data:
-            return JSONResponse(
-                content=PasteDetails(
+            content: Optional[str] = read_paste_content(data)
+            encoding: Optional[str] = data.encoding
+            if content is None:
+                # Binary bodies cannot travel in a JSON string as-is
+                content = base64.b64encode(read_paste_bytes(data)).decode("ascii")
+                encoding = "base64"
+            # Flushed counts plus the views this worker has not flushed yet
+            counter: Optional[PasteView] = db.get(PasteView, uuid)
+            pending_views, pending_last_viewed_at = view_counter.pending(uuid)
+            last_viewed_at = pending_last_viewed_at or (counter.last_viewed_at if counter else None)
+            return api_response(
+                request,
+                PasteDetails(
                     uuid=uuid,
-                    content=data.content,
+                    content=content,
                     extension=data.extension,
-                ).model_dump(),
+                    content_type=data.content_type,
+                    encoding=encoding,
+                    views=(counter.views if counter else 0) + pending_views,
+                    last_viewed_at=last_viewed_at,
+                ),
                 status_code=status.HTTP_200_OK,
             )
         else:
@@ -462,6 +640,8 @@ async def get_paste_details(request: Request, uuid: str, db: Session = Depends(g
                 detail="Paste not found",
                 status_code=status.HTTP_404_NOT_FOUND,
             )
+    except HTTPException:
+        raise
     except Exception:
         db.rollback()
         raise HTTPException(
@@ -474,7 +654,7 @@ async def get_paste_details(request: Request, uuid: str, db: Session = Depends(g
 
 @app.post("/api/paste", response_model=PasteResponse)
 @limiter.limit("100/minute")
-async def create_paste(request: Request, paste: PasteCreate, db: Session = Depends(get_db)) -> JSONResponse:
+async def create_paste(request: Request, paste: PasteCreate, db: Session = Depends(get_db)) -> Response:
     try:
         # Calculate expiration time if provided
         expiration_time = None
@@ -498,42 +678,342 @@ async def create_paste(request: Request, paste: PasteCreate, db: Session = Depen
                         status_code=status.HTTP_400_BAD_REQUEST,
                     )
 
-        file_content: bytes = paste.content.encode()
+        file = store_paste(
+            db,
+            paste.content.encode("utf-8"),
+            extension=paste.extension,
+            expiresat=expiration_time,
+            content_type="text/plain",
+            encoding="utf-8",
+        )
+        _uuid = file.pasteID
+        return api_response(
+            request,
+            PasteResponse(uuid=_uuid, url=f"{BASE_URL}/paste/{_uuid}"),
+            status_code=status.HTTP_201_CREATED,
+        )
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception:
+        db.rollback()
+        raise HTTPException(
+            detail="There was an error creating the paste",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    finally:
+        db.close()
+
 
-        if len(file_content) > 102400:
-            s3_link: str = post_object_data(file_content.decode("utf-8"))
-            file = Paste(
-                extension=paste.extension,
-                s3_link=s3_link,
-                expiresat=expiration_time,
-            )
-            db.add(file)
-            db.commit()
-            db.refresh(file)
-            _uuid = file.pasteID
-            return JSONResponse(
-                content=PasteResponse(uuid=_uuid, url=f"{BASE_URL}/paste/{_uuid}").model_dump(),
-                status_code=status.HTTP_201_CREATED,
+@app.put("/api/paste/{uuid}", response_model=RevisionResponse)
+@limiter.limit("100/minute")
+async def update_paste_content(request: Request, uuid: str, paste: PasteUpdate, db: Session = Depends(get_db)) -> Response:
+    """Replace the content of a paste, keeping the previous content as an earlier revision."""
+    try:
+        uuid = extract_uuid(uuid)
+        if not await paste_filter.might_exist(uuid):
+            raise HTTPException(detail="Paste not found", status_code=status.HTTP_404_NOT_FOUND)
+        data = get_paste(db, uuid)
+        if not data:
+            raise HTTPException(detail="Paste not found", status_code=status.HTTP_404_NOT_FOUND)
+        number = await asyncio.to_thread(
+            update_paste,
+            db,
+            data,
+            paste.content.encode("utf-8"),
+            extension=paste.extension,
+            content_type="text/plain",
+            encoding="utf-8",
+        )
+        return api_response(
+            request,
+            RevisionResponse(uuid=uuid, url=f"{BASE_URL}/paste/{uuid}", revision=number),
+            status_code=status.HTTP_200_OK,
+        )
+    except HTTPException:
+        db.rollback()
+        raise
+    except RevisionTooLargeError as e:
+        db.rollback()
+        raise HTTPException(detail=str(e), status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error updating paste: {e}")
+        raise HTTPException(
+            detail="There was an error updating the paste",
+            status_code=status.HTTP_409_CONFLICT,
+        )
+    finally:
+        db.close()
+
+
+@app.get("/api/paste/{uuid}/revisions", response_model=RevisionList)
+async def get_paste_revisions(request: Request, uuid: str, db: Session = Depends(get_read_db)) -> Response:
+    try:
+        uuid = extract_uuid(uuid)
+        if not await paste_filter.might_exist(uuid):
+            raise HTTPException(detail="Paste not found", status_code=status.HTTP_404_NOT_FOUND)
+        data = get_paste(db, uuid)
+        if not data:
+            raise HTTPException(detail="Paste not found", status_code=status.HTTP_404_NOT_FOUND)
+        revisions = [RevisionInfo(number=revision.number, size=revision.size, created_at=revision.created_at) for revision in list_revisions(db, data)]
+        if not revisions:
+            revisions = [RevisionInfo(number=1, size=data.size or 0, created_at=data.created_at)]
+        return api_response(request, RevisionList(uuid=uuid, revisions=revisions), status_code=status.HTTP_200_OK)
+    finally:
+        db.close()
+
+
+@app.get("/api/paste/{uuid}/revisions/{number}", response_model=PasteDetails)
+async def get_paste_revision(request: Request, uuid: str, number: int, db: Session = Depends(get_read_db)) -> Response:
+    try:
+        uuid = extract_uuid(uuid)
+        if not await paste_filter.might_exist(uuid):
+            raise HTTPException(detail="Paste not found", status_code=status.HTTP_404_NOT_FOUND)
+        data = get_paste(db, uuid)
+        if not data:
+            raise HTTPException(detail="Paste not found", status_code=status.HTTP_404_NOT_FOUND)
+        body = await asyncio.to_thread(read_revision, db, data, number)
+        content: Optional[str] = decode_text(body, data.encoding)
+        encoding: Optional[str] = data.encoding
+        if content is None:
+            content = base64.b64encode(body).decode("ascii")
+            encoding = "base64"
+        return api_response(
+            request,
+            PasteDetails(
+                uuid=uuid,
+                content=content,
+                extension=data.extension,
+                content_type=data.content_type,
+                encoding=encoding,
+                revision=number,
+            ),
+            status_code=status.HTTP_200_OK,
+        )
+    except RevisionNotFoundError as e:
+        raise HTTPException(detail=str(e), status_code=status.HTTP_404_NOT_FOUND)
+    finally:
+        db.close()
+
+
+@app.get("/api/paste/{uuid}/diff", response_class=PlainTextResponse)
+async def get_paste_diff(
+    uuid: str,
+    from_revision: Optional[int] = Query(None, alias="from", description="Defaults to the revision before `to`"),
+    to_revision: Optional[int] = Query(None, alias="to", description="Defaults to the latest revision"),
+    db: Session = Depends(get_read_db),
+) -> PlainTextResponse:
+    """Unified diff between two revisions of a paste."""
+    try:
+        uuid = extract_uuid(uuid)
+        if not await paste_filter.might_exist(uuid):
+            raise HTTPException(detail="Paste not found", status_code=status.HTTP_404_NOT_FOUND)
+        data = get_paste(db, uuid)
+        if not data:
+            raise HTTPException(detail="Paste not found", status_code=status.HTTP_404_NOT_FOUND)
+        to_revision = to_revision or head_revision(db, data)
+        from_revision = from_revision or max(to_revision - 1, 1)
+        diff = await asyncio.to_thread(diff_revisions, db, data, from_revision, to_revision)
+        return PlainTextResponse(diff, status_code=status.HTTP_200_OK)
+    except RevisionNotFoundError as e:
+        raise HTTPException(detail=str(e), status_code=status.HTTP_404_NOT_FOUND)
+    finally:
+        db.close()
+
+
+@app.get("/api/search", response_model=SearchResults, dependencies=[Depends(require_admin)])
+@limiter.limit("30/minute")
+async def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Words the paste must contain"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+) -> Response:
+    """Full-text search over paste bodies, best matches first, with a snippet of each match."""
+    try:
+        hits, has_more = await asyncio.to_thread(search_pastes, db, q, limit, offset)
+        return api_response(
+            request,
+            SearchResults(results=hits, next_offset=offset + limit if has_more else None),
+            status_code=status.HTTP_200_OK,
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error searching pastes: {e}")
+        raise HTTPException(
+            detail="Error searching pastes",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    finally:
+        db.close()
+
+
+@app.get("/api/export", dependencies=[Depends(require_admin)])
+async def export_all_pastes() -> StreamingResponse:
+    """
+    Stream every paste that has not expired as NDJSON, one paste per line with its body,
+    for backups and moves between databases. Load it again with POST /api/import.
+    """
+    filename = f"pastes-{datetime.utcnow():%Y%m%dT%H%M%SZ}.ndjson"
+    return StreamingResponse(
+        export_pastes(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.post("/api/import", response_model=ImportResult, dependencies=[Depends(require_admin)])
+async def import_all_pastes(request: Request) -> Response:
+    """Load pastes from an export streamed as the request body, skipping the ones that already exist."""
+    try:
+        imported, skipped = await import_pastes(request.stream())
+    except ImportFormatError as e:
+        raise HTTPException(detail=str(e), status_code=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error importing pastes: {e}")
+        raise HTTPException(
+            detail="Error importing pastes",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    logger.info(f"Imported {imported} pastes, skipped {skipped}")
+    return api_response(request, ImportResult(imported=imported, skipped=skipped), status_code=status.HTTP_200_OK)
+
+
+@app.get("/api/profiles", response_model=ProfileList, dependencies=[Depends(require_admin)])
+async def get_profiles(request: Request) -> Response:
+    """Profiles of the slowest sampled requests, see the `Profiling` middleware."""
+    profiles = await asyncio.to_thread(list_profiles, get_settings().PROFILING_PATH)
+    return api_response(request, ProfileList(profiles=profiles), status_code=status.HTTP_200_OK)
+
+
+@app.get("/api/profiles/{name}", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def get_profile(name: str) -> PlainTextResponse:
+    """A stored profile in folded stack format, as read by flamegraph.pl, inferno or speedscope."""
+    profile = await asyncio.to_thread(read_profile, get_settings().PROFILING_PATH, name)
+    if profile is None:
+        raise HTTPException(detail="Profile not found", status_code=status.HTTP_404_NOT_FOUND)
+    return PlainTextResponse(profile, status_code=status.HTTP_200_OK)
+
+
+def _upload_status(session: UploadSession) -> UploadStatus:
+    return UploadStatus(id=session.id, offset=session.offset, length=session.length)
+
+
+def _get_upload(db: Session, upload_id: str) -> UploadSession:
+    session = db.get(UploadSession, upload_id)
+    if session is None:
+        raise HTTPException(detail="Upload not found", status_code=status.HTTP_404_NOT_FOUND)
+    return session
+
+
+def _upload_error(session: UploadSession, exc: UploadError) -> HTTPException:
+    # Clients resume from the offset we report, whatever went wrong
+    return HTTPException(detail=str(exc), status_code=exc.status_code, headers={"Upload-Offset": str(session.offset)})
+
+
+@app.post("/api/uploads", response_model=UploadStatus)
+@limiter.limit("100/minute")
+async def create_upload_session(request: Request, upload: UploadCreate, db: Session = Depends(get_db)) -> Response:
+    """
+    Start a resumable upload. Chunks are sent with `PATCH /api/uploads/{id}` and an
+    `Upload-Offset` header, `POST /api/uploads/{id}/complete` turns the upload into a paste.
+    """
+    expiration_time = None
+    if upload.expiration:
+        current_time = datetime.utcnow()
+        if isinstance(upload.expiration, str):
+            expiration_time = (
+                current_time
+                + {
+                    "1h": timedelta(hours=1),
+                    "1d": timedelta(days=1),
+                    "1w": timedelta(weeks=1),
+                    "1m": timedelta(days=30),
+                }[upload.expiration]
             )
         else:
-            file = Paste(
-                content=file_content.decode("utf-8"),
-                extension=paste.extension,
-                expiresat=expiration_time,
-            )
-            db.add(file)
-            db.commit()
-            db.refresh(file)
-            _uuid = file.pasteID
-            return JSONResponse(
-                content=PasteResponse(uuid=_uuid, url=f"{BASE_URL}/paste/{_uuid}").model_dump(),
-                status_code=status.HTTP_201_CREATED,
-            )
+            expiration_time = upload.expiration
+            if expiration_time <= current_time:
+                raise HTTPException(
+                    detail="Expiration time must be in the future",
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                )
+
+    extension = upload.extension
+    if extension is None and upload.filename:
+        extension = Path(upload.filename).suffix or None
+    try:
+        session = create_upload(
+            db,
+            length=upload.length,
+            filename=upload.filename,
+            extension=extension,
+            expiresat=expiration_time,
+        )
+    except UploadError as e:
+        raise HTTPException(detail=str(e), status_code=e.status_code)
+    finally:
+        db.close()
+    return api_response(
+        request,
+        _upload_status(session),
+        status_code=status.HTTP_201_CREATED,
+        headers={"Location": f"{BASE_URL}/api/uploads/{session.id}"},
+    )
+
+
+@app.get("/api/uploads/{upload_id}", response_model=UploadStatus)
+async def get_upload_session(request: Request, upload_id: str, db: Session = Depends(get_db)) -> Response:
+    try:
+        session = _get_upload(db, upload_id)
+        return api_response(request, _upload_status(session), headers={"Upload-Offset": str(session.offset)})
+    finally:
+        db.close()
+
+
+@app.patch("/api/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def upload_chunk(
+    request: Request,
+    upload_id: str,
+    upload_offset: int = Header(..., ge=0),
+    db: Session = Depends(get_db),
+) -> Response:
+    """Append the request body at `Upload-Offset`, the body is streamed to the spool as it arrives."""
+    try:
+        session = _get_upload(db, upload_id)
+        try:
+            offset = await append_chunk(db, session, upload_offset, request.stream())
+        except UploadError as e:
+            db.rollback()
+            raise _upload_error(session, e)
+        return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"Upload-Offset": str(offset)})
+    finally:
+        db.close()
+
+
+@app.post("/api/uploads/{upload_id}/complete", response_model=PasteResponse)
+@limiter.limit("100/minute")
+async def complete_upload_session(request: Request, upload_id: str, db: Session = Depends(get_db)) -> Response:
+    try:
+        session = _get_upload(db, upload_id)
+        try:
+            paste = await asyncio.to_thread(complete_upload, db, session)
+        except UploadError as e:
+            db.rollback()
+            raise _upload_error(session, e)
+        _uuid = paste.pasteID
+        return api_response(
+            request,
+            PasteResponse(uuid=_uuid, url=f"{BASE_URL}/paste/{_uuid}"),
+            status_code=status.HTTP_201_CREATED,
+        )
     except HTTPException:
-        db.rollback()
         raise
-    except Exception:
+    except Exception as e:
         db.rollback()
+        logger.error(f"Error completing upload {upload_id}: {e}")
         raise HTTPException(
             detail="There was an error creating the paste",
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -542,17 +1022,25 @@ async def create_paste(request: Request, paste: PasteCreate, db: Session = Depen
         db.close()
 
 
+@app.delete("/api/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload_session(upload_id: str, db: Session = Depends(get_db)) -> Response:
+    try:
+        abort_upload(db, _get_upload(db, upload_id))
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    finally:
+        db.close()
+
+
 # --------------------------------------------------------------------
 # utility endpoints in REST order
 # --------------------------------------------------------------------
 
 
-@app.get("/languages.json", response_class=JSONResponse)
-async def get_languages() -> JSONResponse:
+@app.get("/languages.json", response_class=ORJSONResponse)
+async def get_languages(request: Request) -> Response:
     try:
-        with open(Path(BASE_DIR, "languages.json"), "r") as file:
-            languages_data: dict = json.load(file)
-        return JSONResponse(content=languages_data, status_code=status.HTTP_200_OK)
+        # Loaded and compressed once per worker, see lifespan()
+        return precompressed_response(request, ("languages.json",), load_languages, media_type="application/json")
     except FileNotFoundError:
         raise HTTPException(
             detail="Languages file not found",
@@ -1,17 +1,32 @@
+import asyncio
+import secrets
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
 from starlette import status
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
-from starlette.responses import Response
-from starlette.types import ASGIApp
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .auth import is_admin
+from .compression import STREAM_QUALITY, Compressor, choose_encoding, is_compressible
+from .profiling import SamplingProfiler, make_profiler, store_profile
+from .tracing import SPAN_KIND_SERVER, current_request_id, end_trace, span, start_trace
 
 
 class LimitUploadSize(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp, max_upload_size: int) -> None:
+    def __init__(self, app: ASGIApp, max_upload_size: int, exempt_paths: Tuple[str, ...] = ()) -> None:
         super().__init__(app)
         self.max_upload_size: int = max_upload_size
+        # Endpoints that stream their bodies and enforce their own limits
+        self.exempt_paths: Tuple[str, ...] = exempt_paths
 
     async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        if request.method == "POST":
+        # PUT replaces a paste's content, PATCH appends to resumable uploads, which check their own chunks
+        if request.method in ("POST", "PUT") and request.url.path not in self.exempt_paths:
             if "content-length" not in request.headers:
                 return Response(status_code=status.HTTP_411_LENGTH_REQUIRED)
             content_length: int = int(request.headers["content-length"])
@@ -21,3 +36,302 @@ class LimitUploadSize(BaseHTTPMiddleware):
                     status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
                 )
         return await call_next(request)
+
+
+class AdmissionClass:
+    """
+    Concurrency limit for one class of requests: at most `limit` run at once, up to
+    `queue_size` more wait (first come, first served) for at most `queue_timeout` seconds.
+    """
+
+    def __init__(self, limit: int, queue_size: int, queue_timeout: float) -> None:
+        self.limit: int = limit
+        self.queue_size: int = queue_size
+        self.queue_timeout: float = queue_timeout
+        self.active: int = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def saturated(self) -> bool:
+        return self.active >= self.limit
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """Take a slot, returns False when the request has to be shed."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+        except BaseException:
+            # Cancelled while waiting, hand on a slot that may have been passed to us meanwhile
+            if waiter.done():
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+        if waiter.done():
+            return True
+        waiter.cancel()
+        self._waiters.remove(waiter)
+        return False
+
+    def release(self) -> None:
+        # Slots go straight to the longest waiting request, `active` stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionControl:
+    """
+    Sheds load per class of request instead of letting every request slow down under a
+    spike. `classify` maps a request to a class name (None for requests that are never
+    shed). A request whose class is saturated moves to the class `degrade` maps it to,
+    flagged with `request.state.degraded`, and requests that cannot get a slot in time
+    get a fast 503 with Retry-After.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        classify: Callable[[Scope], Optional[str]],
+        classes: Callable[[], Dict[str, AdmissionClass]],
+        degrade: Optional[Dict[str, str]] = None,
+        retry_after: int = 1,
+    ) -> None:
+        self.app: ASGIApp = app
+        self.classify = classify
+        # Built when the middleware stack is, on the first request, not at import
+        self.classes: Dict[str, AdmissionClass] = classes()
+        self.degrade: Dict[str, str] = degrade or {}
+        self.retry_after: int = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        name = self.classify(scope) if scope["type"] == "http" else None
+        admission = self.classes.get(name) if name else None
+        if name is None or admission is None:
+            await self.app(scope, receive, send)
+            return
+
+        fallback = self.classes.get(self.degrade.get(name, ""))
+        if admission.saturated and fallback is not None:
+            scope.setdefault("state", {})["degraded"] = True
+            admission = fallback
+
+        if not await admission.acquire():
+            response = PlainTextResponse(
+                "Server is overloaded, try again later",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release()
+
+
+class RequestTracing:
+    """
+    Tags every request with a request id, taken from `X-Request-ID` or generated, and
+    echoes it in the response. Sampled requests are traced as a server span with the
+    spans of their database queries, storage calls, highlighting and rendering below it.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float) -> None:
+        self.app: ASGIApp = app
+        self.sample_rate: float = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        token = start_trace(headers.get("traceparent"), headers.get("x-request-id"), self.sample_rate)
+        request_id = current_request_id()
+        try:
+            with span(f"{scope['method']} {scope['path']}", kind=SPAN_KIND_SERVER, **{"http.request.method": scope["method"]}) as current:
+
+                async def send_with_request_id(message: Message) -> None:
+                    if message["type"] == "http.response.start":
+                        MutableHeaders(scope=message).append("X-Request-ID", request_id)
+                        if current is not None:
+                            current.attributes["http.response.status_code"] = message["status"]
+                    await send(message)
+
+                await self.app(scope, receive, send_with_request_id)
+                route = scope.get("route")
+                if current is not None and route is not None:
+                    # Name the span after the route template rather than the paste id in the path
+                    current.name = f"{scope['method']} {route.path}"
+                    current.attributes["http.route"] = route.path
+        finally:
+            end_trace(token)
+
+
+class Profiling:
+    """
+    Profiles requests of operators that send `X-Profile: sample|trace` (or `?profile=`)
+    with the admin token, answering with the profile in folded stack format instead of
+    the response. With `sample_every` set, 1 in that many requests is also profiled by
+    sampling and the `keep` slowest profiles are stored in `directory`. One request is
+    profiled at a time per worker. Only installed when profiling is enabled.
+    """
+
+    def __init__(self, app: ASGIApp, interval: float, sample_every: int, keep: int, directory: str) -> None:
+        self.app: ASGIApp = app
+        self.interval: float = interval
+        self.sample_every: int = sample_every
+        self.keep: int = keep
+        self.directory: str = directory
+        self._requests: int = 0
+        self._active: bool = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        mode = headers.get("x-profile") or QueryParams(scope["query_string"]).get("profile")
+        # Without the admin token the parameter is left to the app, which may use it itself
+        if mode is not None and is_admin(headers.get("authorization")):
+            await self._profile_on_demand(mode, scope, receive, send)
+            return
+
+        self._requests += 1
+        if self.sample_every > 0 and self._requests % self.sample_every == 0 and not self._active:
+            await self._profile_sampled(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _profile_on_demand(self, mode: str, scope: Scope, receive: Receive, send: Send) -> None:
+        profiler = make_profiler(mode, self.interval)
+        if profiler is None:
+            response = PlainTextResponse("Profile mode must be 'sample' or 'trace'", status_code=status.HTTP_400_BAD_REQUEST)
+        elif self._active:
+            response = PlainTextResponse("Another request is being profiled", status_code=status.HTTP_409_CONFLICT)
+        else:
+            response_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+
+            async def discard(message: Message) -> None:
+                nonlocal response_status
+                if message["type"] == "http.response.start":
+                    response_status = message["status"]
+
+            self._active = True
+            started = time.perf_counter()
+            profiler.start()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                profiler.stop()
+                self._active = False
+            response = PlainTextResponse(
+                profiler.folded(),
+                headers={
+                    "X-Profiled-Status": str(response_status),
+                    "X-Profiled-Duration": f"{time.perf_counter() - started:.6f}",
+                },
+            )
+        await response(scope, receive, send)
+
+    async def _profile_sampled(self, scope: Scope, receive: Receive, send: Send) -> None:
+        profiler = SamplingProfiler(self.interval)
+        self._active = True
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            self._active = False
+        request_id = current_request_id() or secrets.token_hex(16)
+        # After the response went out, the client does not wait for the write
+        await asyncio.to_thread(store_profile, self.directory, request_id, time.perf_counter() - started, profiler, self.keep)
+
+
+class Compression:
+    """
+    Compresses text responses of at least `minimum_size` bytes with brotli or gzip,
+    whichever the client accepts. Streamed responses are compressed chunk by chunk.
+    Responses that are already encoded, such as the precompressed ones from
+    `compression.response_cache`, pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int) -> None:
+        self.app: ASGIApp = app
+        self.minimum_size: int = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", "")) if scope["type"] == "http" else None
+        if encoding is None or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor: Optional[Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if "content-encoding" in headers or not is_compressible(headers.get("content-type", "")):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the first body chunk shows whether compressing is worth it
+                    start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body: bytes = message.get("body", b"")
+            more_body: bool = message.get("more_body", False)
+            if start is not None:
+                response_start, start = start, None
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(response_start)
+                    await send(message)
+                    return
+
+                compressor = Compressor(encoding, STREAM_QUALITY[encoding])
+                headers = MutableHeaders(scope=response_start)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                del headers["Content-Length"]
+                if not more_body:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(response_start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(response_start)
+
+            # Set by the first body chunk, sent before any later one
+            assert compressor is not None
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.finish()
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
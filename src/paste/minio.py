@@ -1,85 +1,131 @@
 import io
-import uuid
-from typing import Optional
+import os
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
 
 from minio import Minio
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
 
-from .config import get_settings
-
-client = Minio(
-    get_settings().MINIO_CLIENT_LINK,
-    access_key=get_settings().MINIO_ACCESS_KEY,
-    secret_key=get_settings().MINIO_SECRET_KEY,
-    secure=True,
-)
-
-
-def get_object_data(object_name: str, bucket_name: str = get_settings().MINIO_BUCKET_NAME) -> str | None:
-    response = None
-    data = None
-    try:
-        response = client.get_object(bucket_name, object_name)
-        data = response.read()
-    except S3Error as exc:
-        raise Exception("error occured.", exc)
-    except Exception as exc:
-        raise FileNotFoundError(f"Failed to retrieve file '{object_name}' from bucket '{bucket_name}': {exc}")
-    finally:
-        if response:
-            response.close()
-            response.release_conn()
-
-    return data.decode("utf-8")
-
-
-def post_object_data(
-    object_data: str,
-    object_name: Optional[str] = None,
-    bucket_name: str = get_settings().MINIO_BUCKET_NAME,
-) -> str:
-    try:
-        if not object_name:
-            object_name = str(uuid.uuid4())
-
-        data_bytes = object_data.encode("utf-8")
-        data_length = len(data_bytes)
-
-        client.put_object(
-            bucket_name=bucket_name,
-            object_name=object_name,
-            data=io.BytesIO(data_bytes),
-            length=data_length,
-            content_type="text/plain",
-        )
-
-        # Generate the object URL using the proper method
-        object_url = client.get_presigned_url(
-            "GET",
-            bucket_name=bucket_name,
-            object_name=object_name,
-        )
-        return object_url
-    except S3Error as exc:
-        raise Exception(f"Failed to upload file '{object_name}' to bucket '{bucket_name}': {exc}")
-
-
-def post_object_data_as_file(
-    source_file_path: str,
-    object_name: Optional[str] = None,
-    bucket_name: str = get_settings().MINIO_BUCKET_NAME,
-) -> None:
-    try:
-        if not object_name:
-            object_name = str(uuid.uuid4())
-
-        client.fput_object(bucket_name, object_name, source_file_path)
-    except S3Error as exc:
-        raise Exception(f"Failed to upload file '{object_name}' to bucket '{bucket_name}': {exc}")
-
-
-def delete_object_data(object_name: str, bucket_name: str = get_settings().MINIO_BUCKET_NAME) -> None:
-    try:
-        client.remove_object(bucket_name, object_name)
-    except S3Error as exc:
-        raise Exception(f"Failed to delete file '{object_name}' from bucket '{bucket_name}': {exc}")
+from .storage import Buffer, ObjectNotFoundError, ObjectStat, StorageBackend, StorageError
+
+_MISSING_OBJECT_CODES = ("NoSuchKey", "NoSuchObject")
+
+
+class _BufferReader(io.RawIOBase):
+    """Read-only stream over a buffer that copies one upload part at a time instead of the whole body."""
+
+    def __init__(self, data: Buffer) -> None:
+        self._view: memoryview = memoryview(data)
+        self._position: int = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(self._position + size, len(self._view))
+        chunk = self._view[self._position : end].tobytes()
+        self._position = end
+        return chunk
+
+
+class MinioStorage(StorageBackend):
+    """Storage backend keeping paste bodies in a MinIO (or any S3 compatible) bucket."""
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, bucket_name: str, secure: bool = True) -> None:
+        self.client: Minio = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure)
+        self.bucket_name: str = bucket_name
+
+    def put(self, key: str, data: Buffer, content_type: str = "application/octet-stream") -> None:
+        try:
+            self.client.put_object(
+                bucket_name=self.bucket_name,
+                object_name=key,
+                data=_BufferReader(data),
+                length=memoryview(data).nbytes,
+                content_type=content_type,
+            )
+        except S3Error as exc:
+            raise StorageError(f"Failed to upload file '{key}' to bucket '{self.bucket_name}': {exc}") from exc
+
+    def put_file(self, key: str, path: Path, content_type: str = "application/octet-stream") -> None:
+        try:
+            self.client.fput_object(self.bucket_name, key, str(path), content_type=content_type)
+        except S3Error as exc:
+            raise StorageError(f"Failed to upload file '{key}' to bucket '{self.bucket_name}': {exc}") from exc
+        os.unlink(path)
+
+    def get(self, key: str) -> bytes:
+        response = None
+        try:
+            response = self.client.get_object(self.bucket_name, key)
+            return response.read()
+        except S3Error as exc:
+            if exc.code in _MISSING_OBJECT_CODES:
+                raise ObjectNotFoundError(f"File '{key}' not found in bucket '{self.bucket_name}'") from exc
+            raise StorageError(f"Failed to retrieve file '{key}' from bucket '{self.bucket_name}': {exc}") from exc
+        finally:
+            if response:
+                response.close()
+                response.release_conn()
+
+    def stream(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        try:
+            response = self.client.get_object(self.bucket_name, key)
+        except S3Error as exc:
+            if exc.code in _MISSING_OBJECT_CODES:
+                raise ObjectNotFoundError(f"File '{key}' not found in bucket '{self.bucket_name}'") from exc
+            raise StorageError(f"Failed to retrieve file '{key}' from bucket '{self.bucket_name}': {exc}") from exc
+
+        def iter_chunks() -> Iterator[bytes]:
+            try:
+                yield from response.stream(chunk_size)
+            finally:
+                response.close()
+                response.release_conn()
+
+        return iter_chunks()
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.remove_object(self.bucket_name, key)
+        except S3Error as exc:
+            raise StorageError(f"Failed to delete file '{key}' from bucket '{self.bucket_name}': {exc}") from exc
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        # remove_objects is lazy: errors are only reported (and deletes only sent) while iterating
+        errors = list(self.client.remove_objects(self.bucket_name, (DeleteObject(key) for key in keys)))
+        if errors:
+            raise StorageError(f"Failed to delete {len(errors)} file(s) from bucket '{self.bucket_name}': {errors[0]}")
+
+    def stat(self, key: str) -> ObjectStat:
+        try:
+            result = self.client.stat_object(self.bucket_name, key)
+        except S3Error as exc:
+            if exc.code in _MISSING_OBJECT_CODES:
+                raise ObjectNotFoundError(f"File '{key}' not found in bucket '{self.bucket_name}'") from exc
+            raise StorageError(f"Failed to stat file '{key}' in bucket '{self.bucket_name}': {exc}") from exc
+        return ObjectStat(key=key, size=result.size or 0, content_type=result.content_type)
+
+    def ping(self) -> None:
+        try:
+            if not self.client.bucket_exists(self.bucket_name):
+                raise StorageError(f"Bucket '{self.bucket_name}' does not exist")
+        except S3Error as exc:
+            raise StorageError(f"Failed to reach bucket '{self.bucket_name}': {exc}") from exc
+
+    def presigned_url(
+        self,
+        key: str,
+        expires: timedelta,
+        content_type: Optional[str] = None,
+        content_disposition: Optional[str] = None,
+    ) -> Optional[str]:
+        # Overrides S3 applies to the response, signed into the URL
+        response_headers: Dict[str, str] = {}
+        if content_type:
+            response_headers["response-content-type"] = content_type
+        if content_disposition:
+            response_headers["response-content-disposition"] = content_disposition
+        return self.client.get_presigned_url("GET", bucket_name=self.bucket_name, object_name=key, expires=expires, response_headers=response_headers or None)
@@ -1,9 +1,15 @@
-from datetime import datetime
+import uuid
+from datetime import date, datetime
 
-from sqlalchemy import Column, DateTime, String, Text
+from sqlalchemy import BigInteger, Boolean, Column, Date, DateTime, Index, Integer, LargeBinary, String, Text, UniqueConstraint
+from sqlalchemy.engine import ExecutionContext
 
 from .database import Base
-from .utils import generate_uuid
+from .utils import expiry_bucket, generate_uuid
+
+
+def _default_expiry_bucket(context: ExecutionContext) -> date:
+    return expiry_bucket(context.get_current_parameters().get("expiresat"))
 
 
 class Paste(Base):
@@ -12,6 +18,83 @@ class Paste(Base):
     pasteID = Column(String(4), primary_key=True, default=generate_uuid)
     content = Column(Text)
     extension = Column(String(50))
-    s3_link = Column(String(500))
+    object_key = Column(String(500))
+    size = Column(BigInteger)
+    content_type = Column(String(100))
+    # Charset of the stored bytes, None when unknown or binary
+    encoding = Column(String(50))
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # When the row was written, unlike created_at also for imported pastes, see idfilter.py
+    inserted_at = Column(DateTime, default=datetime.utcnow, index=True)
+    expiresat = Column(DateTime, index=True)
+    # Partition key on PostgreSQL when PARTITIONED_STORAGE is enabled, see partitions.py
+    expires_bucket = Column(Date, nullable=False, default=_default_expiry_bucket)
+    # Whether the body went through the full-text search indexer, see search.py
+    search_indexed = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        # Lets the background indexer find the pastes it has not processed yet
+        Index(
+            "ix_pastes_search_pending",
+            "pasteID",
+            sqlite_where=search_indexed.is_(False),
+            postgresql_where=search_indexed.is_(False),
+        ),
+    )
+
+
+class PasteRevision(Base):
+    """
+    A past or current version of an updated paste. Every `REVISION_SNAPSHOT_INTERVAL`th
+    revision holds the whole body, the others a delta against the previous revision,
+    both zlib-compressed. Pastes that were never updated have no revisions.
+    """
+
+    __tablename__ = "paste_revisions"
+    __table_args__ = (UniqueConstraint("paste_id", "number", name="uq_paste_revisions_paste_id_number"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # No foreign key, pastes may be a partitioned table
+    paste_id = Column(String(4), nullable=False)
+    number = Column(Integer, nullable=False)
+    is_snapshot = Column(Boolean, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    # Size of the reconstructed body
+    size = Column(BigInteger, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PasteView(Base):
+    """View count of a paste, written in batches by views.ViewCounter."""
+
+    __tablename__ = "paste_views"
+
+    # No foreign key, pastes may be a partitioned table
+    paste_id = Column(String(4), primary_key=True)
+    views = Column(BigInteger, nullable=False, default=0)
+    last_viewed_at = Column(DateTime)
+
+
+class UploadSession(Base):
+    """A resumable upload in progress, its bytes are spooled to disk until it is completed."""
+
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    # Total size announced by the client, None when unknown until completion
+    length = Column(BigInteger)
+    offset = Column(BigInteger, nullable=False, default=0)
+    filename = Column(String(255))
+    extension = Column(String(50))
     expiresat = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+
+class RetiredObject(Base):
+    """Object no longer referenced by its paste after a promotion or an update, deleted by tiering.py once readers are done with it."""
+
+    __tablename__ = "retired_objects"
+
+    object_key = Column(String(500), primary_key=True)
+    retired_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
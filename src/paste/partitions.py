@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .database import Session_Local
+from .models import PasteRevision, PasteView
+from .search import unindex_pastes
+from .storage import get_storage
+
+logger = logging.getLogger("paste")
+
+# Arbitrary constant identifying the maintenance job in pg_try_advisory_xact_lock,
+# so only one worker creates or drops partitions at a time.
+_MAINTENANCE_LOCK_ID = 7_271_001
+
+_PARTITION_NAME: re.Pattern = re.compile(r"^pastes_p(\d{8})$")
+
+
+def partition_name(bucket: date) -> str:
+    return f"pastes_p{bucket:%Y%m%d}"
+
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(db.execute(text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'pastes'::regclass")).scalar())
+
+
+def _daily_partitions(db: Session) -> List[Tuple[str, date]]:
+    rows = db.execute(
+        text(
+            """
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'pastes'::regclass
+            """
+        )
+    ).scalars()
+    partitions: List[Tuple[str, date]] = []
+    for name in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, datetime.strptime(match.group(1), "%Y%m%d").date()))
+    return partitions
+
+
+def _create_partition(db: Session, bucket: date) -> None:
+    name = partition_name(bucket)
+    bounds = {"start": bucket, "end": bucket + timedelta(days=1)}
+    db.execute(text(f"CREATE TABLE {name} (LIKE pastes INCLUDING DEFAULTS)"))
+    # Rows for this day may already sit in the default partition (custom expiries beyond
+    # the pre-created horizon). They have to move before the partition can be attached.
+    db.execute(
+        text(
+            f"""
+            WITH moved AS (
+                DELETE FROM pastes_default
+                WHERE expires_bucket >= :start AND expires_bucket < :end
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """
+        ),
+        bounds,
+    )
+    db.execute(text(f"ALTER TABLE pastes ATTACH PARTITION {name} FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"))
+
+
+def _drop_partition(db: Session, name: str) -> List[str]:
+    object_keys = list(db.execute(text(f"SELECT object_key FROM {name} WHERE object_key IS NOT NULL")).scalars())
+    db.execute(text(f'DELETE FROM paste_search WHERE paste_id IN (SELECT "pasteID" FROM {name})'))
+    db.execute(text(f'DELETE FROM paste_revisions WHERE paste_id IN (SELECT "pasteID" FROM {name})'))
+    db.execute(text(f'DELETE FROM paste_views WHERE paste_id IN (SELECT "pasteID" FROM {name})'))
+    db.execute(text(f"DROP TABLE {name}"))
+    return object_keys
+
+
+def maintain_partitions(db: Session, today: Optional[date] = None) -> Tuple[int, int]:
+    """
+    Create the daily partitions for the next `PARTITION_PRECREATE_DAYS` days and
+    drop the partitions whose pastes have all expired, which removes a whole day
+    of pastes in O(1) instead of deleting them row by row.
+
+    Returns the number of partitions created and dropped.
+    """
+    if not is_partitioned(db):
+        return 0, 0
+    if not db.execute(text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": _MAINTENANCE_LOCK_ID}).scalar():
+        # Another worker is already maintaining the partitions
+        db.rollback()
+        return 0, 0
+
+    today = today or datetime.utcnow().date()
+    existing = {bucket: name for name, bucket in _daily_partitions(db)}
+
+    created = 0
+    for offset in range(get_settings().PARTITION_PRECREATE_DAYS + 1):
+        bucket = today + timedelta(days=offset)
+        if bucket not in existing:
+            _create_partition(db, bucket)
+            created += 1
+
+    # A bucket only holds pastes expiring on that day, so once the day is over all of them have expired
+    expired = db.execute(
+        text('DELETE FROM pastes_default WHERE expires_bucket < :today RETURNING "pasteID", object_key'),
+        {"today": today},
+    ).all()
+    expired_ids = [paste_id for paste_id, _ in expired]
+    unindex_pastes(db, expired_ids)
+    db.query(PasteRevision).filter(PasteRevision.paste_id.in_(expired_ids)).delete(synchronize_session=False)
+    db.query(PasteView).filter(PasteView.paste_id.in_(expired_ids)).delete(synchronize_session=False)
+    object_keys: List[str] = [key for _, key in expired if key]
+    dropped = 0
+    for bucket, name in existing.items():
+        if bucket < today:
+            object_keys.extend(_drop_partition(db, name))
+            dropped += 1
+
+    db.commit()
+
+    if object_keys:
+        get_storage().delete_many(object_keys)
+    return created, dropped
+
+
+async def maintain_partitions_periodically() -> None:
+    while True:
+        db: Session = Session_Local()
+        try:
+            created, dropped = await asyncio.to_thread(maintain_partitions, db)
+            if created or dropped:
+                logger.info(f"Partition maintenance: created {created}, dropped {dropped}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error in partition maintenance: {e}")
+        finally:
+            db.close()
+
+        await asyncio.sleep(get_settings().PARTITION_MAINTENANCE_INTERVAL_SECONDS)
@@ -0,0 +1,154 @@
+import os
+import re
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import Any, List, Optional
+
+# Profiles are named "<duration ms>-<request id>.folded", sorting by name sorts them by duration
+_PROFILE_NAME = re.compile(r"^(\d{8})-[\w.:-]+\.folded$")
+
+
+def _label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _fold(frame: Optional[FrameType]) -> str:
+    """The stack ending in `frame` in the collapsed format flamegraph tools read, outermost first."""
+    labels: List[str] = []
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class Profiler(ABC):
+    """
+    Collects stacks of the thread that starts it, which for requests is the event loop
+    thread. Other requests served while the profile runs show up in it as well.
+    """
+
+    def __init__(self) -> None:
+        self.stacks: Counter = Counter()
+
+    @abstractmethod
+    def start(self) -> None:
+        """Start profiling the calling thread."""
+
+    @abstractmethod
+    def stop(self) -> None:
+        """Stop profiling, `stacks` is complete afterwards."""
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class SamplingProfiler(Profiler):
+    """Counts the stacks seen every `interval` seconds, cheap enough for production traffic."""
+
+    def __init__(self, interval: float) -> None:
+        super().__init__()
+        self.interval: float = interval
+        self._target: int = 0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="paste-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class TracingProfiler(Profiler):
+    """
+    Attributes the time between every call and return to the stack it was spent in,
+    in microseconds. Exact, including C functions such as the regexes of `guess_lexer`,
+    but it slows the profiled code down several times.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._stack: Optional[str] = None
+        self._last_ns: int = 0
+
+    def _profile(self, frame: FrameType, event: str, arg: Any) -> None:
+        now = time.perf_counter_ns()
+        if self._stack is not None:
+            self.stacks[self._stack] += (now - self._last_ns) // 1000
+        if event == "c_call":
+            self._stack = f"{_fold(frame)};{getattr(arg, '__module__', None) or 'builtins'}.{arg.__qualname__}"
+        elif event == "return":
+            self._stack = _fold(frame.f_back)
+        else:
+            self._stack = _fold(frame)
+        self._last_ns = time.perf_counter_ns()
+
+    def start(self) -> None:
+        self._last_ns = time.perf_counter_ns()
+        sys.setprofile(self._profile)
+
+    def stop(self) -> None:
+        sys.setprofile(None)
+        # Drop stacks that took less than a microsecond in total
+        self.stacks = Counter({stack: count for stack, count in self.stacks.items() if count > 0})
+
+
+def make_profiler(mode: str, interval: float) -> Optional[Profiler]:
+    if mode == "sample":
+        return SamplingProfiler(interval)
+    if mode == "trace":
+        return TracingProfiler()
+    return None
+
+
+def list_profiles(directory: str) -> List[str]:
+    """Stored profiles, slowest first."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted((name for name in os.listdir(directory) if _PROFILE_NAME.match(name)), reverse=True)
+
+
+def read_profile(directory: str, name: str) -> Optional[str]:
+    if not _PROFILE_NAME.match(name):
+        return None
+    try:
+        return Path(directory, name).read_text()
+    except FileNotFoundError:
+        return None
+
+
+def store_profile(directory: str, request_id: str, duration: float, profile: Profiler, keep: int) -> Optional[str]:
+    """
+    Store `profile` if it is among the `keep` slowest of `directory`, returns its name
+    when it was stored. Workers sharing the directory share the ranking.
+    """
+    profiles = list_profiles(directory)
+    duration_ms = min(int(duration * 1000), 99_999_999)
+    if len(profiles) >= keep and duration_ms <= int(profiles[keep - 1][:8]):
+        return None
+
+    name = f"{duration_ms:08d}-{request_id}.folded"
+    os.makedirs(directory, exist_ok=True)
+    Path(directory, name).write_text(profile.folded())
+    for stale in list_profiles(directory)[keep:]:
+        try:
+            os.remove(os.path.join(directory, stale))
+        except FileNotFoundError:
+            pass
+    return name
@@ -0,0 +1,91 @@
+from typing import Any, Callable, Coroutine, Dict, Optional
+
+import msgpack
+import orjson
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson. Pydantic models are serialized straight
+    to bytes by pydantic-core, skipping the intermediate `model_dump()` dict.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return to_json(content)
+        return orjson.dumps(content)
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            content = content.model_dump(mode="json")
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def accepts_msgpack(request: Request) -> bool:
+    """Whether the client prefers MessagePack over JSON according to its Accept header."""
+    best_media_type: Optional[str] = None
+    best_quality = 0.0
+    for media_range in request.headers.get("accept", "").split(","):
+        media_type, *params = (part.strip() for part in media_range.split(";"))
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if media_type in MSGPACK_MEDIA_TYPES + ("application/json",) and quality > best_quality:
+            best_media_type, best_quality = media_type, quality
+    return best_media_type in MSGPACK_MEDIA_TYPES
+
+
+def api_response(
+    request: Request,
+    content: Any,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Render `content` (a Pydantic model or plain data) as MessagePack or JSON, whichever the client asked for."""
+    response_class = MsgPackResponse if accepts_msgpack(request) else ORJSONResponse
+    response = response_class(content=content, status_code=status_code, headers=headers)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+class MsgPackRequest(Request):
+    """Request whose MessagePack body is exposed through `json()`, where FastAPI looks for body data."""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body(), raw=False)
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    """Route class accepting MessagePack request bodies in addition to JSON."""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        original_route_handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "").split(";")[0].strip()
+            if content_type in MSGPACK_MEDIA_TYPES:
+                # FastAPI only parses bodies it considers JSON, the decoding itself happens in MsgPackRequest.json()
+                scope = dict(request.scope)
+                scope["headers"] = [(key, value) for key, value in request.scope["headers"] if key != b"content-type"]
+                scope["headers"].append((b"content-type", b"application/json"))
+                request = MsgPackRequest(scope, request.receive)
+            return await original_route_handler(request)
+
+        return route_handler
@@ -0,0 +1,209 @@
+import difflib
+import zlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .crud import index_paste_body, read_paste_bytes, set_paste_body
+from .database import recent_writes
+from .models import Paste, PasteRevision, RetiredObject
+from .search import unindex_pastes
+from .storage import get_storage
+from .utils import decode_text
+
+# Delta opcodes: copy a byte range of the base, or insert literal bytes
+_COPY = 0x43  # "C"
+_INSERT = 0x49  # "I"
+
+
+class RevisionTooLargeError(Exception):
+    pass
+
+
+class RevisionNotFoundError(Exception):
+    pass
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def make_delta(base: bytes, target: bytes) -> bytes:
+    """
+    Encode `target` as copies of line ranges of `base` and inserted bytes. Matching
+    lines rather than bytes keeps diffing fast on large configs and logs.
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    offsets = [0]
+    for line in base_lines:
+        offsets.append(offsets[-1] + len(line))
+
+    delta = bytearray()
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append(_COPY)
+            _write_varint(delta, offsets[i1])
+            _write_varint(delta, offsets[i2] - offsets[i1])
+        elif j2 > j1:
+            inserted = b"".join(target_lines[j1:j2])
+            delta.append(_INSERT)
+            _write_varint(delta, len(inserted))
+            delta += inserted
+    return bytes(delta)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    target = bytearray()
+    pos = 0
+    while pos < len(delta):
+        opcode = delta[pos]
+        pos += 1
+        if opcode == _COPY:
+            offset, pos = _read_varint(delta, pos)
+            length, pos = _read_varint(delta, pos)
+            target += base[offset : offset + length]
+        elif opcode == _INSERT:
+            length, pos = _read_varint(delta, pos)
+            target += delta[pos : pos + length]
+            pos += length
+        else:
+            raise ValueError(f"Invalid delta opcode {opcode:#x} at {pos - 1}")
+    return bytes(target)
+
+
+def list_revisions(db: Session, paste: Paste) -> List[PasteRevision]:
+    return db.query(PasteRevision).filter(PasteRevision.paste_id == paste.pasteID).order_by(PasteRevision.number).all()
+
+
+def head_revision(db: Session, paste: Paste) -> int:
+    """Number of the current revision, 1 for pastes that were never updated."""
+    last: Optional[PasteRevision] = db.query(PasteRevision).filter(PasteRevision.paste_id == paste.pasteID).order_by(PasteRevision.number.desc()).first()
+    return last.number if last else 1
+
+
+def update_paste(
+    db: Session,
+    paste: Paste,
+    content: bytes,
+    extension: Optional[str] = None,
+    content_type: Optional[str] = None,
+    encoding: Optional[str] = None,
+) -> int:
+    """
+    Replace the body of `paste`, recording the new body as a revision. Returns the
+    number of the new revision. The paste row keeps serving the latest body as before.
+    """
+    max_bytes = get_settings().REVISION_MAX_BYTES
+    if (paste.size or 0) > max_bytes or len(content) > max_bytes:
+        raise RevisionTooLargeError(f"Only pastes up to {max_bytes} bytes can be updated")
+
+    previous = read_paste_bytes(paste)
+    number = head_revision(db, paste) + 1
+    if number == 2:
+        # The first update records the original body, which was not a revision so far
+        db.add(
+            PasteRevision(
+                paste_id=paste.pasteID,
+                number=1,
+                is_snapshot=True,
+                data=zlib.compress(previous),
+                size=len(previous),
+                created_at=paste.created_at,
+            )
+        )
+
+    is_snapshot = (number - 1) % get_settings().REVISION_SNAPSHOT_INTERVAL == 0
+    db.add(
+        PasteRevision(
+            paste_id=paste.pasteID,
+            number=number,
+            is_snapshot=is_snapshot,
+            data=zlib.compress(content if is_snapshot else make_delta(previous, content)),
+            size=len(content),
+        )
+    )
+
+    previous_object = paste.object_key
+    set_paste_body(paste, content, content_type=content_type, encoding=encoding)
+    if extension is not None:
+        paste.extension = extension
+    unindex_pastes(db, [paste.pasteID])
+    index_paste_body(db, paste)
+    new_object = paste.object_key
+    if previous_object:
+        # Readers that started before the commit may still stream it, tiering.py deletes it later
+        db.add(RetiredObject(object_key=previous_object, retired_at=datetime.utcnow()))
+    try:
+        # Concurrent updates collide on the (paste_id, number) unique constraint
+        db.commit()
+    except Exception:
+        if new_object:
+            get_storage().delete(new_object)
+        raise
+    recent_writes.add(paste.pasteID)
+    return number
+
+
+def read_revision(db: Session, paste: Paste, number: int) -> bytes:
+    """Rebuild revision `number` from the closest snapshot at or before it and the deltas that follow."""
+    head = head_revision(db, paste)
+    if number == head:
+        return read_paste_bytes(paste)
+    if not 1 <= number < head:
+        raise RevisionNotFoundError(f"Paste {paste.pasteID} has no revision {number}")
+
+    revisions = (
+        db.query(PasteRevision)
+        .filter(PasteRevision.paste_id == paste.pasteID)
+        .filter(PasteRevision.number <= number)
+        .filter(
+            PasteRevision.number
+            >= db.query(PasteRevision.number)
+            .filter(PasteRevision.paste_id == paste.pasteID, PasteRevision.number <= number, PasteRevision.is_snapshot.is_(True))
+            .order_by(PasteRevision.number.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        .order_by(PasteRevision.number)
+        .all()
+    )
+    body = zlib.decompress(revisions[0].data)
+    for revision in revisions[1:]:
+        body = apply_delta(body, zlib.decompress(revision.data))
+    return body
+
+
+def diff_revisions(db: Session, paste: Paste, from_number: int, to_number: int) -> str:
+    """Unified diff between two revisions of `paste`."""
+    before = read_revision(db, paste, from_number)
+    after = read_revision(db, paste, to_number)
+    from_label, to_label = f"{paste.pasteID}@{from_number}", f"{paste.pasteID}@{to_number}"
+    before_text, after_text = decode_text(before), decode_text(after)
+    if before_text is None or after_text is None:
+        return "" if before == after else f"Binary files {from_label} and {to_label} differ\n"
+    lines = difflib.unified_diff(
+        before_text.splitlines(),
+        after_text.splitlines(),
+        fromfile=from_label,
+        tofile=to_label,
+        lineterm="",
+    )
+    return "".join(f"{line}\n" for line in lines)
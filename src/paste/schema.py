@@ -1,6 +1,6 @@
 import time
 from datetime import datetime
-from typing import Literal, Optional, Union
+from typing import List, Literal, Optional, Union
 
 from pydantic import BaseModel, Field
 
@@ -24,15 +24,112 @@ class PasteDetails(BaseModel):
     uuid: str
     content: str
     extension: Optional[str] = None
+    content_type: Optional[str] = None
+    # Charset the content was decoded from, "base64" when binary content is base64 encoded
+    encoding: Optional[str] = None
+    # Set when a specific revision was requested
+    revision: Optional[int] = None
+    views: Optional[int] = None
+    last_viewed_at: Optional[datetime] = None
+
+
+class PasteUpdate(BaseModel):
+    content: str
+    extension: Optional[str] = None
+
+
+class RevisionResponse(BaseModel):
+    uuid: str
+    url: str
+    revision: int
+
+
+class RevisionInfo(BaseModel):
+    number: int
+    size: int
+    created_at: Optional[datetime] = None
+
+
+class RevisionList(BaseModel):
+    uuid: str
+    revisions: List[RevisionInfo]
+
+
+class UploadCreate(BaseModel):
+    length: Optional[int] = Field(default=None, ge=0)  # Total size in bytes, if known up front
+    filename: Optional[str] = None
+    extension: Optional[str] = None
+    expiration: Optional[Union[Literal["1h", "1d", "1w", "1m"], datetime]] = None
+
+
+class UploadStatus(BaseModel):
+    id: str
+    offset: int
+    length: Optional[int] = None
+
+
+class SearchHit(BaseModel):
+    uuid: str
+    extension: Optional[str] = None
+    created_at: Optional[datetime] = None
+    # Excerpt of the body with the matched terms between `**` markers
+    snippet: str
+
+
+class SearchResults(BaseModel):
+    results: List[SearchHit]
+    # Offset of the next page, None on the last page
+    next_offset: Optional[int] = None
+
+
+class ProfileList(BaseModel):
+    # Names of the stored profiles, slowest request first
+    profiles: List[str]
+
+
+class ImportResult(BaseModel):
+    imported: int
+    # Pastes that already existed or have expired since the export
+    skipped: int
+
+
+class PoolStatus(BaseModel):
+    """Schema for database connection pool usage"""
+
+    size: int
+    max_overflow: int
+    checked_out: int
+    overflow: int
+    saturation: Optional[float] = None  # checked_out / (size + max_overflow), None when unbounded
+
+
+class ReplicaStatus(BaseModel):
+    host: Optional[str] = None
+    healthy: bool
+    response_time_ms: Optional[float] = Field(default=None, ge=0)
+    pool: Optional[PoolStatus] = None
 
 
 class HealthResponse(BaseModel):
     """Schema for successful health check response"""
 
-    status: Literal["ok"] = "ok"
+    status: Literal["ok", "degraded"] = "ok"
     database: Literal["connected"] = "connected"
     timestamp: float = Field(default_factory=time.time)
     db_response_time_ms: float = Field(ge=0)  # Must be greater than or equal to 0
+    pool_checkout_ms: Optional[float] = Field(default=None, ge=0)
+    pool: Optional[PoolStatus] = None
+    storage: Literal["reachable", "unreachable"] = "reachable"
+    storage_response_time_ms: Optional[float] = Field(default=None, ge=0)
+    sweeper_lag_seconds: Optional[float] = None
+    replicas: List[ReplicaStatus] = []
+
+
+class LivenessResponse(BaseModel):
+    """Schema for liveness probe response"""
+
+    status: Literal["ok"] = "ok"
+    timestamp: float = Field(default_factory=time.time)
 
 
 class HealthErrorResponse(BaseModel):
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .database import Session_Local
+from .models import Paste
+from .schema import SearchHit
+from .storage import get_storage
+from .utils import decode_text
+
+logger = logging.getLogger("paste")
+
+# Markers around the matched terms in snippets
+SNIPPET_START, SNIPPET_END = "**", "**"
+
+# PostgreSQL text search configuration, "simple" does no stemming or stop-word removal, which suits code
+_TS_CONFIG = "simple"
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def search_rowid(paste_id: str) -> int:
+    """
+    FTS5 rowid of a paste. Ids are at most a few ASCII characters, so their bytes read as
+    an integer are unique, and rows can be deleted by rowid instead of scanning the index.
+    """
+    return int.from_bytes(paste_id.encode("ascii"), "big")
+
+
+def _match_query(query: str) -> str:
+    # Quote every term so user input is never parsed as FTS5 query syntax, terms are ANDed
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def index_paste(db: Session, paste_id: str, body: str) -> None:
+    """Add the body of a paste to the search index, in the caller's transaction."""
+    body = body[: get_settings().SEARCH_INDEX_MAX_CHARS]
+    if _dialect(db) == "sqlite":
+        db.execute(
+            text("INSERT INTO paste_search (rowid, paste_id, body) VALUES (:rowid, :paste_id, :body)"),
+            {"rowid": search_rowid(paste_id), "paste_id": paste_id, "body": body},
+        )
+    else:
+        db.execute(
+            text("INSERT INTO paste_search (paste_id, body) VALUES (:paste_id, :body)"),
+            {"paste_id": paste_id, "body": body},
+        )
+
+
+def unindex_pastes(db: Session, paste_ids: Iterable[str]) -> None:
+    """Remove pastes from the search index, in the caller's transaction."""
+    paste_ids = list(paste_ids)
+    if not paste_ids:
+        return
+    if _dialect(db) == "sqlite":
+        statement = text("DELETE FROM paste_search WHERE rowid IN :rowids").bindparams(bindparam("rowids", expanding=True))
+        db.execute(statement, {"rowids": [search_rowid(paste_id) for paste_id in paste_ids]})
+    else:
+        statement = text("DELETE FROM paste_search WHERE paste_id IN :paste_ids").bindparams(bindparam("paste_ids", expanding=True))
+        db.execute(statement, {"paste_ids": paste_ids})
+
+
+def search_pastes(db: Session, query: str, limit: int = 20, offset: int = 0) -> Tuple[List[SearchHit], bool]:
+    """
+    Return one page of the live pastes matching `query`, best matches first, and
+    whether more results follow.
+    """
+    params = {"limit": limit + 1, "offset": offset, "now": datetime.utcnow()}
+    if _dialect(db) == "sqlite":
+        params.update(query=_match_query(query), start=SNIPPET_START, end=SNIPPET_END)
+        if not params["query"]:
+            return [], False
+        statement = text(
+            """
+            SELECT p."pasteID", p.extension, p.created_at,
+                   snippet(paste_search, 1, :start, :end, '…', 16) AS snippet
+            FROM paste_search
+            JOIN pastes p ON p."pasteID" = paste_search.paste_id
+            WHERE paste_search MATCH :query AND (p.expiresat IS NULL OR p.expiresat > :now)
+            ORDER BY paste_search.rank
+            LIMIT :limit OFFSET :offset
+            """
+        )
+    else:
+        params.update(
+            query=query,
+            options=f"StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords=20, MinWords=5, MaxFragments=1",
+        )
+        # Headlines are expensive, they are only computed for the page being returned
+        statement = text(
+            f"""
+            SELECT page.paste_id, page.extension, page.created_at,
+                   ts_headline('{_TS_CONFIG}', s.body, page.q, :options) AS snippet
+            FROM (
+                SELECT s.paste_id, p.extension, p.created_at, q, ts_rank(s.document, q) AS rank
+                FROM paste_search s
+                JOIN pastes p ON p."pasteID" = s.paste_id
+                CROSS JOIN websearch_to_tsquery('{_TS_CONFIG}', :query) AS q
+                WHERE s.document @@ q AND (p.expiresat IS NULL OR p.expiresat > :now)
+                ORDER BY rank DESC
+                LIMIT :limit OFFSET :offset
+            ) page
+            JOIN paste_search s ON s.paste_id = page.paste_id
+            ORDER BY page.rank DESC
+            """
+        )
+
+    rows = db.execute(statement, params).all()
+    hits = [SearchHit(uuid=paste_id, extension=extension, created_at=created_at, snippet=snippet) for paste_id, extension, created_at, snippet in rows[:limit]]
+    return hits, len(rows) > limit
+
+
+def index_pending_pastes(db: Session, batch_size: int = 100) -> int:
+    """
+    Index the text bodies of object-backed pastes, which are not indexed when they
+    are created. Binary and oversized bodies, and bodies the index rejects, are marked
+    as done without being indexed. Returns the number of pastes processed.
+    """
+    pending: List[Paste] = db.query(Paste).filter(Paste.search_indexed.is_(False)).limit(batch_size).all()
+    max_bytes = 4 * get_settings().SEARCH_INDEX_MAX_CHARS
+    for paste in pending:
+        body: Optional[str] = None
+        if paste.object_key is None:
+            body = paste.content or ""
+        elif paste.size is None or paste.size <= max_bytes:
+            try:
+                body = decode_text(get_storage().get(paste.object_key), paste.encoding)
+            except FileNotFoundError:
+                logger.warning(f"Object of paste {paste.pasteID} is missing, not indexing it")
+        if body is not None:
+            try:
+                # In a savepoint, so one body the database refuses does not fail the batch over and over
+                with db.begin_nested():
+                    index_paste(db, paste.pasteID, body)
+            except DBAPIError as e:
+                logger.warning(f"Could not index paste {paste.pasteID}, leaving it out of search: {e}")
+        paste.search_indexed = True
+    db.commit()
+    return len(pending)
+
+
+async def index_pending_pastes_periodically() -> None:
+    while True:
+        db: Session = Session_Local()
+        try:
+            # Work through the backlog batch by batch, then wait for new pastes
+            while await asyncio.to_thread(index_pending_pastes, db):
+                pass
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error in search indexing: {e}")
+        finally:
+            db.close()
+
+        await asyncio.sleep(get_settings().SEARCH_INDEX_INTERVAL_SECONDS)
@@ -0,0 +1,210 @@
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+
+from .config import get_settings
+
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class StorageError(Exception):
+    """Raised when the storage backend fails to complete an operation."""
+
+
+class ObjectNotFoundError(StorageError, FileNotFoundError):
+    """Raised when the requested object does not exist in the storage backend."""
+
+
+@dataclass(frozen=True)
+class ObjectStat:
+    key: str
+    size: int
+    content_type: Optional[str] = None
+
+
+class StorageBackend(ABC):
+    """Interface for the stores that hold paste bodies too large for the database."""
+
+    @abstractmethod
+    def put(self, key: str, data: Buffer, content_type: str = "application/octet-stream") -> None:
+        """Store `data` under `key`, replacing any existing object."""
+
+    @abstractmethod
+    def put_file(self, key: str, path: Path, content_type: str = "application/octet-stream") -> None:
+        """
+        Store the file at `path` under `key` without loading it into memory. The file
+        is consumed: it is moved into place or removed once uploaded.
+        """
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """Return the full body stored under `key`."""
+
+    @abstractmethod
+    def stream(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield the body stored under `key` in chunks of at most `chunk_size` bytes."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove the object stored under `key`. Missing objects are ignored."""
+
+    @abstractmethod
+    def stat(self, key: str) -> ObjectStat:
+        """Return size and metadata of the object stored under `key`."""
+
+    @abstractmethod
+    def ping(self) -> None:
+        """Check that the backend is reachable, raising `StorageError` if it is not."""
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.delete(key)
+
+    def presigned_url(
+        self,
+        key: str,
+        expires: timedelta,
+        content_type: Optional[str] = None,
+        content_disposition: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Return a short-lived URL clients can fetch `key` from directly, or None
+        when the backend cannot serve objects itself. The object is served with
+        `content_type` and `content_disposition` when given, whatever it was stored with.
+        """
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """
+    Filesystem backend for single-node deployments.
+
+    Objects are spread over two levels of hash-sharded directories so no single
+    directory grows unbounded, e.g. `<root>/3f/a2/<key>`. Writes go to a temporary
+    file in the target directory and are moved into place with `os.replace`, so
+    readers never observe a partially written object. Reads are served from a
+    read-only memory map of the file.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root: Path = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        if not key or key in (".", "..") or "/" in key or os.sep in key:
+            raise StorageError(f"Invalid object key '{key}'")
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.root / digest[:2] / digest[2:4] / key
+
+    def put(self, key: str, data: Buffer, content_type: str = "application/octet-stream") -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise StorageError(f"Failed to store object '{key}': {exc}") from exc
+
+    def put_file(self, key: str, path: Path, content_type: str = "application/octet-stream") -> None:
+        target = self._path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(path, "rb") as source:
+                os.fsync(source.fileno())
+            os.replace(path, target)
+            return
+        except OSError:
+            # Most likely a different filesystem, fall back to copying through a temporary file
+            pass
+
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file, open(path, "rb") as source:
+                shutil.copyfileobj(source, tmp_file)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, target)
+        except OSError as exc:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise StorageError(f"Failed to store object '{key}': {exc}") from exc
+        os.unlink(path)
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._path(key), "rb") as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return b""
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped[:]
+        except FileNotFoundError as exc:
+            raise ObjectNotFoundError(f"Object '{key}' not found") from exc
+
+    def stream(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        try:
+            file = open(self._path(key), "rb")
+        except FileNotFoundError as exc:
+            raise ObjectNotFoundError(f"Object '{key}' not found") from exc
+        return self._iter_mapped(file, chunk_size)
+
+    @staticmethod
+    def _iter_mapped(file: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+        with file:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(0, size, chunk_size):
+                    yield mapped[offset : offset + chunk_size]
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def stat(self, key: str) -> ObjectStat:
+        try:
+            return ObjectStat(key=key, size=os.stat(self._path(key)).st_size)
+        except FileNotFoundError as exc:
+            raise ObjectNotFoundError(f"Object '{key}' not found") from exc
+
+    def ping(self) -> None:
+        if not os.access(self.root, os.W_OK):
+            raise StorageError(f"Storage directory '{self.root}' is not writable")
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    settings = get_settings()
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.LOCAL_STORAGE_PATH)
+
+    from .minio import MinioStorage
+
+    return MinioStorage(
+        settings.MINIO_CLIENT_LINK,
+        access_key=settings.MINIO_ACCESS_KEY,
+        secret_key=settings.MINIO_SECRET_KEY,
+        bucket_name=settings.MINIO_BUCKET_NAME,
+        secure=settings.MINIO_SECURE,
+    )
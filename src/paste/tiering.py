@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import and_, delete, func, or_, select, text, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from .config import get_settings
+from .database import Session_Local
+from .models import Paste, PasteView, RetiredObject
+from .storage import get_storage
+
+logger = logging.getLogger("paste")
+
+# Arbitrary constant identifying the migrator in pg_try_advisory_xact_lock, so only one
+# worker moves bodies at a time.
+_TIERING_LOCK_ID = 7_271_003
+
+
+def _live(now: datetime) -> ColumnElement:
+    return or_(Paste.expiresat.is_(None), Paste.expiresat > now)
+
+
+def _try_lock(db: Session) -> bool:
+    """Take the migrator lock until the end of the transaction, False if another worker holds it."""
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    if db.execute(text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": _TIERING_LOCK_ID}).scalar():
+        return True
+    db.rollback()
+    return False
+
+
+def demote_pastes(db: Session, limit: int) -> int:
+    """
+    Move inline bodies that are too large for the database, or large enough and cold,
+    to the storage backend. Returns the number of pastes moved.
+    """
+    if not _try_lock(db):
+        return 0
+    settings = get_settings()
+    now = datetime.utcnow()
+    last_access = func.coalesce(PasteView.last_viewed_at, Paste.created_at)
+    candidates: List[Paste] = (
+        db.query(Paste)
+        .outerjoin(PasteView, PasteView.paste_id == Paste.pasteID)
+        .filter(Paste.object_key.is_(None), Paste.content.is_not(None), _live(now))
+        .filter(
+            or_(
+                Paste.size > settings.INLINE_CONTENT_MAX_BYTES,
+                and_(Paste.size >= settings.TIERING_COLD_MIN_BYTES, last_access < now - timedelta(days=settings.TIERING_COLD_DAYS)),
+            )
+        )
+        .order_by(last_access)
+        .limit(limit)
+        .all()
+    )
+
+    storage = get_storage()
+    uploaded: List[str] = []
+    moved = 0
+    try:
+        for paste in candidates:
+            object_key = str(uuid.uuid4())
+            storage.put(object_key, paste.content.encode("utf-8"), content_type=paste.content_type or "text/plain")
+            uploaded.append(object_key)
+            # Only if the body is still the one uploaded, an update may have replaced it meanwhile
+            result = db.execute(
+                update(Paste)
+                .where(Paste.pasteID == paste.pasteID, Paste.object_key.is_(None), Paste.content == paste.content)
+                .values(content=None, object_key=object_key, encoding="utf-8")
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                moved += 1
+            else:
+                storage.delete(uploaded.pop())
+        db.commit()
+    except Exception:
+        db.rollback()
+        storage.delete_many(uploaded)
+        raise
+    return moved
+
+
+def promote_pastes(db: Session, limit: int) -> int:
+    """
+    Move small UTF-8 bodies that are read often from the storage backend into the
+    database. Returns the number of pastes moved.
+    """
+    if not _try_lock(db):
+        return 0
+    settings = get_settings()
+    now = datetime.utcnow()
+    candidates: List[Paste] = (
+        db.query(Paste)
+        .join(PasteView, PasteView.paste_id == Paste.pasteID)
+        .filter(Paste.object_key.is_not(None), Paste.size <= settings.INLINE_CONTENT_MAX_BYTES, _live(now))
+        .filter(PasteView.views >= settings.TIERING_HOT_MIN_VIEWS, PasteView.last_viewed_at >= now - timedelta(days=settings.TIERING_HOT_DAYS))
+        .order_by(PasteView.views.desc())
+        .limit(limit)
+        .all()
+    )
+
+    storage = get_storage()
+    retired: List[str] = []
+    for paste in candidates:
+        if paste.encoding not in (None, "utf-8"):
+            # Inline bodies are served as UTF-8, other charsets stay byte for byte in the store
+            continue
+        try:
+            content = str(storage.get(paste.object_key), "utf-8")
+        except (UnicodeDecodeError, FileNotFoundError):
+            continue
+        result = db.execute(
+            update(Paste)
+            .where(Paste.pasteID == paste.pasteID, Paste.object_key == paste.object_key)
+            .values(content=content, object_key=None, encoding="utf-8")
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            # Recorded with the promotion, so the object is deleted later even if this worker dies
+            db.add(RetiredObject(object_key=paste.object_key, retired_at=now))
+            retired.append(paste.object_key)
+    db.commit()
+    return len(retired)
+
+
+def backfill_object_sizes(db: Session, limit: int) -> int:
+    """
+    Record the size of object-backed pastes stored before sizes were, which the rules
+    above filter on. Returns the number of pastes measured.
+    """
+    if not _try_lock(db):
+        return 0
+    rows = db.execute(select(Paste.pasteID, Paste.object_key).where(Paste.size.is_(None), Paste.object_key.is_not(None)).limit(limit)).all()
+    storage = get_storage()
+    for paste_id, object_key in rows:
+        try:
+            size = storage.stat(object_key).size
+        except FileNotFoundError:
+            # Nothing left to serve, recorded anyway so the paste is not looked at again
+            size = 0
+        db.execute(
+            update(Paste)
+            .where(Paste.pasteID == paste_id, Paste.object_key == object_key, Paste.size.is_(None))
+            .values(size=size)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return len(rows)
+
+
+def delete_retired_objects(db: Session, older_than: float = 0) -> int:
+    """Delete the objects of promoted or updated pastes retired at least `older_than` seconds ago."""
+    if not _try_lock(db):
+        return 0
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    object_keys: List[str] = list(
+        db.execute(select(RetiredObject.object_key).where(RetiredObject.retired_at <= cutoff).limit(get_settings().TIERING_BATCH_SIZE)).scalars()
+    )
+    if object_keys:
+        # Deleted before the rows, a failure in between only means deleting them again
+        get_storage().delete_many(object_keys)
+        db.execute(delete(RetiredObject).where(RetiredObject.object_key.in_(object_keys)))
+    db.commit()
+    return len(object_keys)
+
+
+def migrate_tiers(db: Session) -> Tuple[int, int]:
+    """One pass of the migrator, returns the number of pastes demoted and promoted."""
+    limit = get_settings().TIERING_BATCH_SIZE
+    # Objects retired by an earlier pass are no longer read by requests that started before it
+    delete_retired_objects(db, older_than=get_settings().TIERING_INTERVAL_SECONDS / 2)
+    backfill_object_sizes(db, limit)
+    return demote_pastes(db, limit), promote_pastes(db, limit)
+
+
+async def migrate_tiers_periodically() -> None:
+    while True:
+        db: Session = Session_Local()
+        try:
+            demoted, promoted = await asyncio.to_thread(migrate_tiers, db)
+            if demoted or promoted:
+                logger.info(f"Tiering: moved {demoted} pastes to the storage backend, {promoted} into the database")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error in tiering: {e}")
+        finally:
+            db.close()
+
+        await asyncio.sleep(get_settings().TIERING_INTERVAL_SECONDS)
+
+
+async def delete_retired_objects_periodically() -> None:
+    """Run in place of the migrator when tiering is disabled, updates still retire objects."""
+    while True:
+        db: Session = Session_Local()
+        try:
+            await asyncio.to_thread(delete_retired_objects, db, get_settings().TIERING_INTERVAL_SECONDS / 2)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error deleting retired objects: {e}")
+        finally:
+            db.close()
+
+        await asyncio.sleep(get_settings().TIERING_INTERVAL_SECONDS)
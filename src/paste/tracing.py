@@ -0,0 +1,204 @@
+import logging
+import random
+import re
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+TRACE_LOGGER_NAME = "paste.trace"
+
+trace_logger = logging.getLogger(TRACE_LOGGER_NAME)
+
+# W3C trace context: version-traceid-parentid-flags
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_REQUEST_ID = re.compile(r"^[\w.:-]{1,128}$")
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+_STATUS_ERROR = 2
+
+# Longer statements are cut, the interesting part of a query is its start
+_MAX_STATEMENT_LENGTH = 500
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    kind: int
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    request_id: str
+    sampled: bool
+    # Set when the request continues a trace started by the caller
+    remote_parent_id: Optional[str] = None
+    spans: List[Span] = field(default_factory=list)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("paste_trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("paste_span", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+def current_trace_ids() -> Tuple[Optional[str], Optional[str]]:
+    """Trace and span id to correlate log lines with, both None unless the request is sampled."""
+    trace = _current_trace.get()
+    if trace is None or not trace.sampled:
+        return None, None
+    return trace.trace_id, _current_span.get()
+
+
+def start_trace(traceparent: Optional[str], request_id: Optional[str], sample_rate: float) -> Token:
+    """
+    Start the trace of a request. Callers that send a W3C `traceparent` keep their
+    trace id and sampling decision, as long as tracing is enabled at all. Every
+    request gets a request id for its log lines, sampled or not.
+    """
+    trace_id, parent_id, sampled = None, None, False
+    match = _TRACEPARENT.match(traceparent or "")
+    if match and sample_rate > 0:
+        trace_id, parent_id, sampled = match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+    else:
+        sampled = random.random() < sample_rate
+    trace_id = trace_id or secrets.token_hex(16)
+    if not request_id or not _REQUEST_ID.match(request_id):
+        request_id = trace_id
+    return _current_trace.set(Trace(trace_id=trace_id, request_id=request_id, sampled=sampled, remote_parent_id=parent_id))
+
+
+def end_trace(token: Token) -> None:
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is not None and trace.sampled and trace.spans:
+        export(trace)
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the enclosed block as a span of the current request, a no-op unless it is sampled."""
+    trace = _current_trace.get()
+    if trace is None or not trace.sampled:
+        yield None
+        return
+
+    current = Span(
+        name=name,
+        span_id=secrets.token_hex(8),
+        parent_id=_current_span.get() or trace.remote_parent_id,
+        kind=kind,
+        start_ns=time.time_ns(),
+        attributes=attributes,
+    )
+    token = _current_span.set(current.span_id)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        trace.spans.append(current)
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> Dict[str, Any]:
+    """The spans of `trace` as an OTLP/JSON `ExportTraceServiceRequest`."""
+    spans = []
+    for item in trace.spans:
+        otlp_span: Dict[str, Any] = {
+            "traceId": trace.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "kind": item.kind,
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.end_ns),
+            "attributes": [
+                {"key": key, "value": _attribute_value(value)}
+                for key, value in {"paste.request_id": trace.request_id, **item.attributes}.items()
+                if value is not None
+            ],
+        }
+        if item.parent_id:
+            otlp_span["parentSpanId"] = item.parent_id
+        if item.error:
+            otlp_span["status"] = {"code": _STATUS_ERROR, "message": item.error}
+        spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "paste.py"}}]},
+                "scopeSpans": [{"scope": {"name": "paste"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def export(trace: Trace) -> None:
+    # Written by the logging listener thread, one OTLP/JSON document per line
+    trace_logger.info(orjson.dumps(to_otlp(trace)).decode())
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    trace = _current_trace.get()
+    if trace is not None and trace.sampled:
+        conn.info["paste_query_start_ns"] = time.time_ns()
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    start_ns = conn.info.pop("paste_query_start_ns", None)
+    trace = _current_trace.get()
+    if start_ns is None or trace is None:
+        return
+    trace.spans.append(
+        Span(
+            name="db.query",
+            span_id=secrets.token_hex(8),
+            parent_id=_current_span.get() or trace.remote_parent_id,
+            kind=SPAN_KIND_CLIENT,
+            start_ns=start_ns,
+            end_ns=time.time_ns(),
+            attributes={
+                "db.system": conn.dialect.name,
+                "db.statement": statement[:_MAX_STATEMENT_LENGTH],
+                "server.address": conn.engine.url.host,
+            },
+        )
+    )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Record the queries `engine` runs for sampled requests as spans."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,156 @@
+import asyncio
+import fcntl
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional
+
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+
+from .config import get_settings
+from .crud import store_paste_file
+from .models import Paste, UploadSession
+from .utils import guess_content_type
+
+logger = logging.getLogger("paste")
+
+
+class UploadError(Exception):
+    status_code: int = 400
+
+
+class UploadConflictError(UploadError):
+    status_code = 409
+
+
+class UploadTooLargeError(UploadError):
+    status_code = 413
+
+
+def spool_path(session_id: str) -> Path:
+    return Path(get_settings().UPLOAD_SPOOL_PATH, session_id)
+
+
+def _lock(spool: BinaryIO) -> None:
+    """Take the per-upload lock, shared by all workers on the node through the spool file."""
+    try:
+        fcntl.flock(spool.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise UploadConflictError("Another request is writing to this upload")
+
+
+def create_upload(
+    db: Session,
+    length: Optional[int] = None,
+    filename: Optional[str] = None,
+    extension: Optional[str] = None,
+    expiresat: Optional[datetime] = None,
+) -> UploadSession:
+    if length is not None and length > get_settings().RESUMABLE_UPLOAD_MAX_BYTES:
+        raise UploadTooLargeError("Upload is too large")
+
+    session = UploadSession(length=length, filename=filename, extension=extension, expiresat=expiresat, offset=0)
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+
+    path = spool_path(session.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return session
+
+
+def _open_at_offset(db: Session, session: UploadSession, offset: int) -> BinaryIO:
+    """Open and lock the spool of `session` and truncate it to `offset`, which must be the committed offset."""
+    try:
+        spool = open(spool_path(session.id), "r+b")
+    except FileNotFoundError:
+        raise UploadConflictError("Upload spool is gone, the upload was completed or aborted")
+    try:
+        _lock(spool)
+        # Another worker may have committed a chunk after the handler loaded the session
+        db.refresh(session)
+        if offset != session.offset:
+            raise UploadConflictError(f"Upload offset is {session.offset}, not {offset}")
+
+        # Drop whatever an interrupted request left past the committed offset
+        spool.seek(offset)
+        spool.truncate()
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+def _commit_offset(db: Session, session: UploadSession, spool: BinaryIO, offset: int) -> None:
+    spool.flush()
+    session.offset = offset
+    db.commit()
+
+
+async def append_chunk(db: Session, session: UploadSession, offset: int, chunks: AsyncIterator[bytes]) -> int:
+    """
+    Write the chunk streamed through `chunks` at `offset`, which must be the current
+    offset of the upload. Bytes received before a client disconnect are kept, so the
+    client can resume from the offset reported afterwards. Returns the new offset.
+
+    The body is read on the event loop, locking, file writes and the commit run in worker threads.
+    """
+    limit = session.length if session.length is not None else get_settings().RESUMABLE_UPLOAD_MAX_BYTES
+    spool = await asyncio.to_thread(_open_at_offset, db, session, offset)
+    try:
+        written = 0
+        try:
+            async for chunk in chunks:
+                if offset + written + len(chunk) > limit:
+                    await asyncio.to_thread(spool.truncate, offset)
+                    raise UploadTooLargeError(f"Upload would exceed {limit} bytes")
+                await asyncio.to_thread(spool.write, chunk)
+                written += len(chunk)
+        except ClientDisconnect:
+            logger.info(f"Client disconnected from upload {session.id} after {written} bytes")
+        await asyncio.to_thread(_commit_offset, db, session, spool, offset + written)
+    finally:
+        spool.close()
+    return offset + written
+
+
+def complete_upload(db: Session, session: UploadSession) -> Paste:
+    if session.length is not None and session.offset != session.length:
+        raise UploadConflictError(f"Upload is incomplete: {session.offset} of {session.length} bytes received")
+
+    path = spool_path(session.id)
+    try:
+        spool = open(path, "r+b")
+    except FileNotFoundError:
+        raise UploadConflictError("Upload spool is gone, the upload was completed or aborted")
+
+    with spool:
+        _lock(spool)
+        spool.truncate(session.offset)
+        paste = store_paste_file(
+            db,
+            path,
+            extension=session.extension,
+            expiresat=session.expiresat,
+            content_type=guess_content_type(session.filename),
+        )
+    db.delete(session)
+    db.commit()
+    return paste
+
+
+def abort_upload(db: Session, session: UploadSession) -> None:
+    spool_path(session.id).unlink(missing_ok=True)
+    db.delete(session)
+    db.commit()
+
+
+def purge_stale_uploads(db: Session) -> int:
+    """Garbage-collect uploads that have not received a chunk within `UPLOAD_SESSION_TTL_SECONDS`."""
+    cutoff = datetime.utcnow() - timedelta(seconds=get_settings().UPLOAD_SESSION_TTL_SECONDS)
+    stale = db.query(UploadSession).filter(UploadSession.updated_at < cutoff).all()
+    for session in stale:
+        abort_upload(db, session)
+    return len(stale)
@@ -1,9 +1,12 @@
+import codecs
+import mimetypes
 import os
 import random
 import re
 import string
+from datetime import date, datetime, timezone
 from pathlib import Path
-from typing import Pattern
+from typing import Optional, Pattern
 
 
 def generate_uuid() -> str:
@@ -16,6 +19,87 @@ def generate_uuid() -> str:
     return random_code
 
 
+def expiry_bucket(expiresat: Optional[datetime]) -> date:
+    """Return the UTC day a paste expires on, or `date.max` for pastes that never expire."""
+    if expiresat is None:
+        return date.max
+    if expiresat.tzinfo is not None:
+        expiresat = expiresat.astimezone(timezone.utc)
+    return expiresat.date()
+
+
+def decode_text(data: bytes, encoding: Optional[str] = None) -> Optional[str]:
+    """
+    Decode a paste body for display. The recorded `encoding` is tried first, then
+    byte order marks, UTF-8 and finally Latin-1, which accepts any byte sequence.
+    Returns None when the body looks binary (NUL bytes near the start).
+    """
+    if encoding:
+        try:
+            return str(data, encoding)
+        except (LookupError, UnicodeDecodeError):
+            pass
+
+    for bom, codec in ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")):
+        if data.startswith(bom):
+            return str(data, codec, errors="replace")
+
+    if data.find(b"\x00", 0, 8192) != -1:
+        return None
+
+    try:
+        return str(data, "utf-8")
+    except UnicodeDecodeError:
+        return str(data, "latin-1")
+
+
+# Types served as stored, browsers display or download them but never run code from them
+_INERT_CONTENT_TYPES = frozenset(
+    {
+        "text/plain",
+        "application/octet-stream",
+        "application/json",
+        "application/zip",
+        "application/gzip",
+        "application/x-tar",
+        "image/png",
+        "image/jpeg",
+        "image/gif",
+        "image/webp",
+        "image/avif",
+        "audio/mpeg",
+        "audio/ogg",
+        "video/mp4",
+        "video/webm",
+    }
+)
+
+
+def safe_content_type(content_type: Optional[str]) -> str:
+    """
+    The type to store and serve a body under. Bodies are served from the app's own
+    origin, so active types such as HTML, SVG or JavaScript become text/plain for text
+    and application/octet-stream for anything else. Parameters are dropped.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in _INERT_CONTENT_TYPES:
+        return media_type
+    if media_type.startswith("text/"):
+        return "text/plain"
+    return "application/octet-stream"
+
+
+def guess_content_type(filename: Optional[str], declared: Optional[str] = None) -> Optional[str]:
+    """
+    Content type for an uploaded file. Clients commonly send application/octet-stream
+    for everything, so the file name takes precedence over the declared type.
+    """
+    content_type: Optional[str] = mimetypes.guess_type(filename)[0] if filename else None
+    if not content_type and declared != "application/octet-stream":
+        content_type = declared
+    return content_type
+
+
 def extract_extension(file_name: Path) -> str:
     _, extension = os.path.splitext(file_name)
     return extension
@@ -39,29 +123,3 @@ def _find_without_extension(file_name: str) -> str:
         return str()
     else:
         return math_pattern[0]
-
-
-def _filter_object_name_from_link(link: str) -> str:
-    """
-    Extract the object name from the link.
-
-    Args:
-        link (str): The MinIO URL/link containing the object name
-            Example formats:
-            - http://minio:9000/bucket-name/object-name
-            - https://minio.example.com/bucket-name/object-name
-            - http://localhost:9000/bucket-name/object-name?X-Amz-Algorithm=AWS4-HMAC-SHA256&...
-
-    Returns:
-        str: The extracted object name
-    """
-    # Remove query parameters if they exist
-    base_url = link.split("?")[0]
-
-    # Split the URL by '/' and get the last component
-    parts = base_url.rstrip("/").split("/")
-
-    # The object name is the last component
-    object_name = parts[-1]
-
-    return object_name
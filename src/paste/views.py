@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .database import Session_Local
+from .models import Paste, PasteView
+
+logger = logging.getLogger("paste")
+
+# Rows per statement, keeps the number of bound parameters well below database limits
+_BATCH_SIZE = 500
+
+
+class ViewCounter:
+    """
+    Counts paste views in memory and periodically adds them to the paste_views table
+    with one upsert per batch, so reads do not turn into row updates. A worker that
+    is killed loses at most the views of one flush interval, a clean shutdown flushes.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[str, Tuple[int, datetime]] = {}
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def record(self, paste_id: str) -> None:
+        now = datetime.utcnow()
+        with self._lock:
+            views, _ = self._pending.get(paste_id, (0, now))
+            self._pending[paste_id] = (views + 1, now)
+            full = len(self._pending) >= get_settings().VIEW_FLUSH_MAX_PENDING
+        if full and self._wakeup is not None:
+            self._wakeup.set()
+
+    def pending(self, paste_id: str) -> Tuple[int, Optional[datetime]]:
+        """Views of `paste_id` recorded by this worker and not flushed yet."""
+        with self._lock:
+            return self._pending.get(paste_id, (0, None))
+
+    def _merge(self, batch: Dict[str, Tuple[int, datetime]]) -> None:
+        with self._lock:
+            for paste_id, (views, last_viewed_at) in batch.items():
+                pending_views, pending_last_viewed_at = self._pending.get(paste_id, (0, last_viewed_at))
+                self._pending[paste_id] = (views + pending_views, max(last_viewed_at, pending_last_viewed_at))
+
+    def _upsert(self, db: Session, rows: List[dict]) -> None:
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+
+            latest = func.greatest
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+            # SQLite's max() with several arguments is the scalar maximum
+            latest = func.max
+
+        statement = insert(PasteView).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[PasteView.paste_id],
+            set_={
+                "views": PasteView.views + statement.excluded.views,
+                "last_viewed_at": latest(PasteView.last_viewed_at, statement.excluded.last_viewed_at),
+            },
+        )
+        db.execute(statement)
+
+    def flush(self) -> int:
+        """Write the pending views to the database, returns the number of pastes updated."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        db: Session = Session_Local()
+        updated = 0
+        try:
+            paste_ids = list(batch)
+            for start in range(0, len(paste_ids), _BATCH_SIZE):
+                chunk = paste_ids[start : start + _BATCH_SIZE]
+                # Skip pastes deleted since they were viewed, their counters would outlive them
+                existing = db.execute(select(Paste.pasteID).where(Paste.pasteID.in_(chunk))).scalars()
+                rows = [{"paste_id": paste_id, "views": batch[paste_id][0], "last_viewed_at": batch[paste_id][1]} for paste_id in existing]
+                if rows:
+                    self._upsert(db, rows)
+                    updated += len(rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Try again with the next flush rather than dropping the views
+            self._merge(batch)
+            raise
+        finally:
+            db.close()
+        return updated
+
+    async def run(self) -> None:
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=get_settings().VIEW_FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Error flushing view counters: {e}")
+
+
+view_counter = ViewCounter()
@@ -1,9 +1,18 @@
+import msgpack
+import pytest
 from fastapi.testclient import TestClient
+from starlette.requests import Request
+from src.paste.config import get_settings
+from src.paste import backup, main
+from src.paste.compression import precompressed_response
 from src.paste.main import app
+from src.paste.views import view_counter
 from typing import Optional
 
 client: TestClient = TestClient(app)
 
+ADMIN_HEADERS = {"Authorization": "Bearer test-admin-token"}
+
 paste_id: Optional[str] = None
 
 
@@ -12,6 +21,12 @@ def test_get_health_route() -> None:
     assert response.status_code == 200
 
 
+def test_get_liveness_route() -> None:
+    response = client.get("/health/live")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+
+
 def test_paste_api_route() -> None:
     respose = client.post(
         "/api/paste",
@@ -24,3 +39,195 @@ def test_paste_api_route() -> None:
 
 
 print(paste_id)
+
+
+def test_paste_api_msgpack_negotiation() -> None:
+    response = client.post(
+        "/api/paste",
+        content=msgpack.packb({"content": "Hello-World"}),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"},
+    )
+    assert response.status_code == 201
+    assert response.headers["content-type"] == "application/msgpack"
+    uuid = msgpack.unpackb(response.content)["uuid"]
+
+    response = client.get(f"/api/paste/{uuid}")
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["content"] == "Hello-World"
+
+
+def test_resumable_upload_route() -> None:
+    response = client.post("/api/uploads", json={"length": 11, "filename": "hello.txt"})
+    assert response.status_code == 201
+    upload_id = response.json()["id"]
+
+    response = client.patch(f"/api/uploads/{upload_id}", content=b"Hello-", headers={"Upload-Offset": "0"})
+    assert response.status_code == 204
+    assert response.headers["Upload-Offset"] == "6"
+
+    # A chunk sent at a stale offset is rejected with the offset to resume from
+    response = client.patch(f"/api/uploads/{upload_id}", content=b"World", headers={"Upload-Offset": "0"})
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "6"
+
+    response = client.patch(f"/api/uploads/{upload_id}", content=b"World", headers={"Upload-Offset": "6"})
+    assert response.status_code == 204
+
+    response = client.post(f"/api/uploads/{upload_id}/complete", content=b"")
+    assert response.status_code == 201
+    paste_id = response.json()["uuid"]
+    assert client.get(f"/paste/{paste_id}").content == b"Hello-World"
+
+
+def test_raw_pastes_are_served_inert() -> None:
+    uploads = [
+        ("page.html", b"<script>alert(1)</script>", "text/html", "text/plain; charset=utf-8"),
+        ("image.svg", b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>', "image/svg+xml", "application/octet-stream"),
+        ("page.bin", b"\xff\xfe<script>alert(1)</script>", "text/html", "application/octet-stream"),
+    ]
+    for filename, body, declared, served in uploads:
+        response = client.post("/file", files={"file": (filename, body, declared)})
+        assert response.status_code == 201
+        paste_uuid = response.text.strip().rsplit("/", 1)[-1]
+
+        response = client.get(f"/paste/{paste_uuid}")
+        assert response.content == body
+        assert response.headers["content-type"] == served
+        assert response.headers["x-content-type-options"] == "nosniff"
+        assert ("content-disposition" in response.headers) == (served == "application/octet-stream")
+
+
+def test_search_api_route(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "ADMIN_TOKEN", "test-admin-token")
+    response = client.post("/api/paste", json={"content": "def frobnicate_widgets():\n    return 42"})
+    paste_id = response.json()["uuid"]
+
+    assert client.get("/api/search", params={"q": "frobnicate_widgets"}).status_code == 401
+    response = client.get("/api/search", params={"q": "frobnicate_widgets"}, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["uuid"] for result in results] == [paste_id]
+    assert "**frobnicate_widgets**" in results[0]["snippet"]
+
+    client.delete(f"/paste/{paste_id}")
+    response = client.get("/api/search", params={"q": "frobnicate_widgets"}, headers=ADMIN_HEADERS)
+    assert response.json()["results"] == []
+
+
+def test_paste_revisions_route() -> None:
+    response = client.post("/api/paste", json={"content": "host=a\nport=1\n"})
+    paste_id = response.json()["uuid"]
+
+    response = client.put(f"/api/paste/{paste_id}", json={"content": "host=a\nport=2\n"})
+    assert response.status_code == 200
+    assert response.json()["revision"] == 2
+
+    assert client.get(f"/paste/{paste_id}").text == "host=a\nport=2\n"
+    assert client.get(f"/api/paste/{paste_id}/revisions/1").json()["content"] == "host=a\nport=1\n"
+    assert [revision["number"] for revision in client.get(f"/api/paste/{paste_id}/revisions").json()["revisions"]] == [1, 2]
+    assert "-port=1\n+port=2\n" in client.get(f"/api/paste/{paste_id}/diff").text
+
+    # Rejected from the Content-Length, before the JSON body is read and parsed
+    response = client.put(f"/api/paste/{paste_id}", json={"content": "x" * 20_000_001})
+    assert response.status_code == 413
+
+
+def test_paste_view_counts() -> None:
+    response = client.post("/api/paste", json={"content": "counted"})
+    paste_id = response.json()["uuid"]
+
+    client.get(f"/paste/{paste_id}")
+    client.get(f"/paste/{paste_id}")
+    assert view_counter.flush() >= 1
+    client.get(f"/paste/{paste_id}")
+
+    # Flushed views and the ones still pending in this worker add up
+    details = client.get(f"/api/paste/{paste_id}").json()
+    assert details["views"] == 3
+    assert details["last_viewed_at"] is not None
+
+
+def test_export_import_routes(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "ADMIN_TOKEN", "test-admin-token")
+    response = client.post("/api/paste", json={"content": "exported body"})
+    paste_id = response.json()["uuid"]
+
+    assert client.get("/api/export").status_code == 401
+    response = client.get("/api/export", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    export = [line for line in response.content.splitlines() if f'"id":"{paste_id}"'.encode() in line]
+    assert len(export) == 1
+
+    # Pastes that already exist are left alone
+    response = client.post("/api/import", content=export[0] + b"\n", headers=ADMIN_HEADERS)
+    assert response.json() == {"imported": 0, "skipped": 1}
+
+    client.delete(f"/paste/{paste_id}")
+    response = client.post("/api/import", content=export[0], headers=ADMIN_HEADERS)
+    assert response.json() == {"imported": 1, "skipped": 0}
+    assert client.get(f"/paste/{paste_id}").text == "exported body"
+
+
+def test_export_streams_object_bodies(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "ADMIN_TOKEN", "test-admin-token")
+    monkeypatch.setattr(backup, "_ENCODE_CHUNK_BYTES", 3 * 64)
+    body = bytes(range(256)) * 40
+    paste_id = client.post("/file", files={"file": ("dump.bin", body)}).text.strip().rsplit("/", 1)[-1]
+
+    response = client.get("/api/export", headers=ADMIN_HEADERS)
+    export = [line for line in response.content.splitlines() if f'"id":"{paste_id}"'.encode() in line]
+    assert len(export) == 1
+    client.delete(f"/paste/{paste_id}")
+    response = client.post("/api/import", content=export[0], headers=ADMIN_HEADERS)
+    assert response.json() == {"imported": 1, "skipped": 0}
+    assert client.get(f"/paste/{paste_id}").content == body
+
+    # Too large to export
+    monkeypatch.setattr(get_settings(), "BACKUP_MAX_BODY_BYTES", len(body) - 1)
+    response = client.get("/api/export", headers=ADMIN_HEADERS)
+    assert f'"id":"{paste_id}"'.encode() not in response.content
+
+
+def test_response_compression() -> None:
+    response = client.get("/languages.json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.json()
+
+    response = client.post("/api/paste", json={"content": "compressible line\n" * 1000})
+    paste_id = response.json()["uuid"]
+    response = client.get(f"/paste/{paste_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.text == "compressible line\n" * 1000
+
+    response = client.get(f"/paste/{paste_id}", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_compression_can_be_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    # The middleware is only installed at startup, cached pages check the setting themselves
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")]})
+    body = b"cached page " * 1000
+    assert precompressed_response(request, ("test-page",), lambda: body, "text/plain").headers["Content-Encoding"] == "gzip"
+
+    monkeypatch.setattr(get_settings(), "COMPRESSION_ENABLED", False)
+    response = precompressed_response(request, ("test-page",), lambda: body, "text/plain")
+    assert "Content-Encoding" not in response.headers
+    assert response.body == body
+
+
+def test_cached_paste_page_is_not_read_again(monkeypatch: pytest.MonkeyPatch) -> None:
+    browser = {"User-Agent": "Mozilla/5.0"}
+    paste_id = client.post("/api/paste", json={"content": "first_version_body"}).json()["uuid"]
+    assert "first_version_body" in client.get(f"/paste/{paste_id}", headers=browser).text
+
+    def fail(paste: object) -> None:
+        raise AssertionError("body read on a cache hit")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(main, "read_paste_content", fail)
+        assert "first_version_body" in client.get(f"/paste/{paste_id}", headers=browser).text
+
+    # An update starts a new revision, which is rendered afresh
+    client.put(f"/api/paste/{paste_id}", json={"content": "second_version_body"})
+    assert "second_version_body" in client.get(f"/paste/{paste_id}", headers=browser).text
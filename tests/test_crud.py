@@ -0,0 +1,26 @@
+import pytest
+
+from src.paste import crud
+from src.paste.database import Session_Local
+
+
+def test_store_paste_skips_taken_ids(monkeypatch: pytest.MonkeyPatch) -> None:
+    db = Session_Local()
+    try:
+        taken = crud.store_paste(db, b"first").pasteID
+        fresh = crud.generate_uuid()
+        while fresh == taken:
+            fresh = crud.generate_uuid()
+        candidates = iter([taken, taken, fresh])
+        monkeypatch.setattr(crud, "generate_uuid", lambda: next(candidates))
+
+        paste = crud.store_paste(db, b"second")
+        assert paste.pasteID == fresh
+        assert crud.read_paste_bytes(crud.get_paste(db, taken)) == b"first"
+        assert crud.read_paste_bytes(crud.get_paste(db, fresh)) == b"second"
+
+        monkeypatch.setattr(crud, "generate_uuid", lambda: taken)
+        with pytest.raises(crud.PasteIdUnavailableError):
+            crud.store_paste(db, b"third")
+    finally:
+        db.close()
@@ -0,0 +1,128 @@
+import time
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from src.paste import database
+from src.paste.config import get_settings
+from src.paste.crud import get_paste
+from src.paste.database import RecentWrites, ReplicaSet, ReadSession_Local, reads_from_replica
+from src.paste.models import Paste, PasteView
+
+
+def _engine(path: Path) -> Engine:
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    database.Base.metadata.create_all(engine, tables=[Paste.__table__, PasteView.__table__])
+    return engine
+
+
+@pytest.fixture
+def engines(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Tuple[Engine, Engine]:
+    primary, replica = _engine(tmp_path / "primary.db"), _engine(tmp_path / "replica.db")
+    monkeypatch.setattr(database, "get_engine", lambda: primary)
+    monkeypatch.setattr(database, "get_replica_engines", lambda: [replica])
+    monkeypatch.setattr(database, "replicas", ReplicaSet())
+    monkeypatch.setattr(database, "recent_writes", RecentWrites())
+    monkeypatch.setattr("src.paste.crud.recent_writes", database.recent_writes)
+    return primary, replica
+
+
+def _insert(engine: Engine, paste_id: str, content: str) -> None:
+    with Session(engine) as db:
+        db.add(Paste(pasteID=paste_id, content=content))
+        db.commit()
+
+
+def test_reads_go_to_the_replica(engines: Tuple[Engine, Engine]) -> None:
+    primary, replica = engines
+    _insert(primary, "rep1", "primary copy")
+    _insert(replica, "rep1", "replica copy")
+
+    db = ReadSession_Local()
+    try:
+        assert get_paste(db, "rep1").content == "replica copy"
+        assert reads_from_replica(db)
+    finally:
+        db.close()
+
+
+def test_replica_miss_is_retried_on_the_primary(engines: Tuple[Engine, Engine]) -> None:
+    primary, replica = engines
+    # Not replicated yet
+    _insert(primary, "rep2", "only on the primary")
+
+    db = ReadSession_Local()
+    try:
+        assert get_paste(db, "rep2").content == "only on the primary"
+        assert db.info["replica"] is replica and not reads_from_replica(db)
+        assert get_paste(db, "none") is None
+    finally:
+        db.close()
+
+
+def test_recent_writes_read_from_the_primary(engines: Tuple[Engine, Engine]) -> None:
+    primary, replica = engines
+    _insert(primary, "rep3", "new body")
+    _insert(replica, "rep3", "stale body")
+    database.recent_writes.add("rep3")
+
+    db = ReadSession_Local()
+    try:
+        assert get_paste(db, "rep3").content == "new body"
+    finally:
+        db.close()
+
+
+def test_flushes_go_to_the_primary(engines: Tuple[Engine, Engine]) -> None:
+    primary, replica = engines
+    _insert(replica, "rep4", "replicated")
+
+    db = ReadSession_Local()
+    try:
+        assert get_paste(db, "rep4") is not None
+        db.add(PasteView(paste_id="rep4", views=1))
+        db.commit()
+    finally:
+        db.close()
+
+    with Session(primary) as check:
+        assert check.get(PasteView, "rep4").views == 1
+    with Session(replica) as check:
+        assert check.get(PasteView, "rep4") is None
+
+
+def test_unreachable_replica_falls_back_to_the_primary(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    primary = _engine(tmp_path / "primary.db")
+    # The directory does not exist, every connection attempt fails
+    replica = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    event.listen(replica, "handle_error", database._on_replica_error)
+    monkeypatch.setattr(database, "get_engine", lambda: primary)
+    monkeypatch.setattr(database, "get_replica_engines", lambda: [replica])
+    monkeypatch.setattr(database, "replicas", ReplicaSet())
+    _insert(primary, "rep5", "served anyway")
+
+    db = ReadSession_Local()
+    try:
+        assert get_paste(db, "rep5").content == "served anyway"
+    finally:
+        db.close()
+    # Taken out of the rotation, the next session reads from the primary right away
+    assert not database.replicas.is_healthy(replica)
+    assert database.replicas.choose() is None
+
+
+def test_recent_writes_expire(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "READ_YOUR_WRITES_SECONDS", 0.05)
+    writes = RecentWrites()
+    writes.add("abcd")
+    assert "abcd" in writes and "efgh" not in writes
+
+    time.sleep(0.06)
+    assert "abcd" not in writes
+    writes.add("efgh")
+    # Expired entries are dropped when new ones are added
+    assert list(writes._written_at) == ["efgh"]
@@ -0,0 +1,54 @@
+import asyncio
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+from src.paste.config import get_settings
+from src.paste.idfilter import PasteIdFilter, paste_filter
+from src.paste.main import app
+
+client: TestClient = TestClient(app)
+ADMIN_HEADERS = {"Authorization": "Bearer test-admin-token"}
+
+
+def test_filter_knows_existing_and_missing_ids() -> None:
+    paste_id = client.post("/api/paste", json={"content": "filtered"}).json()["uuid"]
+
+    id_filter = PasteIdFilter()
+    assert id_filter.might_contain("zzzz")
+    assert id_filter.rebuild() >= 1
+    assert id_filter.might_contain(paste_id)
+    id_filter.discard(paste_id)
+    assert not id_filter.might_contain(paste_id)
+    # Clear bits are checked against the pastes created since the rebuild
+    assert asyncio.run(id_filter.might_exist(paste_id))
+    id_filter.add("zzzz")
+    assert id_filter.might_contain("zzzz")
+    # Ids of other lengths are not covered by the bitmap
+    assert id_filter.might_contain("zz")
+
+
+def test_missing_paste_is_not_found() -> None:
+    paste_filter.rebuild()
+    paste_id = client.post("/api/paste", json={"content": "present"}).json()["uuid"]
+    assert client.get(f"/paste/{paste_id}").text == "present"
+    client.delete(f"/paste/{paste_id}")
+    assert client.get(f"/api/paste/{paste_id}").status_code == 404
+    assert client.get(f"/paste/{paste_id}").status_code == 404
+
+
+def test_other_workers_see_imported_pastes(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "ADMIN_TOKEN", "test-admin-token")
+    paste_id = client.post("/api/paste", json={"content": "imported body"}).json()["uuid"]
+    export = client.get("/api/export", headers=ADMIN_HEADERS).content.splitlines()
+    record = orjson.loads([line for line in export if f'"id":"{paste_id}"'.encode() in line][0])
+    record["created_at"] = "2001-01-01T00:00:00"
+    client.delete(f"/paste/{paste_id}")
+
+    # Another worker, rebuilt before the import, which keeps the original created_at
+    other_worker = PasteIdFilter()
+    other_worker.rebuild()
+    assert not asyncio.run(other_worker.might_exist(paste_id))
+    response = client.post("/api/import", content=orjson.dumps(record), headers=ADMIN_HEADERS)
+    assert response.json() == {"imported": 1, "skipped": 0}
+    assert asyncio.run(other_worker.might_exist(paste_id))
@@ -0,0 +1,23 @@
+import logging
+from queue import SimpleQueue
+
+import orjson
+
+from src.paste.logging import ContextQueueHandler, JsonFormatter
+
+
+def test_logged_exception_reaches_the_json_line() -> None:
+    queue: SimpleQueue = SimpleQueue()
+    logger = logging.getLogger("paste.test_logging")
+    logger.addHandler(ContextQueueHandler(queue))
+    logger.propagate = False
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception("Failed for %s", "abcd")
+
+    # What the listener thread formats
+    entry = orjson.loads(JsonFormatter().format(queue.get_nowait()))
+    assert entry["message"] == "Failed for abcd"
+    assert entry["level"] == "ERROR"
+    assert "Traceback" in entry["exception"] and "ZeroDivisionError" in entry["exception"]
@@ -0,0 +1,140 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.paste.config import get_settings
+from src.paste.middleware import AdmissionClass, AdmissionControl, Profiling
+
+
+def test_admission_class_queues_and_sheds() -> None:
+    async def scenario() -> None:
+        admission = AdmissionClass(limit=1, queue_size=1, queue_timeout=0.05)
+        assert await admission.acquire()
+
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        # The queue is full, the next request is shed right away
+        assert not await admission.acquire()
+
+        # Releasing hands the slot to the queued request
+        admission.release()
+        assert await waiter
+        assert admission.active == 1
+
+        # A queued request gives up after the queue timeout
+        assert not await admission.acquire()
+        assert admission.waiting == 0
+        admission.release()
+        assert admission.active == 0
+
+    asyncio.run(scenario())
+
+
+def _blocking_app(release: asyncio.Event) -> ASGIApp:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        degraded = scope.get("state", {}).get("degraded", False)
+        if scope["path"].endswith("/block"):
+            await release.wait()
+        await PlainTextResponse("degraded" if degraded else "full")(scope, receive, send)
+
+    return app
+
+
+def test_admission_control_sheds_with_retry_after() -> None:
+    async def scenario() -> None:
+        release = asyncio.Event()
+        classes = {"api": AdmissionClass(limit=1, queue_size=0, queue_timeout=1), "slow": AdmissionClass(limit=1, queue_size=1, queue_timeout=0.05)}
+        app = AdmissionControl(
+            _blocking_app(release),
+            classify=lambda scope: "slow" if scope["path"].startswith("/slow") else "api",
+            classes=lambda: classes,
+            retry_after=7,
+        )
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            blocked = asyncio.create_task(client.get("/block"))
+            while not classes["api"].saturated:
+                await asyncio.sleep(0.001)
+            # No queue, shed right away
+            response = await client.get("/other")
+            assert response.status_code == 503 and response.headers["Retry-After"] == "7"
+            release.set()
+            assert (await blocked).status_code == 200
+
+            release.clear()
+            blocked = asyncio.create_task(client.get("/slow/block"))
+            while not classes["slow"].saturated:
+                await asyncio.sleep(0.001)
+            # Queued, then shed once the queue timeout passes
+            response = await client.get("/slow/other")
+            assert response.status_code == 503 and response.headers["Retry-After"] == "7"
+            release.set()
+            await blocked
+            assert classes["api"].active == classes["slow"].active == 0
+
+    asyncio.run(scenario())
+
+
+def test_admission_control_degrades_saturated_renders() -> None:
+    async def scenario() -> None:
+        release = asyncio.Event()
+        classes = {"render": AdmissionClass(limit=1, queue_size=0, queue_timeout=1), "raw": AdmissionClass(limit=1, queue_size=0, queue_timeout=1)}
+        app = AdmissionControl(_blocking_app(release), classify=lambda scope: "render", classes=lambda: classes, degrade={"render": "raw"})
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            blocked = asyncio.create_task(client.get("/block"))
+            while not classes["render"].saturated:
+                await asyncio.sleep(0.001)
+            # The render class is full, the request is served by the raw class instead
+            assert (await client.get("/other")).text == "degraded"
+            release.set()
+            assert (await blocked).text == "full"
+
+    asyncio.run(scenario())
+
+
+def test_degraded_paste_page_is_served_as_raw_text() -> None:
+    from src.paste.main import app, classify_request
+
+    async def scenario() -> None:
+        # A render class without slots, browsers get the raw class
+        classes = {"render": AdmissionClass(limit=0, queue_size=0, queue_timeout=1), "raw": AdmissionClass(limit=1, queue_size=0, queue_timeout=1)}
+        shedding = AdmissionControl(app, classify=classify_request, classes=lambda: classes, degrade={"render": "raw"})
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=shedding), base_url="http://test") as client:
+            paste_id = (await client.post("/api/paste", json={"content": "<b>not highlighted</b>"})).json()["uuid"]
+            response = await client.get(f"/paste/{paste_id}", headers={"User-Agent": "Mozilla/5.0"})
+            assert response.text == "<b>not highlighted</b>"
+            assert response.headers["Content-Type"].startswith("text/plain")
+
+    asyncio.run(scenario())
+
+
+def test_request_tracing_sets_request_id() -> None:
+    from fastapi.testclient import TestClient
+
+    from src.paste.main import app
+
+    client = TestClient(app)
+    response = client.get("/health/live", headers={"X-Request-ID": "req-42"})
+    assert response.headers["X-Request-ID"] == "req-42"
+
+    # Requests without one get a generated id
+    response = client.get("/health/live")
+    assert len(response.headers["X-Request-ID"]) == 32
+
+
+def test_profiling_needs_the_admin_token(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "ADMIN_TOKEN", "test-admin-token")
+
+    async def scenario() -> None:
+        app = Profiling(_blocking_app(asyncio.Event()), interval=0.001, sample_every=0, keep=0, directory="")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            # Passed through untouched, the parameter may belong to the app
+            response = await client.get("/page", params={"profile": "sample"})
+            assert response.status_code == 200 and response.text == "full"
+
+            response = await client.get("/page", headers={"X-Profile": "trace", "Authorization": "Bearer test-admin-token"})
+            assert response.status_code == 200 and response.headers["X-Profiled-Status"] == "200"
+
+    asyncio.run(scenario())
@@ -0,0 +1,16 @@
+import os
+
+from src.paste.revisions import apply_delta, make_delta
+
+
+def test_delta_round_trip() -> None:
+    base = b"".join(f"line {i}\n".encode() for i in range(1000))
+    target = base.replace(b"line 500\n", b"changed\n") + b"tail without newline"
+    delta = make_delta(base, target)
+    assert apply_delta(base, delta) == target
+    # Unchanged lines are copied from the base instead of being stored again
+    assert len(delta) < 100
+
+    binary = os.urandom(4096)
+    assert apply_delta(base, make_delta(base, binary)) == binary
+    assert apply_delta(b"", make_delta(b"", b"")) == b""
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from sdk.sdk import module
+from sdk.sdk.module import AsyncPasteBinSDK, PasteBinSDK, _MultipartFileBody
+
+BASE_URL = "http://paste.test"
+
+Handler = Callable[[str, str, bytes], Tuple[int, Dict[str, str], bytes]]
+
+
+class FakeAdapter(HTTPAdapter):
+    """Answers requests with `handler(method, path, body)` instead of sending them."""
+
+    def __init__(self, handler: Handler) -> None:
+        super().__init__()
+        self.handler = handler
+        self.lock = threading.Lock()
+
+    def send(self, request: requests.PreparedRequest, **kwargs: object) -> requests.Response:
+        body = request.body if isinstance(request.body, bytes) else b"".join(request.body or [])
+        with self.lock:
+            status, headers, content = self.handler(request.method, request.path_url, body)
+        response = requests.Response()
+        response.status_code, response._content, response.request, response.url = status, content, request, request.url
+        response.headers.update(headers)
+        return response
+
+
+def make_sdk(handler: Handler, **kwargs: object) -> PasteBinSDK:
+    sdk = PasteBinSDK(BASE_URL, backoff_factor=0, **kwargs)
+    sdk.session.mount("http://", FakeAdapter(handler))
+    return sdk
+
+
+def test_sync_client_retries_with_retry_after(monkeypatch: pytest.MonkeyPatch) -> None:
+    delays: List[float] = []
+    monkeypatch.setattr(module.time, "sleep", delays.append)
+    statuses = iter([429, 503, 200])
+
+    def handler(method: str, path: str, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        status = next(statuses)
+        return status, {"Retry-After": "7"} if status == 429 else {}, b'{"uuid": "abcd"}'
+
+    assert make_sdk(handler).create_paste("body", ".txt") == "abcd"
+    # Retry-After wins over the backoff, which is 0 here
+    assert delays == [7.0, 0.0]
+
+    attempts = []
+
+    def overloaded(method: str, path: str, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        attempts.append(path)
+        return 503, {}, b""
+
+    with pytest.raises(RuntimeError):
+        make_sdk(overloaded, max_retries=2).get_paste("abcd")
+    assert len(attempts) == 3
+
+
+def test_multipart_body_length_and_retry(tmp_path: Path) -> None:
+    path = tmp_path / "build.log"
+    path.write_bytes(b"line\n" * 50_000)
+    body = _MultipartFileBody(path, "build.log", chunk_size=4096)
+    sent = b"".join(body)
+    assert len(body) == len(sent) == int(body.headers["Content-Length"])
+    assert b"".join(body) == sent
+    assert sent.count(b"line\n") == 50_000
+
+    bodies: List[bytes] = []
+
+    def handler(method: str, path: str, request_body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        bodies.append(request_body)
+        return (503 if len(bodies) == 1 else 200), {}, f"{BASE_URL}/paste/abcd\n".encode()
+
+    assert make_sdk(handler).upload_file(path) == "abcd"
+    # The retry re-reads the file from the start
+    assert len(bodies) == 2 and bodies[0] == bodies[1] and len(bodies[1]) == len(body)
+
+
+def test_sync_batches_keep_input_order() -> None:
+    def handler(method: str, path: str, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        if method == "POST":
+            return 200, {}, json.dumps({"uuid": json.loads(body)["content"]}).encode()
+        return 200, {}, json.dumps({"uuid": path.rsplit("/", 1)[-1]}).encode()
+
+    sdk = make_sdk(handler, pool_maxsize=4)
+    names = [f"p{i:03d}" for i in range(40)]
+    assert sdk.create_many([(name, ".txt") for name in names], concurrency=16) == names
+    assert [paste["uuid"] for paste in sdk.get_many(names)] == names
+
+
+def make_async_sdk(handler: Callable[[httpx.Request], httpx.Response]) -> AsyncPasteBinSDK:
+    sdk = AsyncPasteBinSDK(BASE_URL, backoff_factor=0, http2=False)
+    sdk.client = httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(handler))
+    return sdk
+
+
+def test_async_client_retries_and_batches(tmp_path: Path) -> None:
+    attempts: Dict[str, int] = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        attempts[path] = attempts.get(path, 0) + 1
+        if attempts[path] == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        if path == "/file":
+            body = await request.aread()
+            return httpx.Response(200, text=f"{BASE_URL}/paste/{len(body)}\n")
+        return httpx.Response(200, json={"uuid": path.rsplit("/", 1)[-1]})
+
+    path = tmp_path / "dump.bin"
+    path.write_bytes(bytes(range(256)) * 1000)
+
+    async def run() -> None:
+        async with make_async_sdk(handler) as sdk:
+            expected = str(len(_MultipartFileBody(path, "dump.bin")))
+            assert await sdk.upload_file(path) == expected
+            assert [paste["uuid"] for paste in await sdk.get_many(["aaaa", "bbbb", "cccc"], concurrency=2)] == ["aaaa", "bbbb", "cccc"]
+
+    asyncio.run(run())
+    assert attempts["/file"] == 2 and attempts["/api/paste/aaaa"] == 2
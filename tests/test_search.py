@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.paste import search
+from src.paste.crud import store_paste
+from src.paste.database import Session_Local
+from src.paste.models import Paste
+
+
+def test_rejected_body_does_not_block_the_batch(monkeypatch: pytest.MonkeyPatch) -> None:
+    db = Session_Local()
+    try:
+        rejected = store_paste(db, b"quuxrejected body").pasteID
+        accepted = store_paste(db, b"quuxaccepted body").pasteID
+        # Back to pending, as object-backed pastes are until the background indexer runs
+        search.unindex_pastes(db, [rejected, accepted])
+        for paste_id in (rejected, accepted):
+            db.get(Paste, paste_id).search_indexed = False
+        db.commit()
+
+        index_paste = search.index_paste
+
+        def refuse(db: Session, paste_id: str, body: str) -> None:
+            if paste_id == rejected:
+                # Fails in the database, like a tsvector over PostgreSQL's size limit
+                db.execute(text("INSERT INTO no_such_table VALUES (1)"))
+            index_paste(db, paste_id, body)
+
+        monkeypatch.setattr(search, "index_paste", refuse)
+        while search.index_pending_pastes(db):
+            pass
+
+        db.expire_all()
+        assert db.get(Paste, rejected).search_indexed and db.get(Paste, accepted).search_indexed
+        hits, _ = search.search_pastes(db, "quuxaccepted")
+        assert [hit.uuid for hit in hits] == [accepted]
+        assert search.search_pastes(db, "quuxrejected") == ([], False)
+    finally:
+        db.close()
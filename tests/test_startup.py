@@ -0,0 +1,34 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# Modules that are only needed once a request uses them, importing the app must not load them
+DEFERRED_MODULES = ("pygments", "pygments.lexers", "jinja2", "minio")
+
+CHECK = f"""
+import json, sys, threading
+import src.paste.main
+from src.paste.database import get_engine
+print(json.dumps({{
+    "loaded": [name for name in {DEFERRED_MODULES!r} if name in sys.modules],
+    "engines": get_engine.cache_info().currsize,
+    "threads": threading.active_count(),
+}}))
+"""
+
+
+def test_import_is_lazy() -> None:
+    # A fresh interpreter, as the test session itself has already imported everything
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK],
+        cwd=Path(__file__).resolve().parents[1],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report["loaded"] == []
+    assert report["engines"] == 0
+    # The logging listener is started by the lifespan
+    assert report["threads"] == 1
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import pytest
+
+from src.paste.storage import LocalStorage, ObjectNotFoundError, StorageError
+
+
+def test_local_storage_round_trip(tmp_path: Path) -> None:
+    storage = LocalStorage(str(tmp_path))
+    storage.put("object-1", b"Hello-World")
+
+    assert storage.get("object-1") == b"Hello-World"
+    assert b"".join(storage.stream("object-1", chunk_size=4)) == b"Hello-World"
+    assert storage.stat("object-1").size == 11
+    # Objects live in hash-sharded directories, never directly in the root
+    assert not (tmp_path / "object-1").exists()
+    assert len(list(tmp_path.glob("*/*/object-1"))) == 1
+
+
+def test_local_storage_delete(tmp_path: Path) -> None:
+    storage = LocalStorage(str(tmp_path))
+    storage.put("object-1", b"one")
+    storage.put("object-2", b"")
+    assert storage.get("object-2") == b""
+
+    storage.delete_many(["object-1", "object-2", "missing"])
+
+    with pytest.raises(ObjectNotFoundError):
+        storage.get("object-1")
+    with pytest.raises(ObjectNotFoundError):
+        storage.stat("object-2")
+
+
+def test_local_storage_rejects_path_traversal(tmp_path: Path) -> None:
+    storage = LocalStorage(str(tmp_path))
+    with pytest.raises(StorageError):
+        storage.put("../escape", b"data")
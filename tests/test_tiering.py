@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from src.paste.database import Session_Local
+from src.paste.main import app
+from src.paste.crud import store_paste
+from src.paste.models import Paste, RetiredObject
+from src.paste.revisions import update_paste
+from src.paste.storage import ObjectNotFoundError, get_storage
+from src.paste.tiering import backfill_object_sizes, delete_retired_objects, demote_pastes, promote_pastes
+from src.paste.views import view_counter
+
+client: TestClient = TestClient(app)
+
+
+def test_cold_pastes_move_out_and_hot_ones_back() -> None:
+    body = "rarely read line\n" * 500
+    paste_id = client.post("/api/paste", json={"content": body}).json()["uuid"]
+
+    db = Session_Local()
+    try:
+        db.get(Paste, paste_id).created_at = datetime.utcnow() - timedelta(days=365)
+        db.commit()
+        assert demote_pastes(db, limit=1000) >= 1
+        db.expire_all()
+        object_key = db.get(Paste, paste_id).object_key
+        assert object_key is not None
+        assert client.get(f"/paste/{paste_id}").text == body
+
+        for _ in range(10):
+            client.get(f"/paste/{paste_id}")
+        view_counter.flush()
+        assert promote_pastes(db, limit=1000) >= 1
+        db.expire_all()
+        paste = db.get(Paste, paste_id)
+        assert paste.object_key is None and paste.content == body
+        # The old object is recorded in the database rather than this worker's memory
+        assert db.get(RetiredObject, object_key) is not None
+        assert get_storage().stat(object_key).size == len(body)
+        assert delete_retired_objects(db, older_than=3600) == 0
+        assert delete_retired_objects(db) >= 1
+        assert db.get(RetiredObject, object_key) is None
+        with pytest.raises(ObjectNotFoundError):
+            get_storage().stat(object_key)
+        assert client.get(f"/paste/{paste_id}").text == body
+    finally:
+        db.close()
+
+
+def test_updates_retire_the_previous_object() -> None:
+    db = Session_Local()
+    try:
+        paste = store_paste(db, b"\xff\xfe not utf-8")
+        object_key = paste.object_key
+        assert object_key is not None
+        update_paste(db, paste, b"replaced")
+        # Kept for readers still streaming it until the grace period is over
+        assert db.get(RetiredObject, object_key) is not None
+        assert get_storage().stat(object_key).size == 12
+        assert delete_retired_objects(db) >= 1
+        with pytest.raises(ObjectNotFoundError):
+            get_storage().stat(object_key)
+    finally:
+        db.close()
+
+
+def test_object_sizes_are_backfilled() -> None:
+    db = Session_Local()
+    try:
+        paste = store_paste(db, b"\xff\xfe unsized")
+        paste.size = None
+        db.commit()
+        assert backfill_object_sizes(db, limit=1000) >= 1
+        db.expire_all()
+        assert db.get(Paste, paste.pasteID).size == 10
+    finally:
+        db.close()
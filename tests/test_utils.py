@@ -0,0 +1,19 @@
+from datetime import date, datetime, timedelta, timezone
+
+from src.paste.utils import decode_text, expiry_bucket
+
+
+def test_expiry_bucket() -> None:
+    assert expiry_bucket(None) == date.max
+    assert expiry_bucket(datetime(2026, 10, 19, 23, 59)) == date(2026, 10, 19)
+    # Aware datetimes are bucketed by their UTC day
+    assert expiry_bucket(datetime(2026, 10, 20, 1, 0, tzinfo=timezone(timedelta(hours=2)))) == date(2026, 10, 19)
+
+
+def test_decode_text() -> None:
+    assert decode_text("café".encode("utf-8")) == "café"
+    assert decode_text("café".encode("latin-1")) == "café"
+    assert decode_text("café".encode("utf-16")) == "café"
+    assert decode_text("café".encode("cp1252"), "cp1252") == "café"
+    # Gzip header followed by NUL bytes is treated as binary
+    assert decode_text(b"\x1f\x8b\x08\x00\x00\x00\x00\x00") is None